@@ -0,0 +1,507 @@
+"""
+Batched INSERT writer shared by every collection migration
+Buffers converted rows per target table and flushes them as multi-row INSERTs
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from settings import (BATCH_SIZE, INFILE_BATCH_SIZE, STAGING_DIR, VERBOSE, COMMIT_EVERY_ROWS, COMMIT_EVERY_SECONDS,
+                      RETRY_ATTEMPTS)
+from bson.decimal128 import Decimal128
+from bson_values import datetime_field, decimal128_value
+from connection_pool import backoff, connection_lost, describe, error_code, is_retryable
+
+
+class _Unit:
+    """One source document: a parent row plus the child rows that belong to it"""
+
+    __slots__ = ('table', 'columns', 'values', 'children', 'track', 'label', 'source', 'parent_ok', 'error')
+
+    def __init__(self, table, columns, values, children, track, label, source=None):
+        self.table = table
+        self.columns = columns
+        self.values = values
+        self.children = children
+        self.track = track
+        self.label = label
+        self.source = source
+        self.parent_ok = False
+        self.error = None
+
+
+class BatchWriter:
+    """Buffers rows per target table and flushes them with executemany
+
+    Rows are added as units (parent row + child rows). On flush every table
+    gets one multi-row INSERT per batch, parents first so child foreign keys
+    resolve. If a batch statement fails it is rolled back to a savepoint and
+    the rows are retried one by one, so a single bad row only fails its own
+    unit and the successful/failed counters stay accurate.
+
+    The writer also owns the transaction: after a flush it commits once
+    `commit_rows` rows or `commit_seconds` seconds have accumulated, so a
+    failure only rolls back the current chunk. `committed`/`rolled_back`
+    count rows (parents and children). If `checkpoint` is set, its
+    save(connection) records progress and performs the commit. Time spent in
+    flushes and commits is added to the execute/commit stages of `metrics`
+    (a metrics.CollectionMetrics). Failed units are passed to
+    `on_reject(row id, label, error, source document)` instead of being
+    printed.
+
+    With `upsert` parents whose id is already in the table are written with
+    INSERT ... ON DUPLICATE KEY UPDATE (new ids keep the plain INSERT, so a
+    clash on another UNIQUE key fails instead of overwriting a different
+    row), and the existing rows of their child tables (`child_tables`:
+    parent table -> ((child table, parent id column), ...)) are deleted
+    before the new children are inserted, so a re-migrated document
+    replaces what an earlier run wrote for it.
+
+    Deadlocks, lock wait timeouts and lost connections (see
+    connection_pool.RETRYABLE_ERRORS) do not fail the collection: the
+    transaction is rolled back (or the connection replaced through
+    `reconnect(old connection) -> new connection`), the statements executed
+    since the last commit are replayed and the failed flush or commit is
+    retried, up to `retry_attempts` times with backoff. The replay log holds
+    at most one commit's worth of rows. A connection lost while the COMMIT
+    itself was running (2013) is not retried, since the commit may have
+    gone through; resuming from the journal sorts that out.
+
+    Rows of partitioned tables (`partitions`: table -> PartitionLayout) are
+    grouped by the partition their date falls in, and every statement names
+    its partition (INSERT INTO t PARTITION (p)), so MySQL locks and writes
+    one partition at a time. Their upserts delete the old row first, since
+    the primary key includes the date and a changed date would otherwise
+    add a second row.
+    """
+
+    SAVEPOINT = 'batch_writer'
+
+    def __init__(self, connection, batch_size: int = BATCH_SIZE, checkpoint=None,
+                 upsert: bool = False, child_tables: Optional[Dict[str, Tuple[Tuple[str, str], ...]]] = None,
+                 commit_rows: Optional[int] = COMMIT_EVERY_ROWS, commit_seconds: Optional[float] = COMMIT_EVERY_SECONDS,
+                 metrics=None, on_reject: Optional[Callable[[Any, Any, BaseException, Any], None]] = None,
+                 reconnect: Optional[Callable[[Any], Any]] = None, retry_attempts: int = RETRY_ATTEMPTS,
+                 partitions: Optional[Dict[str, Any]] = None):
+        self.connection = connection
+        self.reconnect = reconnect
+        self.retry_attempts = retry_attempts
+        self.retries = 0
+        self.metrics = metrics
+        self.on_reject = on_reject
+        self.checkpoint = checkpoint
+        self.commit_rows = commit_rows
+        self.commit_seconds = commit_seconds
+        self.upsert = upsert
+        self.child_tables = child_tables or {}
+        self.partitions = partitions or {}
+        self._partition_positions: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        self.cursor = connection.cursor()
+        self.batch_size = max(1, int(batch_size or 1))
+        self.successful = 0
+        self.failed = 0
+        self.committed = 0
+        self.rolled_back = 0
+        self._uncommitted = 0
+        self._uncommitted_ids: List[Tuple[set, Any]] = []
+        self._last_commit = time.monotonic()
+        self._units: List[_Unit] = []
+        self._pending_rows: Dict[str, int] = {}
+        self._sql_cache: Dict[Tuple[str, Tuple[str, ...], Optional[str], bool], str] = {}
+        # Data statements since the last commit, replayed after a retryable error:
+        # ('bulk', table, columns, sql, rows, partition) or ('execute', sql, args)
+        self._replay: List[Tuple] = []
+
+    def add(self, table: str, row: Dict[str, Any],
+            children: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+            track=None, label: str = 'record'):
+        """Queue a parent row and its child rows, flushing when a table buffer is full
+
+        `track` is a set or IdIndex that receives the parent `id` once the
+        parent row has been inserted (used for foreign key validation of
+        later collections).
+        """
+        child_rows = [(child_table, tuple(child_row), tuple(child_row.values()))
+                      for child_table, child_row in children or ()]
+        self.add_row(table, tuple(row), tuple(row.values()), child_rows, track, label)
+
+    def add_row(self, table: str, columns: Tuple[str, ...], values: Tuple,
+                children: Optional[List[Tuple[str, Tuple[str, ...], Tuple]]] = None,
+                track=None, label='record', source=None):
+        """add() for rows that are already value tuples (compiled mappings)
+
+        `children` holds (table, columns, values) triples. `label` may be a
+        callable; it is only called when the unit fails. `source` (the
+        original document) is handed to on_reject for the dead-letter files.
+        """
+        pending = self._pending_rows
+        for child in children or ():
+            pending[child[0]] = pending.get(child[0], 0) + 1
+        pending[table] = pending.get(table, 0) + 1
+        self._units.append(_Unit(table, columns, values, children or (), track, label, source))
+
+        if pending[table] >= self.batch_size or (children and max(pending.values()) >= self.batch_size):
+            self.flush()
+
+    @property
+    def rows_written(self) -> int:
+        """Rows inserted so far, committed or not (parents and children)"""
+        return self.committed + self._uncommitted
+
+    def flush(self):
+        """Insert everything buffered so far"""
+        if self._units:
+            start = time.perf_counter()
+            units, self._units = self._units, []
+            self._pending_rows = {}
+            self._retry(lambda: self._flush_units(units), units)
+            if self.metrics is not None:
+                self.metrics.seconds['execute'] += time.perf_counter() - start
+        if ((self.commit_rows and self._uncommitted >= self.commit_rows) or
+                (self.commit_seconds and time.monotonic() - self._last_commit >= self.commit_seconds)):
+            self.commit()
+
+    def commit(self):
+        """Commit everything flushed so far (call flush() first to include buffered rows)"""
+        start = time.perf_counter()
+        self._retry(self._commit, committing=True)
+        if self.metrics is not None:
+            self.metrics.seconds['commit'] += time.perf_counter() - start
+        self.committed += self._uncommitted
+        self._uncommitted = 0
+        self._uncommitted_ids = []
+        self._replay = []
+        self._last_commit = time.monotonic()
+
+    def rollback(self):
+        """Roll back to the last commit and drop the rolled-back IDs from the tracking sets"""
+        self.connection.rollback()
+        rolled_back_ids = {}
+        for track, row_id in self._uncommitted_ids:
+            rolled_back_ids.setdefault(id(track), (track, []))[1].append(row_id)
+        for track, ids in rolled_back_ids.values():
+            track.difference_update(ids)
+        self.rolled_back += self._uncommitted
+        self._uncommitted = 0
+        self._uncommitted_ids = []
+        self._units = []
+        self._pending_rows = {}
+        self._replay = []
+
+    def _commit(self):
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.connection)
+        else:
+            self.connection.commit()
+
+    def _retry(self, operation: Callable[[], Any], units: List[_Unit] = (), committing: bool = False):
+        """Run operation(); on a retryable error restore the uncommitted statements and run it again"""
+        replayed = len(self._replay)  # Statements from before this operation
+        attempt = 0
+        lost = False
+        while True:
+            try:
+                if attempt:
+                    self._restore(replayed, lost)
+                return operation()
+            except Exception as e:
+                if (not is_retryable(e) or attempt >= self.retry_attempts
+                        or (connection_lost(e) and self.reconnect is None)
+                        or (committing and error_code(e) == 2013)):
+                    raise
+                attempt += 1
+                self.retries += 1
+                lost = lost or connection_lost(e)
+                del self._replay[replayed:]
+                for unit in units:
+                    unit.parent_ok = False
+                    unit.error = None
+                delay = backoff(attempt)
+                if VERBOSE:
+                    print(f"  ⚠ {describe(e)}, replaying {replayed} uncommitted statements in {delay:.1f}s "
+                          f"(retry {attempt}/{self.retry_attempts})")
+                time.sleep(delay)
+
+    def _restore(self, statements: int, lost: bool):
+        """Start a new transaction (on a new connection if `lost`) and replay the first `statements` statements"""
+        if not lost:
+            try:
+                self.connection.rollback()
+            except Exception:
+                lost = True
+        if lost:
+            self.connection = self.reconnect(self.connection)
+        self.cursor = self.connection.cursor()
+        for entry in self._replay[:statements]:
+            if entry[0] == 'bulk':
+                self._bulk_insert(*entry[1:])
+            else:
+                self.cursor.execute(*entry[1:])
+
+    def _execute(self, sql: str, args=None):
+        """cursor.execute() for statements that change data, remembered for a replay"""
+        self.cursor.execute(sql, args)
+        self._replay.append(('execute', sql, args))
+
+    def _flush_units(self, units: List[_Unit]):
+        # Parent rows first, one statement per (table, columns, partition) group
+        for key, items in self._group((unit, unit.columns, unit.values, unit.table) for unit in units).items():
+            if self.upsert:
+                existing = self._existing_ids(key[0], [values[0] for _, values in items])
+                if key[0] in self.partitions:
+                    self._delete_ids(key[0], [values[0] for _, values in items if values[0] in existing])
+                    self._insert(key, items, parent=True)
+                    continue
+                self._insert(key, [item for item in items if item[1][0] in existing], parent=True, upsert=True)
+                self._insert(key, [item for item in items if item[1][0] not in existing], parent=True)
+            else:
+                self._insert(key, items, parent=True)
+
+        if self.upsert:
+            self._delete_children(units)
+
+        # Child rows of parents that made it, grouped per child table
+        child_items = (
+            (unit, columns, values, table)
+            for unit in units if unit.parent_ok
+            for table, columns, values in unit.children
+        )
+        for key, items in self._group(child_items).items():
+            self._insert(key, [item for item in items if item[0].error is None], parent=False)
+
+        for unit in units:
+            if unit.parent_ok:
+                self._uncommitted += 1 + (len(unit.children) if unit.error is None else 0)
+            if unit.parent_ok and unit.track is not None:
+                unit.track.add(unit.values[0])
+                self._uncommitted_ids.append((unit.track, unit.values[0]))
+            if unit.parent_ok and unit.error is None:
+                self.successful += 1
+            else:
+                self.failed += 1
+                if self.on_reject is not None:
+                    self.on_reject(unit.values[0], unit.label, unit.error, unit.source)
+                elif VERBOSE:
+                    label = unit.label() if callable(unit.label) else unit.label
+                    print(f"  ✗ Failed to insert {label}: {unit.error}")
+
+    def _group(self, items) -> Dict[Tuple[str, Tuple[str, ...], Optional[str]], List[Tuple[_Unit, Tuple]]]:
+        """Rows per (table, columns, partition); the partition is None for unpartitioned tables"""
+        groups = {}
+        partitions = self.partitions
+        for unit, columns, values, table in items:
+            layout = partitions.get(table) if partitions else None
+            if layout is None:
+                groups.setdefault((table, columns, None), []).append((unit, values))
+            else:
+                partition = layout.partition_of(values[self._partition_position(table, columns)])
+                groups.setdefault((table, columns, partition), []).append((unit, values))
+        return groups
+
+    def _partition_position(self, table: str, columns: Tuple[str, ...]) -> int:
+        key = (table, columns)
+        position = self._partition_positions.get(key)
+        if position is None:
+            position = self._partition_positions[key] = columns.index(self.partitions[table].column)
+        return position
+
+    def _sql(self, table: str, columns: Tuple[str, ...], partition: Optional[str] = None, upsert: bool = False) -> str:
+        key = (table, columns, partition, upsert)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            placeholders = ', '.join(['%s'] * len(columns))
+            column_list = ', '.join(f'`{c}`' for c in columns)
+            target = f"`{table}` PARTITION (`{partition}`)" if partition else f"`{table}`"
+            sql = f"INSERT INTO {target} ({column_list}) VALUES ({placeholders})"
+            if upsert:
+                updates = ', '.join(f'`{c}` = VALUES(`{c}`)' for c in columns[1:])
+                sql += f" ON DUPLICATE KEY UPDATE {updates}"
+            self._sql_cache[key] = sql
+        return sql
+
+    def _existing_ids(self, table: str, ids: List) -> set:
+        """IDs from `ids` that already have a row in `table`"""
+        existing = set()
+        for start in range(0, len(ids), self.batch_size):
+            chunk = ids[start:start + self.batch_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            self.cursor.execute(f"SELECT `id` FROM `{table}` WHERE `id` IN ({placeholders})", chunk)
+            existing.update(row[0] for row in self.cursor.fetchall())
+        return existing
+
+    def _delete_ids(self, table: str, ids: List):
+        """Delete the rows with these ids (upserts into partitioned tables)"""
+        for start in range(0, len(ids), self.batch_size):
+            chunk = ids[start:start + self.batch_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            self._execute(f"DELETE FROM `{table}` WHERE `id` IN ({placeholders})", chunk)
+
+    def _delete_children(self, units: List[_Unit]):
+        """Remove the existing child rows of upserted parents before their new children are inserted"""
+        parent_ids: Dict[str, List] = {}
+        for unit in units:
+            if unit.parent_ok and unit.table in self.child_tables:
+                parent_ids.setdefault(unit.table, []).append(unit.values[0])
+
+        for table, ids in parent_ids.items():
+            for child_table, column in self.child_tables[table]:
+                for start in range(0, len(ids), self.batch_size):
+                    chunk = ids[start:start + self.batch_size]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    self._execute(f"DELETE FROM `{child_table}` WHERE `{column}` IN ({placeholders})", chunk)
+
+    def _bulk_insert(self, table: str, columns: Tuple[str, ...], sql: str, rows: List[Tuple],
+                     partition: Optional[str] = None):
+        """Send a whole batch to MySQL in one go (pymysql rewrites it as a multi-row INSERT)"""
+        self.cursor.executemany(sql, rows)
+
+    def _insert(self, key: Tuple[str, Tuple[str, ...], Optional[str]], items: List[Tuple[_Unit, Tuple]],
+                parent: bool, upsert: bool = False):
+        """Multi-row insert with per-row fallback when the batch is rejected"""
+        if not items:
+            return
+
+        sql = self._sql(*key, upsert=upsert)
+        rows = [values for _, values in items]
+        self.cursor.execute(f"SAVEPOINT {self.SAVEPOINT}")
+        try:
+            self._bulk_insert(key[0], key[1], sql, rows, key[2])
+            self._replay.append(('bulk', key[0], key[1], sql, rows, key[2]))
+            ok = True
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {self.SAVEPOINT}")
+            ok = False
+
+        if ok:
+            if parent:
+                for unit, _ in items:
+                    unit.parent_ok = True
+            return
+
+        # Retry row by row so only the offending units are marked failed
+        for unit, values in items:
+            if unit.error is not None:
+                continue
+            try:
+                self._execute(sql, values)
+                if parent:
+                    unit.parent_ok = True
+            except Exception as e:
+                if is_retryable(e):
+                    raise
+                unit.error = e
+
+
+class InfileWriter(BatchWriter):
+    """BatchWriter that bulk-loads each batch with LOAD DATA LOCAL INFILE
+
+    Every (table, columns) batch is streamed row by row to a temporary TSV
+    file and ingested with a single LOAD DATA statement. With LOCAL the
+    server downgrades duplicate-key and conversion errors to warnings, so a
+    load that skipped or altered rows is treated as a failed batch: it is
+    rolled back to the savepoint and retried through the per-row INSERT
+    path, which keeps the successful/failed counters identical to
+    BatchWriter. The connection must be opened with local_infile=True.
+
+    `binary_columns` ({table: column names}) are BINARY(12) id columns:
+    their bytes are written as hex and UNHEX()ed by the LOAD DATA statement,
+    since raw bytes would go through the file's utf8mb4 conversion. Batches
+    of partitioned tables are loaded INTO TABLE t PARTITION (p).
+    """
+
+    def __init__(self, connection, batch_size: int = INFILE_BATCH_SIZE, staging_dir: Optional[str] = STAGING_DIR,
+                 checkpoint=None, metrics=None, on_reject=None, reconnect=None,
+                 binary_columns: Optional[Dict[str, frozenset]] = None, partitions: Optional[Dict[str, Any]] = None):
+        super().__init__(connection, batch_size, checkpoint, metrics=metrics, on_reject=on_reject,
+                         reconnect=reconnect, partitions=partitions)
+        self.staging_dir = staging_dir
+        self.binary_columns = binary_columns or {}
+        self._load_cache: Dict[Tuple[str, Tuple[str, ...], Optional[str]], str] = {}
+        self._hex_cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[int, ...]] = {}
+
+    def _load_sql(self, table: str, columns: Tuple[str, ...], partition: Optional[str] = None) -> str:
+        key = (table, columns, partition)
+        sql = self._load_cache.get(key)
+        if sql is None:
+            binary = self.binary_columns.get(table, ())
+            column_list = ', '.join(f'@{c}' if c in binary else f'`{c}`' for c in columns)
+            target = f"`{table}` PARTITION (`{partition}`)" if partition else f"`{table}`"
+            sql = (f"LOAD DATA LOCAL INFILE %s INTO TABLE {target} CHARACTER SET utf8mb4 "
+                   f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                   f"({column_list})")
+            unhex = ', '.join(f'`{c}` = UNHEX(@{c})' for c in columns if c in binary)
+            if unhex:
+                sql += f" SET {unhex}"
+            self._load_cache[key] = sql
+        return sql
+
+    def _hex_positions(self, table: str, columns: Tuple[str, ...]) -> Tuple[int, ...]:
+        key = (table, columns)
+        positions = self._hex_cache.get(key)
+        if positions is None:
+            binary = self.binary_columns.get(table, ())
+            positions = self._hex_cache[key] = tuple(i for i, c in enumerate(columns) if c in binary)
+        return positions
+
+    def _bulk_insert(self, table: str, columns: Tuple[str, ...], sql: str, rows: List[Tuple],
+                     partition: Optional[str] = None):
+        if self.staging_dir:
+            os.makedirs(self.staging_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix=f'{table}_', suffix='.tsv', dir=self.staging_dir)
+        try:
+            positions = self._hex_positions(table, columns)
+            with os.fdopen(fd, 'wb') as f:
+                for values in rows:
+                    if positions:
+                        values = list(values)
+                        for i in positions:
+                            if values[i] is not None:
+                                values[i] = values[i].hex()
+                    f.write(b'\t'.join([tsv_field(v) for v in values]))
+                    f.write(b'\n')
+
+            loaded = self.cursor.execute(self._load_sql(table, columns, partition), (path,))
+            self.cursor.execute("SHOW COUNT(*) WARNINGS")
+            warnings = self.cursor.fetchone()[0]
+            if loaded != len(rows) or warnings:
+                raise ValueError(f"LOAD DATA into {table} loaded {loaded}/{len(rows)} rows with {warnings} warnings")
+        finally:
+            os.remove(path)
+
+
+# Bytes that must be backslash-escaped inside a LOAD DATA field
+_TSV_ESCAPES = (
+    (b'\\', b'\\\\'),
+    (b'\t', b'\\t'),
+    (b'\n', b'\\n'),
+    (b'\r', b'\\r'),
+    (b'\x00', b'\\0'),
+)
+
+
+def tsv_field(value: Any) -> bytes:
+    """Encode one value as a LOAD DATA field (\\N for NULL, escaped tabs/newlines)"""
+    if value is None:
+        return b'\\N'
+    if value is True:
+        return b'1'
+    if value is False:
+        return b'0'
+    if isinstance(value, datetime):
+        return datetime_field(value)  # Nothing to escape
+    if isinstance(value, bytes):
+        raw = value
+    elif isinstance(value, Decimal128):
+        value = decimal128_value(value)
+        return b'\\N' if value is None else format(value, 'f').encode('ascii')
+    else:
+        raw = str(value).encode('utf-8')
+
+    for char, escaped in _TSV_ESCAPES:
+        if char in raw:
+            raw = raw.replace(char, escaped)
+    return raw
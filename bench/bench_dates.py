@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for date conversion (dates.py vs the old convert_date)
+Converts the date fields of a synthetic frames + notifications sample the
+way the row builders do, for each way dates show up in a dump:
+native BSON datetimes, mongoexport ISO strings and epoch milliseconds
+(plain ints, and bson.Int64 as decoded from BSON for millis above 2^31).
+Before timing, every shape is checked: the per-value and the column
+(numpy) conversion must give the native datetimes (to the second), and
+the old convert_date must have converted them too.
+
+    python bench/bench_dates.py [--documents 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.int64 import Int64
+from dates import NUMPY_MIN_BATCH, convert_mongo_date, convert_mongo_dates, parse_iso_date
+
+
+def legacy_convert_date(date_value):
+    """convert_date as it was before dates.py, kept as the baseline"""
+    if date_value is None:
+        return None
+    if isinstance(date_value, dict) and '$date' in date_value:
+        date_str = date_value['$date']
+        if isinstance(date_str, str):
+            try:
+                dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+                return dt.strftime('%Y-%m-%d %H:%M:%S')
+            except:
+                return None
+        elif isinstance(date_str, int):
+            dt = datetime.fromtimestamp(date_str / 1000.0)
+            return dt.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(date_value, str):
+        try:
+            dt = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
+            return dt.strftime('%Y-%m-%d %H:%M:%S')
+        except:
+            return date_value
+    return date_value
+
+
+def make_timestamps(count, rng):
+    """Timestamps with the repetition of a real dump: a third are shared
+    (defaults, bulk updates, copied created_at values), the rest unique"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    shared = [start + timedelta(seconds=rng.randrange(3600 * 24 * 365)) for _ in range(500)]
+    return [rng.choice(shared) if rng.random() < 0.33
+            else start + timedelta(milliseconds=rng.randrange(1000 * 3600 * 24 * 365))
+            for _ in range(count)]
+
+
+def wrap(shape):
+    if shape == 'native':
+        return lambda dt: dt.replace(tzinfo=None)
+    if shape == 'iso':
+        return lambda dt: {'$date': dt.strftime('%Y-%m-%dT%H:%M:%S.') + f"{dt.microsecond // 1000:03d}Z"}
+    if shape == 'int64':
+        return lambda dt: {'$date': Int64(int(dt.timestamp() * 1000))}
+    return lambda dt: {'$date': int(dt.timestamp() * 1000)}
+
+
+SHAPES = ('native', 'iso', 'millis', 'int64')
+
+
+def check(shape, count=1000):
+    """Compare both conversion paths of a shape with the native datetimes and the old convert_date"""
+    stamps = make_timestamps(max(count, NUMPY_MIN_BATCH), random.Random(7))
+    expected = [dt.replace(tzinfo=None, microsecond=0) for dt in stamps]
+    values = [wrap(shape)(dt) for dt in stamps]
+    scalar = [convert_mongo_date(value) for value in values]
+    column = convert_mongo_dates(values)
+    if shape == 'native':
+        scalar = [dt.replace(microsecond=0) for dt in scalar]
+        column = [dt.replace(microsecond=0) for dt in column]
+    errors = []
+    if scalar != expected:
+        errors.append('convert_mongo_date')
+    if column != expected:
+        errors.append('convert_mongo_dates')
+    if any(legacy_convert_date(value) is None for value in values):
+        errors.append('legacy convert_date')
+    return errors
+
+
+def make_sample(documents, shape, seed=42):
+    """Frames (with likes/uses) and notifications in one of the date shapes
+
+    As in the real collections, documents that were never edited have
+    updated_at equal to created_at.
+    """
+    rng = random.Random(seed)
+    stamps = iter(make_timestamps(documents * 30, rng))
+    date = wrap(shape)
+
+    def created_updated():
+        created = next(stamps)
+        return date(created), date(created if rng.random() < 0.6 else next(stamps))
+
+    frames = []
+    for _ in range(documents // 4):
+        created, updated = created_updated()
+        frames.append({
+            'created_at': created, 'updated_at': updated, 'approved_at': date(next(stamps)),
+            'like_count': [{'created_at': date(next(stamps))} for _ in range(rng.randrange(0, 16))],
+            'use_count': [{'created_at': date(next(stamps))} for _ in range(rng.randrange(0, 8))],
+        })
+    notifications = []
+    for _ in range(documents - len(frames)):
+        created, updated = created_updated()
+        notifications.append({
+            'created_at': created, 'updated_at': updated,
+            'read_at': date(next(stamps)) if rng.random() < 0.5 else None, 'expires_at': date(next(stamps)),
+        })
+    return frames, notifications
+
+
+def convert_legacy(frames, notifications):
+    for frame in frames:
+        for field in ('created_at', 'updated_at', 'approved_at'):
+            legacy_convert_date(frame[field])
+        for child in frame['like_count'] + frame['use_count']:
+            legacy_convert_date(child['created_at'])
+    for notification in notifications:
+        for field in ('created_at', 'updated_at', 'read_at', 'expires_at'):
+            legacy_convert_date(notification[field])
+
+
+def convert_new(frames, notifications):
+    for frame in frames:
+        for field in ('created_at', 'updated_at', 'approved_at'):
+            convert_mongo_date(frame[field])
+        convert_mongo_dates([child['created_at'] for child in frame['like_count']])
+        convert_mongo_dates([child['created_at'] for child in frame['use_count']])
+    for notification in notifications:
+        for field in ('created_at', 'updated_at', 'read_at', 'expires_at'):
+            convert_mongo_date(notification[field])
+
+
+def best_of(repeat, func, *args, before=None):
+    best = float('inf')
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark date conversion')
+    parser.add_argument('--documents', type=int, default=20000, help='Documents per sample (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, best is kept (default: 5)')
+    args = parser.parse_args()
+
+    failed = False
+    for shape in SHAPES:
+        errors = check(shape)
+        failed = failed or bool(errors)
+        print(f"✗ {shape}: wrong dates from {', '.join(errors)}" if errors else f"✓ {shape}: conversions agree")
+    if failed:
+        sys.exit(1)
+
+    print(f"\n{'shape':<8} {'dates':>8} {'legacy':>10} {'dates.py':>10} {'speedup':>8}")
+    for shape in SHAPES:
+        frames, notifications = make_sample(args.documents, shape)
+        count = sum(3 + len(f['like_count']) + len(f['use_count']) for f in frames) + 4 * len(notifications)
+        legacy = best_of(args.repeat, convert_legacy, frames, notifications)
+        # The cache starts cold on every run, so ISO timings include the misses
+        new = best_of(args.repeat, convert_new, frames, notifications, before=parse_iso_date.cache_clear)
+        print(f"{shape:<8} {count:>8} {legacy * 1e9 / count:>8.0f}ns {new * 1e9 / count:>8.0f}ns "
+              f"{legacy / new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
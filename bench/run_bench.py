@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""
+End-to-end migration benchmark
+Generates a synthetic dump (see synthetic.py), loads it into a scratch
+database on the MySQL/MariaDB server from config.py and times three stages
+per collection:
+
+    decode   reading and decoding the .bson file
+    convert  building the rows with the compiled mappings
+    insert   writing, flushing and committing them with the BatchWriter
+
+Documents go through the stages in chunks so memory stays bounded like in a
+real run. The JSON report (rows/s per stage, peak RSS, wall time, data and
+index size per table, git commit) can be compared with an older one using
+--compare, e.g. VARCHAR(24) against BINARY(12) ids:
+
+    python bench/run_bench.py --scale 0.2 --output bench/results/after.json --compare bench/results/before.json
+    python bench/run_bench.py --scale 0.2 --id-storage binary --compare bench/results/hex.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import pymysql
+from settings import MYSQL_CONFIG, DATA_FILES, MIGRATION_ORDER, LOAD_MODE, BULK_LOAD, ID_STORAGE
+from converter import MongoToMySQLConverter, TRACKED_IDS
+from mappings import MissingReference
+from synthetic import add_arguments, fanout_from_args, generate
+
+STAGES = ('decode', 'convert', 'insert')
+CHUNK_SIZE = 10000  # Documents per decode -> convert -> insert round
+
+
+class BenchConverter(MongoToMySQLConverter):
+    """Converter pointed at the scratch benchmark database"""
+
+    def __init__(self, database: str, **kwargs):
+        super().__init__(**kwargs)
+        self.database = database
+
+    def connection_config(self):
+        config = super().connection_config()
+        config['database'] = self.database
+        return config
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_database(converter: BenchConverter):
+    config = converter.connection_config()
+    database = config.pop('database')
+    connection = pymysql.connect(**config)
+    try:
+        connection.cursor().execute(
+            f"CREATE DATABASE IF NOT EXISTS `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    finally:
+        connection.close()
+
+
+def bench_collection(converter: BenchConverter, collection: str, path: str) -> Dict:
+    """Time decode/convert/insert for one collection file"""
+    mapping = converter.row_builders()[collection]
+    build = mapping.build
+    indexes = [getattr(converter, TRACKED_IDS[reference]) for reference in mapping.references]
+    track = getattr(converter, TRACKED_IDS[collection]) if collection in TRACKED_IDS else None
+    writer = converter.new_writer()
+    seconds = dict.fromkeys(STAGES, 0.0)
+    documents = skipped = 0
+
+    data = converter.iter_bson_file(path)
+    while True:
+        start = time.perf_counter()
+        chunk = list(itertools.islice(data, CHUNK_SIZE))
+        seconds['decode'] += time.perf_counter() - start
+        if not chunk:
+            break
+        documents += len(chunk)
+
+        start = time.perf_counter()
+        rows = []
+        for record in chunk:
+            try:
+                rows.append(build(record, *indexes))
+            except MissingReference:
+                skipped += 1
+        seconds['convert'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for values, children in rows:
+            writer.add_row(mapping.table, mapping.columns, values, children, track=track)
+        writer.flush()
+        writer.commit()
+        seconds['insert'] += time.perf_counter() - start
+
+    # Every stage's rows/s is relative to the rows written (parents + children)
+    rows_written = writer.committed
+    result = {
+        'documents': documents,
+        'skipped': skipped,
+        'rows': rows_written,
+        'failed': writer.failed,
+        'bytes': os.path.getsize(path),
+        'seconds': {stage: round(value, 4) for stage, value in seconds.items()},
+        'rows_per_second': {stage: round(rows_written / value) if value else None
+                            for stage, value in seconds.items()},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    total = sum(seconds.values())
+    print(f"✓ {collection}: {documents} documents, {rows_written} rows in {total:.2f}s "
+          f"(decode {seconds['decode']:.2f}s, convert {seconds['convert']:.2f}s, insert {seconds['insert']:.2f}s)")
+    return result
+
+
+def table_sizes(connection) -> Dict[str, Dict[str, int]]:
+    """{table: {'data_bytes', 'index_bytes'}} from information_schema, after ANALYZE TABLE refreshed it"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() "
+                   "AND TABLE_TYPE = 'BASE TABLE'")
+    tables = [row[0] for row in cursor.fetchall()]
+    if tables:
+        cursor.execute(f"ANALYZE TABLE {', '.join(f'`{table}`' for table in tables)}")
+        cursor.fetchall()
+    cursor.execute("SELECT TABLE_NAME, DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE' ORDER BY TABLE_NAME")
+    sizes = {table: {'data_bytes': int(data or 0), 'index_bytes': int(index or 0)}
+             for table, data, index in cursor.fetchall()}
+    cursor.close()
+    return sizes
+
+
+def _megabytes(sizes: Dict[str, Dict[str, int]], key: str) -> float:
+    return sum(size[key] for size in sizes.values()) / (1024 * 1024)
+
+
+def compare(report: Dict, baseline_file: str):
+    """Print the per-stage speedup and the size change of this report over an older one"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_file} (commit {baseline.get('commit')}): speedup per stage")
+    params = dict(baseline.get('params') or {})
+    storage = params.pop('id_storage', 'hex'), report['params']['id_storage']
+    if params != {key: value for key, value in report['params'].items() if key != 'id_storage'}:
+        print(f"  ⚠ Different parameters: {baseline.get('params')}")
+    if storage[0] != storage[1]:
+        print(f"  Id storage: {storage[0]} -> {storage[1]}")
+    for collection, result in report['collections'].items():
+        old = baseline.get('collections', {}).get(collection)
+        if not old:
+            continue
+        ratios = []
+        for stage in STAGES:
+            before, after = old['seconds'].get(stage), result['seconds'][stage]
+            ratios.append(f"{stage} {before / after:.2f}x" if before and after else f"{stage} -")
+        print(f"  {collection:22s} {', '.join(ratios)}")
+    before, after = baseline.get('wall_seconds'), report['wall_seconds']
+    if before and after:
+        print(f"  {'total wall time':22s} {before / after:.2f}x")
+
+    old_sizes, sizes = baseline.get('table_sizes'), report.get('table_sizes')
+    if old_sizes and sizes:
+        print("Table sizes (MB, before -> after):")
+        for table in sorted(sizes.keys() & old_sizes.keys()):
+            old, new = old_sizes[table], sizes[table]
+            print(f"  {table:28s} data {old['data_bytes'] / 1048576:8.2f} -> {new['data_bytes'] / 1048576:8.2f}, "
+                  f"index {old['index_bytes'] / 1048576:8.2f} -> {new['index_bytes'] / 1048576:8.2f}")
+        for key in ('data_bytes', 'index_bytes'):
+            before, after = _megabytes(old_sizes, key), _megabytes(sizes, key)
+            ratio = f" ({after / before:.2f}x)" if before else ''
+            print(f"  {'total ' + key.split('_')[0]:28s} {before:.2f} MB -> {after:.2f} MB{ratio}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the migration stages against a scratch database')
+    add_arguments(parser)
+    parser.add_argument('--database', default=f"{MYSQL_CONFIG['database']}_bench",
+                        help='Scratch database, dropped and recreated by the schema (default: <database>_bench)')
+    parser.add_argument('--data-dir', help='Keep the generated dump in this directory (default: a temporary one)')
+    parser.add_argument('--reuse-data', action='store_true', help='Use the dump already in --data-dir')
+    parser.add_argument('--load-mode', choices=['insert', 'infile'], default=LOAD_MODE,
+                        help=f'How rows are written (default from config.py: {LOAD_MODE})')
+    parser.add_argument('--bulk-load', action='store_true', default=BULK_LOAD,
+                        help='Defer secondary indexes/foreign keys; their build is timed separately')
+    parser.add_argument('--id-storage', choices=['hex', 'binary'], default=ID_STORAGE,
+                        help=f"ObjectId ids as 'hex' (VARCHAR(24)) or 'binary' (BINARY(12)) (default: {ID_STORAGE})")
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', metavar='REPORT', help='Print the speedup over an older JSON report')
+    args = parser.parse_args()
+
+    if args.database == MYSQL_CONFIG['database']:
+        parser.error('--database must not be the migration target database')
+    if args.reuse_data and not args.data_dir:
+        parser.error('--reuse-data needs --data-dir')
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='snaplove_bench_')
+    fanout = fanout_from_args(args)
+    try:
+        if not args.reuse_data:
+            start = time.perf_counter()
+            generate(data_dir, args.scale, fanout, args.seed)
+            print(f"✓ Generated synthetic dump in {data_dir} ({time.perf_counter() - start:.1f}s)")
+
+        converter = BenchConverter(args.database, load_mode=args.load_mode, bulk_load=args.bulk_load,
+                                   id_storage=args.id_storage)
+        create_database(converter)
+        converter.connection = converter.open_connection()
+        print(f"✓ Connected to MySQL database: {args.database}")
+        wall = time.perf_counter()
+        try:
+            if not converter.execute_schema():
+                sys.exit(1)
+            converter.journal.create(converter.connection, reset=True)
+
+            collections = {}
+            for collection in MIGRATION_ORDER:
+                path = os.path.join(data_dir, DATA_FILES.get(collection, ''))
+                if collection in DATA_FILES and os.path.isfile(path):
+                    collections[collection] = bench_collection(converter, collection, path)
+
+            finalize_seconds = None
+            if args.bulk_load:
+                start = time.perf_counter()
+                converter.finalize_bulk_load()
+                finalize_seconds = round(time.perf_counter() - start, 4)
+            wall_seconds = round(time.perf_counter() - wall, 4)
+            sizes = table_sizes(converter.connection)
+        finally:
+            converter.connection.close()
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'params': {'scale': args.scale, 'seed': args.seed, 'fanout': fanout, 'load_mode': args.load_mode,
+                   'bulk_load': args.bulk_load, 'chunk_size': CHUNK_SIZE, 'id_storage': args.id_storage},
+        'collections': collections,
+        'finalize_bulk_load_seconds': finalize_seconds,
+        'wall_seconds': wall_seconds,
+        'rows': sum(result['rows'] for result in collections.values()),
+        'peak_rss_mb': peak_rss_mb(),
+        'table_sizes': sizes,
+    }
+    print(f"\n✓ {report['rows']} rows in {wall_seconds:.2f}s, peak RSS {report['peak_rss_mb']} MB, "
+          f"{_megabytes(sizes, 'data_bytes'):.1f} MB data + {_megabytes(sizes, 'index_bytes'):.1f} MB indexes")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
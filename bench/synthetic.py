@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+"""
+Synthetic Snaplove mongodump generator for benchmarks
+Writes one .bson file per collection in DATA_FILES with documents shaped
+like the production ones (same fields, enums, nested documents and arrays).
+Counts scale linearly with `scale`; the array sizes per parent (likes, uses,
+comments, stickers, images) are set by the fan-out options.
+
+    python bench/synthetic.py backup_bench --scale 0.5 --likes 50
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from settings import DATA_FILES
+
+# Documents per collection at scale 1.0
+BASE_COUNTS = {
+    'users': 10000,
+    'maintenances': 1,
+    'follows': 30000,
+    'frames': 2000,
+    'tickets': 200,
+    'reports': 200,
+    'photos': 20000,
+    'photocollabs': 500,
+    'photoposts': 5000,
+    'aiphotobooth_usages': 3000,
+    'broadcasts': 20,
+    'notifications': 50000,
+}
+
+# Average array length per parent document
+DEFAULT_FANOUT = {
+    'likes': 20,     # frames.like_count, photoposts.likes
+    'uses': 10,      # frames.use_count
+    'comments': 3,   # photoposts.comments
+    'stickers': 3,   # photocollabs.stickers
+    'images': 2,     # images / video_files / merged_images
+}
+
+ROLES = ('basic', 'verified_basic', 'verified_premium', 'official', 'developer')
+LAYOUTS = ('2x1', '3x1', '4x1')
+NOTIFICATION_TYPES = ('frame_like', 'frame_use', 'frame_approved', 'frame_rejected', 'user_follow',
+                      'frame_upload', 'system', 'birthday', 'broadcast')
+START = datetime(2024, 1, 1)
+
+
+class _Generator:
+    def __init__(self, directory: str, scale: float, fanout: Dict[str, int], seed: int):
+        self.directory = directory
+        self.scale = scale
+        self.fanout = fanout
+        self.rng = random.Random(seed)
+        self.ids = {}
+
+    def count(self, collection: str) -> int:
+        return max(1, int(BASE_COUNTS[collection] * self.scale))
+
+    def spread(self, kind: str) -> int:
+        """Array length around the configured average (0 .. 2x average)"""
+        average = self.fanout[kind]
+        return self.rng.randint(0, 2 * average) if average else 0
+
+    def date(self) -> datetime:
+        # BSON dates have millisecond precision
+        return START + timedelta(milliseconds=self.rng.randrange(600 * 86400 * 1000))
+
+    def pick(self, collection: str) -> ObjectId:
+        return self.rng.choice(self.ids[collection])
+
+    def sample(self, collection: str, k: int):
+        ids = self.ids[collection]
+        return self.rng.sample(ids, min(k, len(ids)))
+
+    def urls(self, prefix: str):
+        return [f'https://cdn.snaplove.example/{prefix}/{ObjectId()}.jpg' for _ in range(self.spread('images'))]
+
+    def write(self, collection: str, documents) -> int:
+        path = os.path.join(self.directory, DATA_FILES[collection])
+        count = 0
+        with open(path, 'wb') as f:
+            for document in documents:
+                f.write(bson.encode(document))
+                count += 1
+        return count
+
+    def timestamps(self) -> Dict[str, datetime]:
+        created = self.date()
+        updated = created if self.rng.random() < 0.6 else created + timedelta(hours=self.rng.randint(1, 2000))
+        return {'created_at': created, 'updated_at': updated}
+
+    # One generator per collection, in MIGRATION_ORDER so references exist
+
+    def users(self):
+        self.ids['users'] = [ObjectId() for _ in range(self.count('users'))]
+        for i, user_id in enumerate(self.ids['users']):
+            yield {
+                '_id': user_id, 'name': f'User {i}', 'username': f'user{i}', 'email': f'user{i}@snaplove.example',
+                'password': '$2b$10$' + 'x' * 53, 'role': self.rng.choice(ROLES), 'bio': 'Hello from Snaplove',
+                'image_profile': f'https://cdn.snaplove.example/avatars/{user_id}.jpg',
+                'use_google_profile': self.rng.random() < 0.3, 'birthdate': self.date(),
+                'ban_status': self.rng.random() < 0.01, 'email_verified': self.rng.random() < 0.8,
+                'google_id': str(self.rng.getrandbits(64)) if self.rng.random() < 0.3 else None,
+                **self.timestamps(),
+            }
+
+    def maintenances(self):
+        for _ in range(self.count('maintenances')):
+            yield {'_id': ObjectId(), 'isActive': False, 'message': 'Scheduled maintenance',
+                   'estimatedEndTime': self.date(), 'updatedBy': self.pick('users'),
+                   'createdAt': self.date(), 'updatedAt': self.date()}
+
+    def follows(self):
+        seen = set()
+        users = self.ids['users']
+        for _ in range(self.count('follows')):
+            pair = (self.rng.choice(users), self.rng.choice(users))
+            if pair[0] == pair[1] or pair in seen:
+                continue
+            seen.add(pair)
+            yield {'_id': ObjectId(), 'follower_id': pair[0], 'following_id': pair[1], 'status': 'active',
+                   **self.timestamps()}
+
+    def frames(self):
+        self.ids['frames'] = [ObjectId() for _ in range(self.count('frames'))]
+        for i, frame_id in enumerate(self.ids['frames']):
+            approved = self.rng.random() < 0.7
+            yield {
+                '_id': frame_id, 'title': f'Frame {i}', 'desc': 'A frame', 'layout_type': self.rng.choice(LAYOUTS),
+                'thumbnail': f'https://cdn.snaplove.example/frames/{frame_id}.jpg', 'images': self.urls('frames'),
+                'tag_label': self.rng.sample(('cute', 'summer', 'love', 'retro', 'kpop', 'birthday'), 2),
+                'official_status': self.rng.random() < 0.1, 'visibility': 'public' if approved else 'private',
+                'approval_status': 'approved' if approved else 'pending',
+                'approved_by': self.pick('users') if approved else None, 'approved_at': self.date() if approved else None,
+                'user_id': self.pick('users'),
+                'like_count': [{'user_id': u, 'created_at': self.date()} for u in self.sample('users', self.spread('likes'))],
+                'use_count': [{'user_id': self.pick('users'), 'created_at': self.date()} for _ in range(self.spread('uses'))],
+                **self.timestamps(),
+            }
+
+    def tickets(self):
+        for _ in range(self.count('tickets')):
+            yield {'_id': ObjectId(), 'title': 'Feedback', 'description': 'Please add more frames',
+                   'user_id': self.pick('users'), 'type': self.rng.choice(('suggestion', 'critics', 'other')),
+                   'priority': self.rng.choice(('low', 'medium', 'high', 'urgent')), 'images': self.urls('tickets'),
+                   **self.timestamps()}
+
+    def reports(self):
+        for _ in range(self.count('reports')):
+            yield {'_id': ObjectId(), 'title': 'Report', 'description': 'Inappropriate frame',
+                   'frame_id': self.pick('frames'), 'user_id': self.pick('users'), **self.timestamps()}
+
+    def photos(self):
+        self.ids['photos'] = [ObjectId() for _ in range(self.count('photos'))]
+        for photo_id in self.ids['photos']:
+            yield {'_id': photo_id, 'title': 'Photo', 'frame_id': self.pick('frames'), 'user_id': self.pick('users'),
+                   'images': self.urls('photos'), 'video_files': self.urls('videos')[:1],
+                   'expires_at': self.date(), 'livePhoto': self.rng.random() < 0.2, 'aiPhoto': self.rng.random() < 0.1,
+                   **self.timestamps()}
+
+    def photocollabs(self):
+        for _ in range(self.count('photocollabs')):
+            yield {
+                '_id': ObjectId(), 'title': 'Collab', 'frame_id': self.pick('frames'),
+                'layout_type': self.rng.choice(LAYOUTS),
+                'inviter': {'user_id': self.pick('users'), 'photo_id': self.pick('photos')},
+                'receiver': {'user_id': self.pick('users'), 'photo_id': self.pick('photos')},
+                'status': 'completed', 'invitation': {'message': 'Join me!', 'sent_at': self.date()},
+                'expires_at': self.date(), 'completed_at': self.date(), 'merged_images': self.urls('collabs'),
+                'stickers': [{
+                    'id': str(ObjectId()), 'type': 'emoji', 'content': '❤',
+                    'position': {'x': self.rng.uniform(0, 500), 'y': self.rng.uniform(0, 800)},
+                    'size': {'width': 64, 'height': 64}, 'rotation': self.rng.uniform(-45, 45),
+                    'added_by': self.pick('users'), 'created_at': self.date(),
+                } for _ in range(self.spread('stickers'))],
+                **self.timestamps(),
+            }
+
+    def photoposts(self):
+        for _ in range(self.count('photoposts')):
+            yield {
+                '_id': ObjectId(), 'title': 'Post', 'desc': 'My new photo', 'photo_id': self.pick('photos'),
+                'user_id': self.pick('users'), 'visibility': 'public', 'view_count': self.rng.randint(0, 5000),
+                'images': self.urls('posts'),
+                'likes': [{'user_id': u, 'created_at': self.date()} for u in self.sample('users', self.spread('likes'))],
+                'comments': [{'_id': ObjectId(), 'user_id': self.pick('users'), 'comment': 'Nice!',
+                              **self.timestamps()} for _ in range(self.spread('comments'))],
+                **self.timestamps(),
+            }
+
+    def aiphotobooth_usages(self):
+        seen = set()
+        for _ in range(self.count('aiphotobooth_usages')):
+            key = (self.pick('users'), self.rng.randint(1, 12), self.rng.choice((2024, 2025)))
+            if key in seen:
+                continue
+            seen.add(key)
+            yield {'_id': ObjectId(), 'user_id': key[0], 'username': 'user', 'count': self.rng.randint(1, 30),
+                   'month': key[1], 'year': key[2], 'last_used_at': self.date(), **self.timestamps()}
+
+    def broadcasts(self):
+        for _ in range(self.count('broadcasts')):
+            yield {
+                '_id': ObjectId(), 'title': 'New frames!', 'message': 'Check out the new frames', 'type': 'announcement',
+                'status': 'sent', 'sent_at': self.date(), 'created_by': self.pick('users'), 'sent_by': self.pick('users'),
+                'target_roles': self.rng.sample(ROLES, 2), 'total_recipients': self.count('users'),
+                'settings': {'persistent': True, 'dismissible': True, 'icon': 'megaphone'},
+                'delivery_stats': {'online_delivery': 10, 'offline_delivery': 90, 'failed_delivery': 0},
+                'metadata': {'version': '2.1.0'},
+                **self.timestamps(),
+            }
+
+    def notifications(self):
+        for _ in range(self.count('notifications')):
+            read = self.rng.random() < 0.5
+            yield {
+                '_id': ObjectId(), 'recipient_id': self.pick('users'), 'sender_id': self.pick('users'),
+                'type': self.rng.choice(NOTIFICATION_TYPES), 'title': 'New like', 'message': 'Someone liked your frame',
+                'is_read': read, 'read_at': self.date() if read else None, 'expires_at': self.date(),
+                'data': {'frame_id': self.pick('frames'), 'frame_title': 'Frame',
+                         'additional_info': {'source': 'bench'} if self.rng.random() < 0.1 else None},
+                **self.timestamps(),
+            }
+
+
+def generate(directory: str, scale: float = 1.0, fanout: Optional[Dict[str, int]] = None,
+             seed: int = 42) -> Dict[str, int]:
+    """Write the synthetic dump to `directory`; returns {collection: documents written}"""
+    os.makedirs(directory, exist_ok=True)
+    generator = _Generator(directory, scale, {**DEFAULT_FANOUT, **(fanout or {})}, seed)
+    # Parents before the collections that reference them
+    order = ('users', 'maintenances', 'follows', 'frames', 'tickets', 'reports', 'photos', 'photocollabs',
+             'photoposts', 'aiphotobooth_usages', 'broadcasts', 'notifications')
+    return {collection: generator.write(collection, getattr(generator, collection)())
+            for collection in order if collection in DATA_FILES}
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Dump size options shared with run_bench.py"""
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the document counts (default: 1.0)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    for kind, average in DEFAULT_FANOUT.items():
+        parser.add_argument(f'--{kind}', type=int, default=average,
+                            help=f'Average {kind} per parent document (default: {average})')
+
+
+def fanout_from_args(args) -> Dict[str, int]:
+    return {kind: getattr(args, kind) for kind in DEFAULT_FANOUT}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Snaplove mongodump')
+    parser.add_argument('directory', help='Output directory for the .bson files')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    counts = generate(args.directory, args.scale, fanout_from_args(args), args.seed)
+    for collection, count in counts.items():
+        print(f"✓ {DATA_FILES[collection]}: {count} documents")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+BSON values written to MySQL as they are
+Documents decoded from .bson files hold datetime, ObjectId, Decimal128 and
+Int64 values. Whatever the row builders pass through unchanged is turned
+into SQL literals here (pymysql encoders, installed on every connection
+through CONVERSIONS), into LOAD DATA fields and into JSON, without a
+detour through strings MySQL has to parse back. Dumps repeat the same
+timestamps a lot, so datetime literals are cached.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Optional
+
+import pymysql.converters
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+from bson.objectid import ObjectId
+
+
+@lru_cache(maxsize=65536)
+def datetime_literal(value: datetime) -> str:
+    """SQL literal of a datetime (pymysql's escape_datetime formats every value from scratch)"""
+    return pymysql.converters.escape_datetime(value)
+
+
+@lru_cache(maxsize=65536)
+def datetime_field(value: datetime) -> bytes:
+    """b'2024-05-01 12:00:00' for LOAD DATA files"""
+    return value.isoformat(' ').encode('ascii')
+
+
+def decimal128_value(value: Decimal128) -> Optional[Decimal]:
+    """The Decimal of a Decimal128; None for NaN and Infinity, which MySQL cannot store"""
+    decimal = value.to_decimal()
+    return decimal if decimal.is_finite() else None
+
+
+def _escape_datetime(value, mapping=None) -> str:
+    return datetime_literal(value)
+
+
+def _escape_object_id(value, mapping=None) -> str:
+    return f"'{value}'"  # 24 hex digits, nothing to escape
+
+
+def _escape_decimal128(value, mapping=None) -> str:
+    decimal = decimal128_value(value)
+    return 'NULL' if decimal is None else format(decimal, 'f')
+
+
+def _escape_int64(value, mapping=None) -> str:
+    return str(int(value))
+
+
+# pymysql.connect(conv=CONVERSIONS): the default conversions plus the BSON types
+CONVERSIONS = dict(pymysql.converters.conversions)
+CONVERSIONS.update({
+    datetime: _escape_datetime,
+    ObjectId: _escape_object_id,
+    Decimal128: _escape_decimal128,
+    Int64: _escape_int64,
+})
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps(default=...) for nested documents stored in JSON columns"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        decimal = decimal128_value(value)
+        return None if decimal is None else float(decimal)
+    if isinstance(value, bytes):  # bson.Binary
+        return value.hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
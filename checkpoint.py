@@ -0,0 +1,99 @@
+"""
+Checkpoint journal for resumable migrations
+Progress is kept in a `_migration_state` table in the target database and
+written in the same transaction as the migrated rows, so after a crash the
+journal never claims more than what was actually committed
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Tuple
+import pymysql
+
+
+class MigrationJournal:
+    """Reads and writes the `_migration_state` table
+
+    One row per collection: how many documents of its BSON stream have been
+    committed, whether the collection is finished and the newest document
+    timestamp migrated so far (the high-water mark used by incremental
+    passes). Methods take the
+    connection to use, so parallel workers record progress on their own
+    connection (inside their own transaction).
+    """
+
+    TABLE = '_migration_state'
+
+    def create(self, connection, reset: bool = False):
+        """Create the journal table (emptied first when `reset` is True)"""
+        cursor = connection.cursor()
+        if reset:
+            cursor.execute(f"DROP TABLE IF EXISTS `{self.TABLE}`")
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS `{self.TABLE}` ("
+            "`collection` VARCHAR(64) PRIMARY KEY, "
+            "`documents_done` BIGINT NOT NULL DEFAULT 0, "
+            "`completed` BOOLEAN NOT NULL DEFAULT FALSE, "
+            "`high_water_mark` DATETIME NULL, "
+            "`updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+        )
+        connection.commit()
+
+    def load(self, connection) -> Dict[str, Tuple[int, bool]]:
+        """Return {collection: (documents_done, completed)}, empty if there is no journal"""
+        cursor = connection.cursor(pymysql.cursors.Cursor)
+        try:
+            cursor.execute(f"SELECT `collection`, `documents_done`, `completed` FROM `{self.TABLE}`")
+        except Exception:
+            connection.rollback()
+            return {}
+        return {collection: (int(done), bool(completed)) for collection, done, completed in cursor.fetchall()}
+
+    def save(self, connection, collection: str, documents_done: int, completed: bool = False):
+        """Record progress; the caller commits it together with the data"""
+        connection.cursor().execute(
+            f"INSERT INTO `{self.TABLE}` (`collection`, `documents_done`, `completed`) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE `documents_done` = VALUES(`documents_done`), `completed` = VALUES(`completed`)",
+            (collection, documents_done, completed)
+        )
+
+    def load_high_water(self, connection) -> Dict[str, datetime]:
+        """Return {collection: newest migrated document timestamp}"""
+        cursor = connection.cursor(pymysql.cursors.Cursor)
+        cursor.execute(f"SELECT `collection`, `high_water_mark` FROM `{self.TABLE}` "
+                       "WHERE `high_water_mark` IS NOT NULL")
+        return dict(cursor.fetchall())
+
+    def save_high_water(self, connection, collection: str, high_water_mark: datetime):
+        """Record a collection's high-water mark; the caller commits"""
+        connection.cursor().execute(
+            f"INSERT INTO `{self.TABLE}` (`collection`, `high_water_mark`) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE `high_water_mark` = VALUES(`high_water_mark`)",
+            (collection, high_water_mark)
+        )
+
+
+class Checkpoint:
+    """Progress of one collection while it is being migrated
+
+    `track()` counts the documents handed to a migration method. BatchWriter
+    calls `save()` in place of each commit, i.e. after the flush that
+    reaches COMMIT_EVERY_ROWS rows or COMMIT_EVERY_SECONDS seconds (not
+    after every flush), plus the final one. It records the count and
+    commits, so a committed batch and its journal entry always go together;
+    a resumed run restarts after the last commit, not the last flush.
+    """
+
+    def __init__(self, journal: MigrationJournal, collection: str, documents_done: int = 0):
+        self.journal = journal
+        self.collection = collection
+        self.documents_done = documents_done
+
+    def track(self, documents: Iterable) -> Iterator:
+        for doc in documents:
+            self.documents_done += 1
+            yield doc
+
+    def save(self, connection):
+        self.journal.save(connection, self.collection, self.documents_done)
+        connection.commit()
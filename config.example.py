@@ -31,18 +31,110 @@ MYSQL_CONFIG = {
 # ============================================================
 # Paths to data directory and schema file
 # Usually no need to change these unless you have custom directory structure
+# The schema is generated from mappings.py (schema.sql is a copy of it, see
+# schema_gen.py). Set SCHEMA_FILE to run a hand-written SQL script instead,
+# e.g. os.path.join(BASE_DIR, 'schema.sql').
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'backup_data')  # Directory containing BSON files
-SCHEMA_FILE = os.path.join(BASE_DIR, 'schema.sql')  # SQL schema file
+SCHEMA_FILE = None  # SQL schema file (None = generate from mappings.py)
 
 # ============================================================
 # Migration Settings
 # ============================================================
 
-BATCH_SIZE = 1000  # Number of records to insert at once (adjust for performance)
+BATCH_SIZE = 1000  # Rows per multi-row INSERT statement, per target table (adjust for performance)
 VERBOSE = True     # Print detailed logs during migration (set to False for less output)
 
+# Skipped/failed documents are counted by reason (printed under each
+# collection's summary line); the per-document details are written to
+# REJECTS_FILE in the background, one JSON line each (None = counts only),
+# and the documents themselves to DEAD_LETTER_DIR/<collection>.rejects.bson
+# so they can be re-migrated later with: python converter.py --replay
+# Progress lines are printed at most every PROGRESS_INTERVAL seconds per
+# collection (None = off).
+REJECTS_FILE = os.path.join(BASE_DIR, 'migration_rejects.jsonl')
+DEAD_LETTER_DIR = os.path.join(BASE_DIR, 'dead_letter')  # Rejected documents as BSON, for --replay (None = off)
+PROGRESS_INTERVAL = 10
+
+# Transaction size: each collection is committed every COMMIT_EVERY_ROWS
+# inserted rows (parents + children) or every COMMIT_EVERY_SECONDS seconds,
+# whichever comes first (checked after each batch). A failure only rolls back
+# the rows since the last commit. Set either to None to disable that trigger.
+COMMIT_EVERY_ROWS = 50000
+COMMIT_EVERY_SECONDS = 30
+
+# How converted rows are written:
+#   'insert' - multi-row INSERT statements of BATCH_SIZE rows
+#   'infile' - rows are streamed to temporary TSV files and bulk-loaded with
+#              LOAD DATA LOCAL INFILE (needs local_infile=1 on the MySQL server)
+LOAD_MODE = 'insert'
+INFILE_BATCH_SIZE = 50000  # Rows per staging file / LOAD DATA statement in 'infile' mode
+STAGING_DIR = None         # Directory for TSV staging files (None = system temp dir)
+
+# Bulk-load mode: tables are created with only their primary/unique keys,
+# data is loaded with the session settings below, and the secondary INDEXes
+# and FOREIGN KEYs of the schema are added afterwards (one ALTER TABLE per
+# table). Foreign keys stay valid because the converter validates them
+# itself. UNIQUE keys stay checked, so duplicate likes/follows and usernames
+# are still rejected. Only add 'unique_checks': 0 if the dump is known to
+# have no duplicates: InnoDB may then skip the check and load them silently.
+BULK_LOAD = False
+BULK_LOAD_SESSION = {
+    'foreign_key_checks': 0,
+    'sql_log_bin': 0,   # Skipped with a warning if the user lacks SUPER/SYSTEM_VARIABLES_ADMIN
+}
+
+# The schema is run on up to SCHEMA_WORKERS connections: DROP/CREATE TABLE
+# statements that do not depend on each other through a FOREIGN KEY run at
+# the same time (children are dropped before and created after their
+# parents), and so do the deferred ALTER TABLEs of bulk-load mode.
+# 1 = run every statement in order on one connection.
+SCHEMA_WORKERS = 4
+
+# How ObjectId ids (and the columns referencing them) are stored:
+#   'hex'    - VARCHAR(24), the 24 hex digits
+#   'binary' - BINARY(12), the raw 12 bytes: smaller primary keys, foreign
+#              keys and indexes. Read them with the oid_hex()/oid_from_hex()
+#              SQL functions created with the schema, e.g.
+#              SELECT oid_hex(id) FROM users WHERE id = oid_from_hex('...')
+# --resume, --incremental and --replay follow the type of the existing tables.
+ID_STORAGE = 'hex'
+
+# Range partitioning of the time-series tables on created_at: table -> 'month'
+# or 'year'. Each year of PARTITION_YEARS (first, last) gets its own
+# partitions, plus p_before and p_future for older and newer rows; the
+# writers send every batch to a single partition. MySQL requires created_at
+# (NOT NULL) in the primary and UNIQUE keys of a partitioned table and allows
+# no FOREIGN KEYs on it; the converter validates the references itself, and
+# rows without created_at get the time of their ObjectId (the parent's for
+# likes/uses). Needs the schema generated from mappings.py (SCHEMA_FILE = None).
+# --resume, --incremental and --replay follow the partitions of the existing tables.
+PARTITIONED_TABLES = {
+    # 'notifications': 'month',
+    # 'frame_uses': 'month',
+    # 'frame_likes': 'year',
+    # 'photopost_likes': 'year',
+}
+PARTITION_YEARS = (2024, 2027)
+
+# ============================================================
+# Connections
+# ============================================================
+# Every worker takes its own connection from a small pool. A pooled
+# connection idle for more than POOL_PING_AFTER seconds is pinged before it
+# is used again and reopened if the server closed it (wait_timeout).
+# Deadlocks (1213), lock wait timeouts (1205) and lost connections
+# (2006/2013) while writing do not fail the collection: the uncommitted
+# batches are replayed (on a new connection if needed) and the batch is
+# retried, up to RETRY_ATTEMPTS times, waiting RETRY_BACKOFF seconds and
+# doubling the wait each time.
+
+POOL_MAX_IDLE = 8     # Idle connections kept open for reuse
+POOL_PING_AFTER = 30  # Seconds (None = never ping)
+RETRY_ATTEMPTS = 5
+RETRY_BACKOFF = 0.5
+
 # ============================================================
 # File Mapping
 # ============================================================
@@ -86,6 +178,69 @@ MIGRATION_ORDER = [
     'notifications',            # Depends on users (must be last)
 ]
 
+# ============================================================
+# Parallel Migration
+# ============================================================
+# With PARALLEL_WORKERS > 1 a collection starts as soon as every collection
+# its foreign keys reference (as declared in mappings.py, like the generated
+# schema) has been committed, each worker using its own MySQL connection.
+
+PARALLEL_WORKERS = 1  # Collections migrated at the same time (1 = strictly follow MIGRATION_ORDER)
+
+# ============================================================
+# Sharded Collections
+# ============================================================
+# Very large collections can be split across several worker processes,
+# each converting and inserting its share over its own MySQL connection.
+# Maps collection name -> number of shards (processes). Collections not
+# listed here are migrated by a single worker.
+
+SHARDED_COLLECTIONS = {
+    # 'notifications': 4,
+    # 'frames': 4,
+}
+SHARD_CHUNK_SIZE = 10000  # Documents handed to a shard worker at a time
+
+# ============================================================
+# Pipelined Collections
+# ============================================================
+# A large collection can instead run as a pipeline of three stages: the
+# migration process reads the dump as raw BSON chunks, worker processes
+# decode and convert them to rows (against a read-only shared-memory copy
+# of the foreign key sets), and PIPELINE_WRITERS threads insert the rows,
+# each over its own MySQL connection. The stages are connected by bounded
+# queues (two chunks per worker process), so decoding/converting and
+# waiting on MySQL overlap while memory stays bounded. Maps collection
+# name -> number of converter processes; takes precedence over
+# SHARDED_COLLECTIONS. Only .bson files are pipelined.
+
+PIPELINED_COLLECTIONS = {
+    # 'notifications': 4,
+}
+PIPELINE_WRITERS = 2        # Writer threads (connections) per pipelined collection
+PIPELINE_CHUNK_SIZE = 5000  # Documents per raw BSON chunk handed to a converter process
+
+# ============================================================
+# Stage Metrics
+# ============================================================
+# A table of per-collection stage timings (read, decode, convert, fk,
+# execute, commit) is printed at the end of every run. Set a path to also
+# write them to a file: '*.prom' gives a Prometheus textfile (for
+# node_exporter's textfile collector), anything else JSON.
+
+METRICS_FILE = None  # e.g. 'migration_metrics.json' or '/var/lib/node_exporter/textfile/snaplove.prom'
+
+# ============================================================
+# Verification
+# ============================================================
+# verify_migration.py compares the dump with the target database using
+# VERIFY_WORKERS processes (reading the dump) and as many MySQL connections
+# (checksum queries). Row checksums are compared per bucket of documents;
+# more buckets narrow a difference down further.
+
+VERIFY_WORKERS = 4
+VERIFY_BUCKETS = 64
+
 # ============================================================
 # Notes:
 # ============================================================
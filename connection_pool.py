@@ -0,0 +1,192 @@
+"""
+MySQL connection pool with health checks, reconnect and retry
+Every worker (thread) takes its own connection from the pool and hands it
+back when done. Connections that sat idle are pinged before reuse and
+reopened if the server dropped them (wait_timeout), and opening a
+connection is retried with exponential backoff while the server is
+unreachable.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Tuple
+
+import pymysql
+from settings import POOL_MAX_IDLE, POOL_PING_AFTER, RETRY_ATTEMPTS, RETRY_BACKOFF, VERBOSE
+
+# Errors after which the same work can simply be run again
+RETRYABLE_ERRORS = {
+    1205: 'lock wait timeout',
+    1213: 'deadlock',
+    2006: 'MySQL server has gone away',
+    2013: 'lost connection to MySQL server',
+}
+# The connection is unusable after these and has to be reopened
+CONNECTION_LOST = {2006, 2013}
+# Opening a connection failed but may work a little later
+CONNECT_ERRORS = {2002, 2003, 2006, 2013}
+
+
+def error_code(error: BaseException) -> Optional[int]:
+    args = getattr(error, 'args', ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, pymysql.err.MySQLError) and error_code(error) in RETRYABLE_ERRORS
+
+
+def connection_lost(error: BaseException) -> bool:
+    return isinstance(error, pymysql.err.MySQLError) and error_code(error) in CONNECTION_LOST
+
+
+def backoff(attempt: int, base: float = RETRY_BACKOFF) -> float:
+    """Seconds to wait before retry number `attempt` (1, 2, ...): doubling, with jitter, at most 30s"""
+    return min(30.0, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def describe(error: BaseException) -> str:
+    code = error_code(error)
+    return f"MySQL {code} ({RETRYABLE_ERRORS[code]})" if code in RETRYABLE_ERRORS else str(error)
+
+
+class ConnectionPool:
+    """Hands out one connection per worker and takes care of dead ones
+
+    `connect()` opens a new connection with the session settings the caller
+    needs (e.g. the bulk-load session); it is called again whenever a
+    connection has to be replaced, so a reconnected session looks the same.
+    Up to `max_idle` returned connections are kept open for the next
+    acquire(); a connection idle for more than `ping_after` seconds is
+    pinged first. The pool never blocks: a worker that finds no idle
+    connection gets a new one.
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_idle: int = POOL_MAX_IDLE,
+                 ping_after: Optional[float] = POOL_PING_AFTER, attempts: int = RETRY_ATTEMPTS):
+        self.connect = connect
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self.attempts = max(1, attempts)
+        self._idle: List[Tuple[Any, float]] = []  # (connection, returned at)
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open a new connection, retrying with backoff while the server cannot be reached"""
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return self.connect()
+            except pymysql.err.OperationalError as e:
+                if error_code(e) not in CONNECT_ERRORS or attempt == self.attempts:
+                    raise
+                delay = backoff(attempt)
+                if VERBOSE:
+                    print(f"  ⚠ Could not connect to MySQL ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def acquire(self):
+        """A healthy connection for the calling worker: an idle one if available, else a new one"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, returned = self._idle.pop()
+            if self.ping_after is None or time.monotonic() - returned < self.ping_after:
+                return connection
+            if self.healthy(connection):
+                return connection
+            self.discard(connection)
+        return self.open()
+
+    def release(self, connection, discard: bool = False):
+        """Give a connection back; it is closed when `discard`, broken or the pool is full"""
+        if connection is None:
+            return
+        if not discard and connection.open:
+            try:
+                connection.rollback()  # Never hand out a connection in the middle of a transaction
+            except Exception:
+                discard = True
+            with self._lock:
+                if not discard and len(self._idle) < self.max_idle:
+                    self._idle.append((connection, time.monotonic()))
+                    return
+        self.discard(connection)
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as connection: ... (discarded instead of reused if it was lost)"""
+        connection = self.acquire()
+        try:
+            yield connection
+        except Exception as e:
+            self.release(connection, discard=connection_lost(e))
+            raise
+        self.release(connection)
+
+    def check(self, connection):
+        """`connection` if it still answers, otherwise a new one (for connections held across idle periods)"""
+        if connection is not None and self.healthy(connection):
+            return connection
+        self.discard(connection)
+        return self.open()
+
+    def reconnect(self, connection):
+        """Replace a lost connection with a new one"""
+        self.discard(connection)
+        return self.open()
+
+    def run(self, operation: Callable[[Any], Any]):
+        """Run operation(connection) on a pooled connection and commit, retrying on retryable errors
+
+        Only for work that can simply be repeated (reads, idempotent writes):
+        after a deadlock or a lost connection the whole operation runs again.
+        """
+        for attempt in range(1, self.attempts + 1):
+            connection = self.acquire()
+            try:
+                result = operation(connection)
+                connection.commit()
+            except Exception as e:
+                lost = connection_lost(e)
+                if not lost:
+                    try:
+                        connection.rollback()
+                    except Exception:
+                        lost = True
+                self.release(connection, discard=lost)
+                if not is_retryable(e) or attempt == self.attempts:
+                    raise
+                delay = backoff(attempt)
+                if VERBOSE:
+                    print(f"  ⚠ {describe(e)}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.release(connection)
+            return result
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self.discard(connection)
+
+    @staticmethod
+    def healthy(connection) -> bool:
+        try:
+            connection.ping(reconnect=False)  # Reconnecting here would lose the session settings
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def discard(connection):
+        if connection is None:
+            return
+        try:
+            connection.close()
+        except Exception:
+            pass  # Already closed by the server
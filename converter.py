@@ -4,37 +4,169 @@ MongoDB to MySQL Migration Script
 Converts JSON exported data from MongoDB to MySQL database
 """
 
+import argparse
+import copy
+import functools
+import itertools
 import json
+import multiprocessing
 import os
+import queue
+import shutil
 import sys
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
 import pymysql
-from pymysql.cursors import DictCursor
 import bson
-from config import MYSQL_CONFIG, DATA_DIR, SCHEMA_FILE, BATCH_SIZE, VERBOSE, DATA_FILES, MIGRATION_ORDER
+from settings import (MYSQL_CONFIG, DATA_DIR, SCHEMA_FILE, VERBOSE, DATA_FILES, MIGRATION_ORDER, PARALLEL_WORKERS,
+                      SHARDED_COLLECTIONS, SHARD_CHUNK_SIZE, PIPELINED_COLLECTIONS, PIPELINE_WRITERS,
+                      PIPELINE_CHUNK_SIZE, LOAD_MODE, BULK_LOAD, BULK_LOAD_SESSION, METRICS_FILE, REJECTS_FILE,
+                      DEAD_LETTER_DIR, SCHEMA_WORKERS, ID_STORAGE, PARTITIONED_TABLES, PARTITION_YEARS)
+from batch_writer import BatchWriter, InfileWriter
+from bson_values import CONVERSIONS
+from connection_pool import ConnectionPool
+from schema_gen import generate_statements
+from schema_tools import split_statements, schema_variant, statement_dependencies, OBJECT_ID_FUNCTIONS
+from checkpoint import MigrationJournal, Checkpoint
+from id_index import IdIndex, SharedIdIndex, object_id_key
+from dates import convert_mongo_date, convert_mongo_dates
+from mappings import MAPPINGS, CompiledMapping, compile_mappings, child_tables, id_columns, collection_dependencies
+from metrics import MigrationMetrics, CollectionMetrics, TimedIndex, FK_SAMPLE_EVERY
+from partitions import PARTITION_UNITS, PartitionLayout, describe_partitions, partition_layouts, stored_partitions
+from progress import Progress, RejectLog, reject_reason, dead_letter_path
+
+# Collections whose inserted IDs are tracked for foreign key validation
+TRACKED_IDS = {
+    'users': 'inserted_user_ids',
+    'frames': 'inserted_frame_ids',
+    'photos': 'inserted_photo_ids',
+}
+
+# Names used in the per-collection summary lines
+COLLECTION_LABELS = {collection: mapping.title for collection, mapping in MAPPINGS.items()}
+
+# Child tables filled from a parent document's arrays, with the column that
+# points back at the parent (replaced as a whole when a parent is re-migrated)
+CHILD_TABLES = child_tables(MAPPINGS)
+
+# ObjectId columns per table (BINARY(12) with ID_STORAGE = 'binary')
+ID_COLUMNS = id_columns(MAPPINGS)
+ID_STORAGE_TYPES = {'hex': 'VARCHAR(24)', 'binary': 'BINARY(12)'}
+
+# Reject reasons listed under a collection's summary line (all of them are in the metrics file)
+REJECT_REASONS_SHOWN = 10
+
+# Fields checked, in order, for a document's last-modified time (incremental mode)
+TIMESTAMP_FIELDS = ('updated_at', 'updatedAt', 'created_at', 'createdAt')
 
 
 class MongoToMySQLConverter:
     """Handles conversion of MongoDB JSON data to MySQL"""
     
-    def __init__(self):
+    def __init__(self, load_mode: str = LOAD_MODE, bulk_load: bool = BULK_LOAD, incremental: bool = False,
+                 metrics_file: Optional[str] = METRICS_FILE, rejects_file: Optional[str] = REJECTS_FILE,
+                 dead_letter_dir: Optional[str] = DEAD_LETTER_DIR, schema_workers: int = SCHEMA_WORKERS,
+                 secondary_indexes: bool = True, id_storage: str = ID_STORAGE,
+                 partitions: Optional[Dict[str, PartitionLayout]] = None):
+        if id_storage not in ID_STORAGE_TYPES:
+            raise ValueError(f"id_storage must be one of {', '.join(ID_STORAGE_TYPES)}, not {id_storage!r}")
         self.connection = None
+        self.pool = ConnectionPool(self.open_connection)  # Per-worker connections, see connection_pool.py
+        self.load_mode = load_mode  # 'insert' (multi-row INSERT) or 'infile' (LOAD DATA LOCAL INFILE)
+        self.bulk_load = bulk_load  # Defer secondary indexes/FKs and relax session checks while loading
+        self.schema_workers = schema_workers  # Connections running independent DDL statements at the same time
+        self.secondary_indexes = secondary_indexes  # False = create tables without their plain INDEXes
+        self.id_storage = id_storage  # 'hex' (VARCHAR(24)) or 'binary' (BINARY(12), raw ObjectId bytes)
+        # table -> PartitionLayout: tables created PARTITION BY RANGE and written one partition per batch
+        self.partitions = partition_layouts(PARTITIONED_TABLES, PARTITION_YEARS) if partitions is None else partitions
+        self.journal = MigrationJournal()
+        self.resume_state = {}  # collection -> (documents_done, completed) from the journal
+        self.checkpoint = None  # Checkpoint of the collection currently being migrated
+        self.incremental = incremental  # Upsert documents changed since the last run instead of a full load
+        self.high_water_marks = {}  # collection -> newest document timestamp migrated
         self.stats = {
             'total_records': 0,
             'successful': 0,
             'failed': 0,
             'by_collection': {}
         }
+        self._stats_lock = threading.Lock()
+        self.metrics = MigrationMetrics()  # Per-stage timings, see metrics.py
+        self.metrics_file = metrics_file  # Also write them here (.prom = Prometheus textfile, else JSON)
+        self.rejects_file = rejects_file  # One JSON line per skipped/failed document
+        self.dead_letter_dir = dead_letter_dir  # Rejected documents as BSON, per collection (for --replay)
+        self.reject_log = None  # RejectLog writing rejects_file/dead_letter_dir while a run is in progress
+        self.quiet = False  # Suppress per-collection summary lines (shard workers)
         # Track successfully inserted IDs for foreign key validation
-        self.inserted_user_ids = set()
-        self.inserted_frame_ids = set()
-        self.inserted_photo_ids = set()
+        self.inserted_user_ids = IdIndex()
+        self.inserted_frame_ids = IdIndex()
+        self.inserted_photo_ids = IdIndex()
+        self._row_builders = None  # collection -> CompiledMapping, see row_builders()
+    
+    def connection_config(self) -> Dict[str, Any]:
+        """pymysql.connect() arguments for this run"""
+        config = dict(MYSQL_CONFIG)
+        config['conv'] = CONVERSIONS  # Binds BSON values (datetime, ObjectId, Decimal128, Int64) directly
+        if self.load_mode == 'infile':
+            config['local_infile'] = True
+        return config
+    
+    def open_connection(self):
+        """Open a new connection with this run's settings (workers take theirs from self.pool)"""
+        connection = pymysql.connect(**self.connection_config())
+        if self.bulk_load:
+            self.apply_bulk_load_session(connection)
+        return connection
+    
+    def reconnect(self, connection):
+        """Replace this converter's lost connection (called by BatchWriter before it replays a transaction)"""
+        self.connection = self.pool.reconnect(connection)
+        return self.connection
+    
+    @staticmethod
+    def apply_bulk_load_session(connection):
+        """Relax per-row checks for this session while bulk loading
+        
+        The settings come from BULK_LOAD_SESSION: by default foreign_key_checks
+        is turned off (the converter's own inserted_*_ids sets keep foreign
+        keys valid) and binary logging is skipped when the user is allowed to
+        change sql_log_bin. UNIQUE keys stay checked unless unique_checks=0 is
+        added there.
+        """
+        cursor = connection.cursor()
+        assignments = ', '.join(f'{name}={value}' for name, value in BULK_LOAD_SESSION.items()
+                                if name != 'sql_log_bin')
+        if assignments:
+            cursor.execute(f"SET SESSION {assignments}")
+        if 'sql_log_bin' in BULK_LOAD_SESSION:
+            try:
+                cursor.execute(f"SET SESSION sql_log_bin={BULK_LOAD_SESSION['sql_log_bin']}")
+            except pymysql.err.MySQLError as e:
+                if VERBOSE:
+                    print(f"  ⚠ Could not change sql_log_bin (needs SUPER/SYSTEM_VARIABLES_ADMIN): {e}")
+        cursor.close()
+    
+    def new_writer(self, metrics: Optional[CollectionMetrics] = None, on_reject=None) -> BatchWriter:
+        """Create the row writer for one collection according to load_mode"""
+        if self.incremental:
+            # Delta passes are small and must update rows in place, so always upsert
+            return BatchWriter(self.connection, upsert=True, child_tables=CHILD_TABLES, metrics=metrics,
+                               on_reject=on_reject, reconnect=self.reconnect, partitions=self.partitions)
+        if self.load_mode == 'infile':
+            return InfileWriter(self.connection, checkpoint=self.checkpoint, metrics=metrics, on_reject=on_reject,
+                                reconnect=self.reconnect,
+                                binary_columns=ID_COLUMNS if self.id_storage == 'binary' else None,
+                                partitions=self.partitions)
+        return BatchWriter(self.connection, checkpoint=self.checkpoint, metrics=metrics, on_reject=on_reject,
+                           reconnect=self.reconnect, partitions=self.partitions)
     
     def connect(self):
         """Establish MySQL connection"""
         try:
-            self.connection = pymysql.connect(**MYSQL_CONFIG)
+            self.connection = self.pool.acquire()
             print(f"✓ Connected to MySQL database: {MYSQL_CONFIG['database']}")
             return True
         except pymysql.err.OperationalError as e:
@@ -43,7 +175,7 @@ class MongoToMySQLConverter:
                 print(f"⚠ Database '{MYSQL_CONFIG['database']}' does not exist. Creating it...")
                 try:
                     # Connect without specifying database
-                    temp_config = MYSQL_CONFIG.copy()
+                    temp_config = self.connection_config()
                     db_name = temp_config.pop('database')
                     temp_connection = pymysql.connect(**temp_config)
                     cursor = temp_connection.cursor()
@@ -56,7 +188,7 @@ class MongoToMySQLConverter:
                     temp_connection.close()
                     
                     # Now connect to the newly created database
-                    self.connection = pymysql.connect(**MYSQL_CONFIG)
+                    self.connection = self.pool.acquire()
                     print(f"✓ Connected to MySQL database: {MYSQL_CONFIG['database']}")
                     return True
                 except Exception as create_error:
@@ -72,99 +204,397 @@ class MongoToMySQLConverter:
     def close(self):
         """Close MySQL connection"""
         if self.connection:
-            self.connection.close()
+            self.pool.release(self.connection, discard=True)
+            self.connection = None
             print("✓ MySQL connection closed")
+        self.pool.close()
+    
+    def schema_source(self) -> List[str]:
+        """DROP/CREATE TABLE statements: SCHEMA_FILE if set, else generated from mappings.py (with partitions)"""
+        if SCHEMA_FILE:
+            with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
+                return split_statements(f.read())
+        return generate_statements(partitions=self.partitions)
+    
+    def schema_statements(self):
+        """Return the schema as (statements to run now, deferred ALTER TABLE statements)
+        
+        In bulk-load mode tables are created with only their primary and
+        unique keys; secondary INDEXes and FOREIGN KEYs are returned as one
+        ALTER TABLE per table to run after the data is loaded. Without
+        secondary_indexes the plain INDEXes are left out altogether. With
+        id_storage 'binary' the ObjectId columns become BINARY(12).
+        """
+        return schema_variant(self.schema_source(), binary_ids=self.id_storage == 'binary',
+                              bulk_load=self.bulk_load, secondary_indexes=self.secondary_indexes)
+    
+    def run_ddl(self, statements: List[str], on_done=None) -> Dict[int, Optional[BaseException]]:
+        """Run DDL statements, independent ones at the same time on schema_workers connections
+        
+        A statement waits for the earlier statements it depends on (see
+        schema_tools.statement_dependencies); scripts that cannot be ordered
+        that way run serially on self.connection. A failed statement skips
+        everything that depends on it. `on_done(connection, index)` runs after
+        each successful statement, before its commit.
+        
+        Returns {statement index: error} of the failed statements, with None
+        for the ones that were skipped.
+        """
+        dependencies = statement_dependencies(statements)
+        workers = self.schema_workers
+        if dependencies is None:
+            dependencies = [{index - 1} if index else set() for index in range(len(statements))]
+            workers = 1
+        failures = {}
+        
+        def execute(connection, index):
+            try:
+                cursor = connection.cursor()
+                cursor.execute(statements[index])
+                cursor.close()
+                if on_done is not None:
+                    on_done(connection, index)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        
+        self.connection = self.pool.check(self.connection)
+        if workers <= 1:
+            for index in range(len(statements)):
+                if dependencies[index] & failures.keys():
+                    failures[index] = None
+                    continue
+                try:
+                    execute(self.connection, index)
+                except Exception as e:
+                    failures[index] = e
+            return failures
+        
+        local = threading.local()
+        connections = []
+        
+        def execute_in_worker(index):
+            connection = getattr(local, 'connection', None)
+            if connection is None:
+                connection = local.connection = self.pool.acquire()
+                connections.append(connection)
+            execute(connection, index)
+        
+        pending = dict(enumerate(dependencies))
+        done = set()
+        running = {}
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                while pending or running:
+                    for index in [i for i, parents in pending.items() if parents <= done]:
+                        del pending[index]
+                        if dependencies[index] & failures.keys():
+                            failures[index] = None
+                            done.add(index)
+                        else:
+                            running[pool.submit(execute_in_worker, index)] = index
+                    if not running:
+                        continue
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        index = running.pop(future)
+                        if future.exception() is not None:
+                            failures[index] = future.exception()
+                        done.add(index)
+        finally:
+            for connection in connections:
+                self.pool.release(connection)
+        return failures
     
     def execute_schema(self):
-        """Execute SQL schema file to create tables"""
-        if not os.path.exists(SCHEMA_FILE):
+        """Create the tables (see schema_source)"""
+        if SCHEMA_FILE and not os.path.exists(SCHEMA_FILE):
             print(f"✗ Schema file not found: {SCHEMA_FILE}")
             return False
+        if SCHEMA_FILE and self.partitions:
+            print(f"⚠ Partitioning needs the schema generated from mappings.py (SCHEMA_FILE = None); "
+                  f"{', '.join(self.partitions)} will not be partitioned")
+            self.partitions = {}
+            self._row_builders = None
         
         try:
-            with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
-                schema_sql = f.read()
-            
-            cursor = self.connection.cursor()
-            
-            # Split by semicolon and execute each statement
-            statements = [s.strip() for s in schema_sql.split(';') if s.strip()]
-            
-            for statement in statements:
-                if statement:
-                    cursor.execute(statement)
+            statements, deferred = self.schema_statements()
+            failures = self.run_ddl(statements)
+            for index, error in sorted(failures.items()):
+                if error is not None:
+                    print(f"✗ Failed to execute schema: {error}")
+                    print(f"  Statement: {statements[index][:80]}...")
+            if failures:
+                return False
             
-            self.connection.commit()
             print(f"✓ Database schema created successfully ({len(statements)} statements)")
+            if self.id_storage == 'binary':
+                self.create_id_functions()
+            if self.partitions:
+                print(f"  Partitioned by created_at: {describe_partitions(self.partitions)}")
+            if deferred:
+                print(f"  Bulk load: {len(deferred)} tables will get their indexes and foreign keys after loading")
             return True
         except Exception as e:
             print(f"✗ Failed to execute schema: {e}")
             self.connection.rollback()
             return False
     
-    def load_data_file(self, filename: str) -> List[Dict]:
-        """Load data from JSON or BSON file"""
-        filepath = os.path.join(DATA_DIR, filename)
+    def create_id_functions(self):
+        """Create oid_hex()/oid_from_hex() for reading BINARY(12) ids (only warns when not allowed)"""
+        try:
+            cursor = self.connection.cursor()
+            for statement in OBJECT_ID_FUNCTIONS:
+                cursor.execute(statement)
+            cursor.close()
+            self.connection.commit()
+            print("  Ids stored as BINARY(12); oid_hex(id) / oid_from_hex('...') convert them for queries")
+        except pymysql.err.MySQLError as e:
+            self.connection.rollback()
+            # Creating functions needs CREATE ROUTINE (and log_bin_trust_function_creators with binary logging)
+            print(f"  ⚠ Could not create oid_hex()/oid_from_hex() ({e}); use LOWER(HEX(id)) and UNHEX('...') instead")
+    
+    @staticmethod
+    def stored_id_storage(connection) -> Optional[str]:
+        """'hex' or 'binary' as the existing users table stores its ids, None if there is no such table"""
+        cursor = connection.cursor(pymysql.cursors.Cursor)
+        cursor.execute("SELECT DATA_TYPE FROM information_schema.COLUMNS "
+                       "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'id'")
+        row = cursor.fetchone()
+        cursor.close()
+        connection.commit()
+        if row is None:
+            return None
+        data_type = row[0].decode() if isinstance(row[0], bytes) else row[0]
+        return 'binary' if data_type.lower() == 'binary' else 'hex'
+    
+    def match_id_storage(self):
+        """Write ids the way the existing tables store them (resumed, incremental and replay runs)"""
+        try:
+            stored = self.stored_id_storage(self.connection)
+        except pymysql.err.MySQLError as e:
+            print(f"⚠ Could not check how the existing tables store ids ({e}), using '{self.id_storage}'")
+            return
+        if stored is not None and stored != self.id_storage:
+            print(f"⚠ The existing tables store ids as {ID_STORAGE_TYPES[stored]}, "
+                  f"switching from id storage '{self.id_storage}' to '{stored}'")
+            self.id_storage = stored
+            self._row_builders = None
+    
+    def match_partitions(self):
+        """Write to the partitions the existing tables have (resumed, incremental and replay runs)"""
+        try:
+            stored = stored_partitions(self.connection)
+            self.connection.commit()
+        except pymysql.err.MySQLError as e:
+            print(f"⚠ Could not read the partitions of the existing tables ({e}), "
+                  f"using the configured ones: {describe_partitions(self.partitions)}")
+            return
+        if stored != self.partitions:
+            print(f"⚠ The existing tables are partitioned differently than configured, following them: "
+                  f"{describe_partitions(stored)}")
+            self.partitions = stored
+            self._row_builders = None
+    
+    def drop_schema(self) -> bool:
+        """Drop the tables of the schema and the checkpoint journal (teardown of test databases)"""
+        statements = [statement for statement in self.schema_source()
+                      if statement.upper().startswith('DROP TABLE')]
+        statements.append(f"DROP TABLE IF EXISTS `{self.journal.TABLE}`")
+        failures = self.run_ddl(statements)
+        for index, error in sorted(failures.items()):
+            if error is not None:
+                print(f"✗ {statements[index]}: {error}")
+        if failures:
+            return False
+        print(f"✓ Dropped {len(statements)} tables")
+        try:
+            cursor = self.connection.cursor()
+            for statement in OBJECT_ID_FUNCTIONS:
+                if statement.startswith('DROP FUNCTION'):
+                    cursor.execute(statement)
+            cursor.close()
+            self.connection.commit()
+        except pymysql.err.MySQLError:
+            self.connection.rollback()  # Only there after a BINARY(12) migration
+        return True
+    
+    def finalize_bulk_load(self) -> bool:
+        """Add the secondary indexes and foreign keys deferred by bulk-load mode
+        
+        Tables whose foreign keys do not reference each other are altered at
+        the same time on schema_workers connections.
+        """
+        _, deferred = self.schema_statements()
+        deferred = [statement for statement in deferred
+                    if not self.resume_state.get(f"indexes:{statement.split('`')[1]}", (0, False))[1]]
+        
+        def finished(connection, index):
+            table = deferred[index].split('`')[1]
+            self.journal.save(connection, f'indexes:{table}', 0, completed=True)
+            if VERBOSE:
+                print(f"  ✓ Indexes and foreign keys added to {table}")
         
+        failures = self.run_ddl(deferred, on_done=finished)
+        for index, error in sorted(failures.items()):
+            table = deferred[index].split('`')[1]
+            if error is None:
+                print(f"  ✗ Skipped {table}: a table it references failed")
+            else:
+                print(f"  ✗ Failed to add indexes/foreign keys to {table}: {error}")
+        print(f"✓ Deferred indexes and foreign keys built for {len(deferred) - len(failures)} tables")
+        return not failures
+    
+    def rebuild_inserted_ids(self):
+        """Reload the foreign key validation sets from rows already in the target database"""
+        cursor = self.connection.cursor(pymysql.cursors.Cursor)
+        for table, attr in TRACKED_IDS.items():
+            cursor.execute(f"SELECT `id` FROM `{table}`")
+            ids = getattr(self, attr)
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                ids.update(row[0] for row in rows)
+        self.connection.commit()  # End the read snapshot before the workers start writing
+        print(f"✓ Rebuilt foreign key sets: {len(self.inserted_user_ids)} users, "
+              f"{len(self.inserted_frame_ids)} frames, {len(self.inserted_photo_ids)} photos")
+    
+    def load_data_file(self, filename: str, metrics: Optional[CollectionMetrics] = None) -> Iterator[Dict]:
+        """Stream documents from a JSON or BSON file one at a time
+
+        BSON files are read document by document, so memory stays bounded
+        no matter how large the collection is. The record count is printed
+        once the stream has been fully consumed. Read/decode time goes to
+        `metrics` when given.
+        """
+        filepath = os.path.join(DATA_DIR, filename)
+
         if not os.path.exists(filepath):
             print(f"⚠ File not found: {filepath}")
-            return []
-        
+            return
+
+        if metrics is not None:
+            metrics.bytes_total = os.path.getsize(filepath)
+        count = 0
         try:
             # Check file extension to determine format
             if filename.endswith('.bson'):
-                # Load BSON file (mongodump format - concatenated BSON documents)
-                data = []
-                with open(filepath, 'rb') as f:
-                    raw_data = f.read()
-                    
-                    # Try to decode all documents at once using decode_all
-                    try:
-                        # Method 1: Use decode_all (pymongo 4.x)
-                        from bson import decode_all
-                        data = decode_all(raw_data)
-                        print(f"✓ Loaded {len(data)} records from {filename}")
-                        return data
-                    except (ImportError, AttributeError):
-                        # Method 2: Parse concatenated BSON documents manually
-                        offset = 0
-                        while offset < len(raw_data):
-                            # Each BSON document starts with 4-byte size (little-endian)
-                            if offset + 4 > len(raw_data):
-                                break
-                            doc_size = int.from_bytes(raw_data[offset:offset+4], 'little')
-                            if offset + doc_size > len(raw_data):
-                                break
-                            # Decode single BSON document
-                            doc_bytes = raw_data[offset:offset+doc_size]
-                            try:
-                                # Try different decode methods
-                                if hasattr(bson, 'BSON'):
-                                    doc = bson.BSON(doc_bytes).decode()
-                                elif hasattr(bson, 'decode'):
-                                    doc = bson.decode(doc_bytes)
-                                else:
-                                    # Use codec directly
-                                    from bson.codec_options import CodecOptions
-                                    import bson as bson_module
-                                    codec_opts = CodecOptions()
-                                    doc = bson_module._bson_to_dict(doc_bytes, codec_opts)[0]
-                                data.append(doc)
-                            except Exception as e:
-                                if VERBOSE:
-                                    print(f"  ⚠ Failed to decode BSON document at offset {offset}: {e}")
-                            offset += doc_size
-                        print(f"✓ Loaded {len(data)} records from {filename}")
-                        return data
+                documents = self.iter_bson_file(filepath, metrics)
             else:
-                # Load JSON file
+                # Load JSON file (JSON arrays cannot be streamed without a parser dependency)
+                start = time.perf_counter()
                 with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    print(f"✓ Loaded {len(data)} records from {filename}")
-                    return data
+                    documents = json.load(f)
+                if metrics is not None:
+                    metrics.seconds['decode'] += time.perf_counter() - start
+
+            for doc in documents:
+                count += 1
+                yield doc
+
+            print(f"✓ Loaded {count} records from {filename}")
         except Exception as e:
-            print(f"✗ Failed to load {filename}: {e}")
-            return []
+            print(f"✗ Failed to load {filename} after {count} records: {e}")
+
+    @staticmethod
+    def iter_bson_file(filepath: str, metrics: Optional[CollectionMetrics] = None) -> Iterator[Dict]:
+        """Yield documents from a mongodump .bson file (concatenated BSON documents)
+
+        With `metrics` the stream is always parsed by the loop below, so the
+        time spent reading and decoding is recorded separately.
+        """
+        with open(filepath, 'rb') as f:
+            # Method 1: Use decode_file_iter (pymongo 4.x)
+            decode_file_iter = getattr(bson, 'decode_file_iter', None)
+            if decode_file_iter is not None and metrics is None:
+                yield from decode_file_iter(f)
+                return
+
+            # Method 2: Parse the 4-byte length-prefixed stream manually
+            decode = getattr(bson, 'decode', None) or MongoToMySQLConverter.decode_bson_document
+            seconds = metrics.seconds if metrics is not None else None
+            clock = time.perf_counter
+            offset = 0
+            while True:
+                start = clock() if seconds is not None else 0.0
+                # Each BSON document starts with 4-byte size (little-endian)
+                size_bytes = f.read(4)
+                if len(size_bytes) < 4:
+                    break
+                doc_size = int.from_bytes(size_bytes, 'little')
+                body = f.read(doc_size - 4)
+                if len(body) < doc_size - 4:
+                    break
+                try:
+                    if seconds is None:
+                        doc = decode(size_bytes + body)
+                    else:
+                        read = clock()
+                        doc = decode(size_bytes + body)
+                        seconds['read'] += read - start
+                        seconds['decode'] += clock() - read
+                        metrics.bytes += doc_size
+                except Exception as e:
+                    if metrics is not None:
+                        metrics.rejects['BSON decode error'] = metrics.rejects.get('BSON decode error', 0) + 1
+                    if VERBOSE:
+                        print(f"  ⚠ Failed to decode BSON document at offset {offset}: {e}")
+                else:
+                    yield doc
+                offset += doc_size
+
+    @staticmethod
+    def iter_raw_bson_chunks(filepath: str, size: int, metrics: Optional[CollectionMetrics] = None,
+                             skip: int = 0) -> Iterator[Tuple[int, bytes]]:
+        """Yield (documents, raw bytes) chunks of up to `size` undecoded documents from a .bson file
+        
+        Documents are only split by their length prefix; decoding is left to
+        the pipeline workers. The first `skip` documents are seeked over.
+        """
+        seconds = metrics.seconds if metrics is not None else None
+        clock = time.perf_counter
+        with open(filepath, 'rb') as f:
+            complete = True
+            while complete:
+                start = clock()
+                parts = []
+                count = 0
+                while count < size:
+                    size_bytes = f.read(4)
+                    doc_size = int.from_bytes(size_bytes, 'little')
+                    if len(size_bytes) < 4 or doc_size < 5:
+                        complete = False
+                        break
+                    if metrics is not None:
+                        metrics.bytes += doc_size
+                    if skip:
+                        skip -= 1
+                        f.seek(doc_size - 4, 1)
+                        continue
+                    body = f.read(doc_size - 4)
+                    if len(body) < doc_size - 4:
+                        complete = False
+                        break
+                    parts += (size_bytes, body)
+                    count += 1
+                if seconds is not None:
+                    seconds['read'] += clock() - start
+                if count:
+                    yield count, b''.join(parts)
+
+    @staticmethod
+    def decode_bson_document(doc_bytes: bytes) -> Dict:
+        """Decode a single BSON document with whichever bson API is installed"""
+        # Try different decode methods
+        if hasattr(bson, 'BSON'):
+            return bson.BSON(doc_bytes).decode()
+        if hasattr(bson, 'decode'):
+            return bson.decode(doc_bytes)
+        # Use codec directly
+        from bson.codec_options import CodecOptions
+        return bson._bson_to_dict(doc_bytes, CodecOptions())[0]
     
     @staticmethod
     def convert_mongo_id(mongo_id: Any) -> Optional[str]:
@@ -175,6 +605,20 @@ class MongoToMySQLConverter:
             return mongo_id['$oid']
         return str(mongo_id)
     
+    @staticmethod
+    def convert_mongo_id_binary(mongo_id: Any) -> Optional[bytes]:
+        """Convert MongoDB ObjectId to its 12 raw bytes (id_storage 'binary')"""
+        if type(mongo_id) is bson.ObjectId:
+            return mongo_id.binary
+        if mongo_id is None or mongo_id == '':
+            return None
+        if isinstance(mongo_id, dict) and '$oid' in mongo_id:
+            mongo_id = mongo_id['$oid']
+        key = object_id_key(mongo_id)
+        if key is None:
+            raise ValueError(f"{mongo_id!r} is not an ObjectId and cannot be stored as BINARY(12)")
+        return key
+    
     @staticmethod
     def convert_boolean(value: Any) -> bool:
         """Convert various boolean representations to Python bool"""
@@ -186,927 +630,629 @@ class MongoToMySQLConverter:
             return value.lower() in ('true', '1', 'yes')
         return bool(value)
     
-    @staticmethod
-    def convert_date(date_value: Any) -> Optional[str]:
-        """Convert MongoDB date to MySQL datetime format"""
-        if date_value is None:
-            return None
+    # Dates are converted in dates.py (cached ISO parsing, batched epoch millis)
+    convert_date = staticmethod(convert_mongo_date)
+    convert_dates = staticmethod(convert_mongo_dates)
+    
+    @classmethod
+    def document_timestamp(cls, record: Dict) -> Optional[datetime]:
+        """Last-modified time of a document (naive UTC)
         
-        if isinstance(date_value, dict) and '$date' in date_value:
-            date_str = date_value['$date']
-            if isinstance(date_str, str):
-                # Parse ISO format
+        Uses updated_at/updatedAt, then the creation time, then the
+        timestamp embedded in the ObjectId.
+        """
+        for field in TIMESTAMP_FIELDS:
+            value = record.get(field)
+            if value is None:
+                continue
+            value = cls.convert_date(value)
+            if not isinstance(value, datetime):
                 try:
-                    dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    return dt.strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    return None
-            elif isinstance(date_str, int):
-                # Unix timestamp in milliseconds
-                dt = datetime.fromtimestamp(date_str / 1000.0)
-                return dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        if isinstance(date_value, str):
-            try:
-                dt = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
-                return dt.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                return date_value
+                    value = datetime.fromisoformat(value)
+                except (TypeError, ValueError):
+                    continue
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value
         
-        return date_value
+        generation_time = getattr(record.get('_id'), 'generation_time', None)
+        if generation_time is not None:
+            return generation_time.replace(tzinfo=None)
+        return None
     
-    def migrate_users(self, data: List[Dict]) -> bool:
-        """Migrate users collection"""
-        if not data:
-            return True
+    def track_high_water(self, collection: str, data: Iterable[Dict],
+                         since: Optional[datetime] = None) -> Iterator[Dict]:
+        """Yield the documents changed at or after `since` (all when None)
         
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+        The newest timestamp seen becomes the collection's new high-water
+        mark once the stream is exhausted. Documents without any timestamp
+        are always yielded.
+        """
+        newest = self.high_water_marks.get(collection)
+        total = 0
+        changed = 0
+        for record in data:
+            total += 1
+            timestamp = self.document_timestamp(record)
+            if timestamp is not None and (newest is None or timestamp > newest):
+                newest = timestamp
+            if since is None or timestamp is None or timestamp >= since:
+                changed += 1
+                yield record
         
-        try:
-            for record in data:
-                try:
-                    user_data = {
-                        'id': self.convert_mongo_id(record.get('_id')),
-                        'image_profile': record.get('image_profile'),
-                        'custom_profile_image': record.get('custom_profile_image'),
-                        'use_google_profile': self.convert_boolean(record.get('use_google_profile', True)),
-                        'name': record.get('name'),
-                        'username': record.get('username'),
-                        'email': record.get('email'),
-                        'password': record.get('password'),
-                        'role': record.get('role', 'basic'),
-                        'bio': record.get('bio', ''),
-                        'birthdate': self.convert_date(record.get('birthdate')),
-                        'birthdate_changed': self.convert_boolean(record.get('birthdate_changed', False)),
-                        'birthdate_changed_at': self.convert_date(record.get('birthdate_changed_at')),
-                        'last_birthday_notification': self.convert_date(record.get('last_birthday_notification')),
-                        'ban_status': self.convert_boolean(record.get('ban_status', False)),
-                        'ban_release_datetime': self.convert_date(record.get('ban_release_datetime')),
-                        'google_id': record.get('google_id'),
-                        'email_verified': self.convert_boolean(record.get('email_verified', False)),
-                        'email_verification_token': record.get('email_verification_token'),
-                        'email_verification_expires': self.convert_date(record.get('email_verification_expires')),
-                        'email_verified_at': self.convert_date(record.get('email_verified_at')),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(user_data))
-                    columns = ', '.join(f'`{k}`' for k in user_data.keys())
-                    sql = f"INSERT INTO users ({columns}) VALUES ({placeholders})"
-                    
-                    cursor.execute(sql, list(user_data.values()))
-                    self.inserted_user_ids.add(user_data['id'])  # Track inserted user ID
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert user {record.get('username')}: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Users: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Users migration failed: {e}")
-            self.connection.rollback()
-            return False
+        if newest is not None:
+            self.high_water_marks[collection] = newest
+        if since is not None and not self.quiet:
+            print(f"  {changed} of {total} documents changed since {since}")
     
-    def migrate_maintenances(self, data: List[Dict]) -> bool:
-        """Migrate maintenances collection"""
-        if not data:
-            return True
-        
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+    def reject(self, collection: str, record_id: Any, label: Any, error: BaseException, record: Optional[Dict] = None):
+        """Count a skipped/failed document by reason and queue it for the rejects and dead-letter files
         
-        try:
-            for record in data:
-                try:
-                    maintenance_data = {
-                        'id': self.convert_mongo_id(record.get('_id')),
-                        'is_active': self.convert_boolean(record.get('isActive', False)),
-                        'estimated_end_time': self.convert_date(record.get('estimatedEndTime')),
-                        'message': record.get('message'),
-                        'updated_by': self.convert_mongo_id(record.get('updatedBy')),
-                        'created_at': self.convert_date(record.get('createdAt')),
-                        'updated_at': self.convert_date(record.get('updatedAt')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(maintenance_data))
-                    columns = ', '.join(f'`{k}`' for k in maintenance_data.keys())
-                    sql = f"INSERT INTO maintenances ({columns}) VALUES ({placeholders})"
-                    
-                    cursor.execute(sql, list(maintenance_data.values()))
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert maintenance: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Maintenances: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Maintenances migration failed: {e}")
-            self.connection.rollback()
-            return False
+        `label` may be a callable (resolved by the reject log's thread).
+        """
+        if isinstance(record_id, bytes):
+            record_id = record_id.hex()  # BINARY(12) id from a row
+        reason = reject_reason(error)
+        rejects = self.metrics.collection(collection).rejects
+        rejects[reason] = rejects.get(reason, 0) + 1
+        if self.reject_log is not None:
+            self.reject_log.write(collection, record_id, label, reason, error, record)
     
-    def migrate_follows(self, data: List[Dict]) -> bool:
-        """Migrate follows collection"""
-        if not data:
-            return True
+    def open_reject_log(self, append: bool):
+        """Start writing the rejects file and dead-letter files (if configured)"""
+        if self.rejects_file or self.dead_letter_dir:
+            self.reject_log = RejectLog(self.rejects_file, self.dead_letter_dir, append=append)
+    
+    def report_collection(self, collection: str, successful: int, failed: int):
+        """Record a collection's counters in self.stats and print its summary line (with the reject reasons)"""
+        with self._stats_lock:
+            by_collection = self.stats['by_collection'].setdefault(collection, {'successful': 0, 'failed': 0})
+            by_collection['successful'] += successful
+            by_collection['failed'] += failed
+            self.stats['successful'] += successful
+            self.stats['failed'] += failed
+            self.stats['total_records'] += successful + failed
         
-        cursor = self.connection.cursor()
-        successful = 0
+        if not self.quiet:
+            print(f"✓ {COLLECTION_LABELS.get(collection, collection)}: {successful} successful, {failed} failed")
+            rejects = self.metrics.collection(collection).rejects
+            for reason, count in sorted(rejects.items(), key=lambda item: -item[1])[:REJECT_REASONS_SHOWN]:
+                print(f"    ✗ {count} × {reason}")
+            if len(rejects) > REJECT_REASONS_SHOWN:
+                print(f"    ✗ ... {len(rejects) - REJECT_REASONS_SHOWN} more reasons")
+    
+    def rollback_collection(self, collection: str, writer: BatchWriter):
+        """Roll back the uncommitted part of a failed collection and report committed vs rolled-back rows"""
+        writer.rollback()
+        with self._stats_lock:
+            by_collection = self.stats['by_collection'].setdefault(collection, {'successful': 0, 'failed': 0})
+            by_collection['rows_committed'] = by_collection.get('rows_committed', 0) + writer.committed
+            by_collection['rows_rolled_back'] = by_collection.get('rows_rolled_back', 0) + writer.rolled_back
+        print(f"  ↺ {COLLECTION_LABELS.get(collection, collection)}: rolled back {writer.rolled_back} rows, "
+              f"{writer.committed} rows stay committed")
+    
+    def close_reject_log(self):
+        """Write out the queued rejects and close the rejects file"""
+        if self.reject_log is None:
+            return
+        self.reject_log.close()
+        if self.reject_log.written:
+            print(f"⚠ Details of {self.reject_log.written} skipped/failed documents written to {self.rejects_file}")
+        if self.reject_log.dead_letters:
+            print(f"⚠ {self.reject_log.dead_letters} rejected documents saved in {self.dead_letter_dir} "
+                  f"(re-run them with: python converter.py --replay)")
+        self.reject_log = None
+    
+    def report_metrics(self):
+        """Print the stage timing table and write the metrics file, if one is configured"""
+        self.metrics.print_report()
+        if self.metrics_file:
+            try:
+                self.metrics.write(self.metrics_file)
+                print(f"✓ Stage metrics written to {self.metrics_file}")
+            except OSError as e:
+                print(f"⚠ Could not write stage metrics to {self.metrics_file}: {e}")
+    
+    def row_builders(self) -> Dict[str, CompiledMapping]:
+        """The collection mappings compiled with this converter's convert_* functions (once per instance)"""
+        if self._row_builders is None:
+            self._row_builders = compile_mappings({
+                'id': self.convert_mongo_id_binary if self.id_storage == 'binary' else self.convert_mongo_id,
+                'date': self.convert_date,
+                'dates': self.convert_dates,
+                'bool': self.convert_boolean,
+            }, partition_columns={table: layout.column for table, layout in self.partitions.items()})
+        return self._row_builders
+    
+    def migrate_mapped(self, collection: str, data: Iterable[Dict]) -> bool:
+        """Migrate one collection with its compiled mapping (see mappings.py)"""
+        mapping = self.row_builders()[collection]
+        build = mapping.build
+        metrics = self.metrics.collection(collection)
+        seconds = metrics.seconds
+        indexes = [getattr(self, TRACKED_IDS[reference]) for reference in mapping.references]
+        # Foreign key lookups inside build() are timed on every FK_SAMPLE_EVERY-th document only
+        # (a timer per lookup costs about as much as the lookup) and scaled up afterwards
+        sampled = {'fk': 0.0}
+        timed_indexes = [TimedIndex(index, sampled) for index in indexes]
+        track = getattr(self, TRACKED_IDS[collection]) if collection in TRACKED_IDS else None
+        table, columns = mapping.table, mapping.columns
+        writer = self.new_writer(metrics, functools.partial(self.reject, collection))
+        progress = None if self.quiet else Progress(mapping.title, metrics)
         failed = 0
+        documents = 0
+        converting = 0.0
+        clock = time.perf_counter
         
         try:
             for record in data:
+                documents += 1
+                if progress is not None and not documents & 1023:
+                    progress.update(documents, writer.rows_written)
+                start = clock()
                 try:
-                    follower_id = self.convert_mongo_id(record.get('follower_id'))
-                    following_id = self.convert_mongo_id(record.get('following_id'))
-                    
-                    # Validate foreign keys
-                    if follower_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped follow: follower_id {follower_id} not found")
-                        continue
-                    
-                    if following_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped follow: following_id {following_id} not found")
-                        continue
-                    
-                    follow_data = {
-                        'id': self.convert_mongo_id(record.get('_id')),
-                        'follower_id': follower_id,
-                        'following_id': following_id,
-                        'status': record.get('status', 'active'),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(follow_data))
-                    columns = ', '.join(f'`{k}`' for k in follow_data.keys())
-                    sql = f"INSERT INTO follows ({columns}) VALUES ({placeholders})"
-                    
-                    cursor.execute(sql, list(follow_data.values()))
-                    successful += 1
+                    if documents % FK_SAMPLE_EVERY == 1:
+                        values, children = build(record, *timed_indexes)
+                    else:
+                        values, children = build(record, *indexes)
+                    converting += clock() - start
+                    writer.add_row(table, columns, values, children, track=track, label=mapping.label(record),
+                                   source=record)
                     
                 except Exception as e:
+                    # MissingReference (skipped) or a conversion error (failed)
                     failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert follow: {e}")
+                    self.reject(collection, record.get('_id'), functools.partial(mapping.describe, record), e, record)
             
-            self.connection.commit()
-            print(f"✓ Follows: {successful} successful, {failed} failed")
+            writer.flush()
+            writer.commit()
+            self.report_collection(collection, writer.successful, failed + writer.failed)
             return True
             
         except Exception as e:
-            print(f"✗ Follows migration failed: {e}")
-            self.connection.rollback()
+            print(f"✗ {mapping.title} migration failed: {e}")
+            self.rollback_collection(collection, writer)
             return False
+        finally:
+            fk = sampled['fk'] * documents / max(1, (documents + FK_SAMPLE_EVERY - 1) // FK_SAMPLE_EVERY)
+            seconds['fk'] += fk
+            seconds['convert'] += max(0.0, converting - fk)
+            metrics.documents += documents
+            metrics.rows += writer.committed
+            metrics.failed += failed + writer.failed
     
-    def migrate_frames(self, data: List[Dict]) -> bool:
-        """Migrate frames collection"""
-        if not data:
-            return True
+    def convert_raw_chunk(self, collection: str, raw: bytes, since: Optional[datetime] = None):
+        """Decode and convert a chunk of raw BSON documents (runs in a pipeline worker process)
         
-        cursor = self.connection.cursor()
-        successful = 0
+        The conversion half of migrate_mapped(): documents that cannot be
+        converted are rejected here, documents older than `since` are
+        skipped. Returns (rows, newest document timestamp, stage metrics,
+        (rejects written, dead letters written)), each row being (values,
+        children, start, end) with the document's position in `raw`.
+        """
+        mapping = self.row_builders()[collection]
+        build = mapping.build
+        metrics = self.metrics.collection(collection)
+        seconds = metrics.seconds
+        indexes = [getattr(self, TRACKED_IDS[reference]) for reference in mapping.references]
+        sampled = {'fk': 0.0}
+        timed_indexes = [TimedIndex(index, sampled) for index in indexes]
+        decode = getattr(bson, 'decode', None) or self.decode_bson_document
+        log = self.reject_log
+        logged = (log.written, log.dead_letters) if log is not None else (0, 0)
+        rows = []
+        newest = None
         failed = 0
+        documents = 0
+        converting = 0.0
+        clock = time.perf_counter
         
-        try:
-            for record in data:
-                try:
-                    frame_id = self.convert_mongo_id(record.get('_id'))
-                    user_id = self.convert_mongo_id(record.get('user_id'))
-                    
-                    # Validate user_id foreign key
-                    if user_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped frame {record.get('title')}: user_id {user_id} not found")
-                        continue
-                    
-                    # Validate approved_by foreign key (optional)
-                    approved_by = self.convert_mongo_id(record.get('approved_by'))
-                    if approved_by and approved_by not in self.inserted_user_ids:
-                        approved_by = None  # Set to NULL if user doesn't exist
-                    
-                    # Insert main frame record
-                    frame_data = {
-                        'id': frame_id,
-                        'title': record.get('title'),
-                        'desc': record.get('desc', ''),
-                        'thumbnail': record.get('thumbnail'),
-                        'layout_type': record.get('layout_type'),
-                        'official_status': self.convert_boolean(record.get('official_status', False)),
-                        'visibility': record.get('visibility', 'private'),
-                        'approval_status': record.get('approval_status', 'pending'),
-                        'approved_by': approved_by,
-                        'approved_at': self.convert_date(record.get('approved_at')),
-                        'rejection_reason': record.get('rejection_reason'),
-                        'user_id': user_id,
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(frame_data))
-                    columns = ', '.join(f'`{k}`' for k in frame_data.keys())
-                    sql = f"INSERT INTO frames ({columns}) VALUES ({placeholders})"
-                    cursor.execute(sql, list(frame_data.values()))
-                    self.inserted_frame_ids.add(frame_id)  # Track inserted frame ID
-                    
-                    # Insert frame images
-                    images = record.get('images', [])
-                    for idx, image_url in enumerate(images):
-                        cursor.execute(
-                            "INSERT INTO frame_images (frame_id, image_url, order_index) VALUES (%s, %s, %s)",
-                            (frame_id, image_url, idx)
-                        )
-                    
-                    # Insert frame tags
-                    tags = record.get('tag_label', [])
-                    for tag in tags:
-                        cursor.execute(
-                            "INSERT INTO frame_tags (frame_id, tag) VALUES (%s, %s)",
-                            (frame_id, tag)
-                        )
-                    
-                    # Insert frame likes (only if user exists)
-                    likes = record.get('like_count', [])
-                    for like in likes:
-                        like_user_id = self.convert_mongo_id(like.get('user_id'))
-                        if like_user_id in self.inserted_user_ids:
-                            cursor.execute(
-                                "INSERT INTO frame_likes (frame_id, user_id, created_at) VALUES (%s, %s, %s)",
-                                (frame_id, like_user_id, 
-                             self.convert_date(like.get('created_at')))
-                        )
-                    
-                    # Insert frame uses (only if user exists)
-                    uses = record.get('use_count', [])
-                    for use in uses:
-                        use_user_id = self.convert_mongo_id(use.get('user_id'))
-                        if use_user_id in self.inserted_user_ids:
-                            cursor.execute(
-                                "INSERT INTO frame_uses (frame_id, user_id, created_at) VALUES (%s, %s, %s)",
-                                (frame_id, use_user_id, 
-                                 self.convert_date(use.get('created_at')))
-                            )
-                    
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert frame {record.get('title')}: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Frames: {successful} successful, {failed} failed")
-            return True
+        end = 0
+        while end < len(raw):
+            offset, end = end, end + int.from_bytes(raw[end:end + 4], 'little')
+            start = clock()
+            try:
+                record = decode(raw[offset:end])
+            except Exception as e:
+                metrics.rejects['BSON decode error'] = metrics.rejects.get('BSON decode error', 0) + 1
+                if VERBOSE:
+                    print(f"  ⚠ Failed to decode BSON document: {e}")
+                continue
+            seconds['decode'] += clock() - start
             
-        except Exception as e:
-            print(f"✗ Frames migration failed: {e}")
-            self.connection.rollback()
-            return False
+            timestamp = self.document_timestamp(record)
+            if timestamp is not None and (newest is None or timestamp > newest):
+                newest = timestamp
+            if since is not None and timestamp is not None and timestamp < since:
+                continue
+            documents += 1
+            start = clock()
+            try:
+                if documents % FK_SAMPLE_EVERY == 1:
+                    values, children = build(record, *timed_indexes)
+                else:
+                    values, children = build(record, *indexes)
+                converting += clock() - start
+                rows.append((values, children, offset, end))
+            except Exception as e:
+                failed += 1
+                self.reject(collection, record.get('_id'), functools.partial(mapping.describe, record), e, record)
+        
+        fk = sampled['fk'] * documents / max(1, (documents + FK_SAMPLE_EVERY - 1) // FK_SAMPLE_EVERY)
+        seconds['fk'] += fk
+        seconds['convert'] += max(0.0, converting - fk)
+        metrics.documents += documents
+        metrics.failed += failed
+        if log is not None:
+            log.flush()
+            logged = (log.written - logged[0], log.dead_letters - logged[1])
+        return rows, newest, metrics, logged
     
-    def migrate_tickets(self, data: List[Dict]) -> bool:
-        """Migrate tickets collection"""
-        if not data:
-            return True
+    def migration_methods(self) -> Dict[str, Any]:
+        """Map collection names to the functions that migrate them"""
+        return {collection: functools.partial(self.migrate_mapped, collection) for collection in MAPPINGS}
+    
+    def migrate_collection(self, collection: str) -> bool:
+        """Load one collection's data file and run its migration method"""
+        print(f"\n--- Migrating {collection} ---")
+        filename = DATA_FILES.get(collection)
         
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+        if not filename:
+            print(f"⚠ No file mapping found for {collection}, skipping...")
+            return True
         
-        try:
-            for record in data:
-                try:
-                    ticket_id = self.convert_mongo_id(record.get('_id'))
-                    user_id = self.convert_mongo_id(record.get('user_id'))
-                    admin_id = self.convert_mongo_id(record.get('admin_id'))
-                    
-                    # Validate admin_id foreign key (optional)
-                    if admin_id and admin_id not in self.inserted_user_ids:
-                        admin_id = None  # Set to NULL if admin doesn't exist
-                    
-                    ticket_data = {
-                        'id': ticket_id,
-                        'title': record.get('title'),
-                        'description': record.get('description'),
-                        'user_id': user_id,
-                        'type': record.get('type'),
-                        'status': record.get('status', 'pending'),
-                        'admin_response': record.get('admin_response'),
-                        'admin_id': admin_id,
-                        'priority': record.get('priority', 'medium'),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(ticket_data))
-                    columns = ', '.join(f'`{k}`' for k in ticket_data.keys())
-                    sql = f"INSERT INTO tickets ({columns}) VALUES ({placeholders})"
-                    cursor.execute(sql, list(ticket_data.values()))
-                    
-                    # Insert ticket images
-                    images = record.get('images', [])
-                    for idx, image_url in enumerate(images):
-                        cursor.execute(
-                            "INSERT INTO ticket_images (ticket_id, image_url, order_index) VALUES (%s, %s, %s)",
-                            (ticket_id, image_url, idx)
-                        )
-                    
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert ticket: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Tickets: {successful} successful, {failed} failed")
+        migration_methods = self.migration_methods()
+        if collection not in migration_methods:
+            print(f"⚠ No migration method for {collection}, skipping...")
             return True
-            
-        except Exception as e:
-            print(f"✗ Tickets migration failed: {e}")
-            self.connection.rollback()
-            return False
-    
-    def migrate_reports(self, data: List[Dict]) -> bool:
-        """Migrate reports collection"""
-        if not data:
+        
+        documents_done, completed = self.resume_state.get(collection, (0, False))
+        if completed:
+            print(f"↻ {collection} already migrated, skipping")
             return True
         
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+        started = time.perf_counter()
+        self.connection = self.pool.check(self.connection)  # May have sat idle while other collections ran
+        data = self.load_data_file(filename, self.metrics.collection(collection))
+        if documents_done:
+            print(f"↻ Resuming {collection} after {documents_done} committed documents")
+            data = itertools.islice(data, documents_done, None)
         
-        try:
-            for record in data:
-                try:
-                    frame_id = self.convert_mongo_id(record.get('frame_id'))
-                    user_id = self.convert_mongo_id(record.get('user_id'))
-                    
-                    # Validate foreign keys
-                    if frame_id not in self.inserted_frame_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped report: frame_id {frame_id} not found")
-                        continue
-                    
-                    if user_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped report: user_id {user_id} not found")
-                        continue
-                    
-                    # Validate admin_id foreign key (optional)
-                    admin_id = self.convert_mongo_id(record.get('admin_id'))
-                    if admin_id and admin_id not in self.inserted_user_ids:
-                        admin_id = None
-                    
-                    report_data = {
-                        'id': self.convert_mongo_id(record.get('_id')),
-                        'title': record.get('title'),
-                        'description': record.get('description'),
-                        'frame_id': frame_id,
-                        'user_id': user_id,
-                        'report_status': record.get('report_status', 'pending'),
-                        'admin_response': record.get('admin_response'),
-                        'admin_id': admin_id,
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(report_data))
-                    columns = ', '.join(f'`{k}`' for k in report_data.keys())
-                    sql = f"INSERT INTO reports ({columns}) VALUES ({placeholders})"
-                    
-                    cursor.execute(sql, list(report_data.values()))
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert report: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Reports: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Reports migration failed: {e}")
-            self.connection.rollback()
-            return False
-    
-    def migrate_photos(self, data: List[Dict]) -> bool:
-        """Migrate photos collection"""
-        if not data:
-            return True
+        since = self.high_water_marks.get(collection) if self.incremental else None
+        data = self.track_high_water(collection, data, since)
         
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+        shards = SHARDED_COLLECTIONS.get(collection, 1)
+        processes = PIPELINED_COLLECTIONS.get(collection, 1)
+        if processes > 1 and filename.endswith('.bson'):
+            # Reads the file itself, as raw chunks for the converter processes
+            ok = self.migrate_pipelined(collection, filename, processes, documents_done)
+        elif shards > 1:
+            ok = self.migrate_sharded(collection, data, shards, documents_done)
+        elif self.incremental:
+            # Delta passes are idempotent upserts: rerun the pass instead of resuming it
+            ok = migration_methods[collection](data)
+        else:
+            # Every writer flush commits the batch together with the journal position
+            self.checkpoint = Checkpoint(self.journal, collection, documents_done)
+            try:
+                ok = migration_methods[collection](self.checkpoint.track(data))
+                if ok:
+                    self.journal.save(self.connection, collection, self.checkpoint.documents_done, completed=True)
+                    self.connection.commit()
+            finally:
+                self.checkpoint = None
         
-        try:
-            for record in data:
-                try:
-                    photo_id = self.convert_mongo_id(record.get('_id'))
-                    frame_id = self.convert_mongo_id(record.get('frame_id'))
-                    user_id = self.convert_mongo_id(record.get('user_id'))
-                    
-                    # Validate foreign keys
-                    if frame_id not in self.inserted_frame_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped photo: frame_id {frame_id} not found")
-                        continue
-                    
-                    if user_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped photo: user_id {user_id} not found")
-                        continue
-                    
-                    photo_data = {
-                        'id': photo_id,
-                        'title': record.get('title'),
-                        'desc': record.get('desc', ''),
-                        'frame_id': frame_id,
-                        'user_id': user_id,
-                        'expires_at': self.convert_date(record.get('expires_at')),
-                        'live_photo': self.convert_boolean(record.get('livePhoto', False)),
-                        'ai_photo': self.convert_boolean(record.get('aiPhoto', False)),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(photo_data))
-                    columns = ', '.join(f'`{k}`' for k in photo_data.keys())
-                    sql = f"INSERT INTO photos ({columns}) VALUES ({placeholders})"
-                    cursor.execute(sql, list(photo_data.values()))
-                    self.inserted_photo_ids.add(photo_id)  # Track inserted photo ID
-                    
-                    # Insert photo images
-                    images = record.get('images', [])
-                    for idx, image_url in enumerate(images):
-                        cursor.execute(
-                            "INSERT INTO photo_images (photo_id, image_url, order_index) VALUES (%s, %s, %s)",
-                            (photo_id, image_url, idx)
-                        )
-                    
-                    # Insert video files
-                    videos = record.get('video_files', [])
-                    for idx, video_url in enumerate(videos):
-                        cursor.execute(
-                            "INSERT INTO photo_videos (photo_id, video_url, order_index) VALUES (%s, %s, %s)",
-                            (photo_id, video_url, idx)
-                        )
-                    
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert photo: {e}")
-            
+        if ok and collection in self.high_water_marks:
+            self.journal.save_high_water(self.connection, collection, self.high_water_marks[collection])
             self.connection.commit()
-            print(f"✓ Photos: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Photos migration failed: {e}")
-            self.connection.rollback()
-            return False
+        self.metrics.collection(collection).wall += time.perf_counter() - started
+        return ok
     
-    def migrate_photoposts(self, data: List[Dict]) -> bool:
-        """Migrate photo posts collection"""
-        if not data:
-            return True
+    def migrate_sharded(self, collection: str, data: Iterable[Dict], shards: int, documents_done: int = 0) -> bool:
+        """Split one collection across a process pool, each process with its own connection
+        
+        Documents are dealt out in chunks of SHARD_CHUNK_SIZE to `shards`
+        worker processes. Each worker converts and inserts its chunks with the
+        regular migration method against a shared-memory snapshot of the
+        foreign key sets,
+        then the counters and newly inserted IDs are merged back here.
         
-        cursor = self.connection.cursor()
+        Chunks commit out of order, so the journal position only advances
+        over the leading run of committed chunks. Chunks committed past it
+        are redone on resume and their rows rejected as duplicates.
+        """
+        id_snapshot = {attr: SharedIdIndex(getattr(self, attr)) for attr in TRACKED_IDS.values()}
+        tracked_attr = TRACKED_IDS.get(collection)
         successful = 0
         failed = 0
+        ok = True
+        chunk_sizes = {}
+        committed_chunks = set()
+        next_chunk = 0  # First chunk not yet covered by the journal position
         
-        try:
-            for record in data:
-                try:
-                    photopost_id = self.convert_mongo_id(record.get('_id'))
-                    photo_id = self.convert_mongo_id(record.get('photo_id'))
-                    user_id = self.convert_mongo_id(record.get('user_id'))
-                    
-                    # Validate user_id foreign key
-                    if user_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped photopost: user_id {user_id} not found")
-                        continue
-                    
-                    # photo_id is optional and can be NULL
-                    if photo_id and photo_id not in self.inserted_photo_ids:
-                        photo_id = None  # Set to NULL if referenced photo doesn't exist
-                    
-                    photopost_data = {
-                        'id': photopost_id,
-                        'title': record.get('title'),
-                        'desc': record.get('desc', ''),
-                        'photo_id': photo_id,
-                        'user_id': user_id,
-                        'visibility': record.get('visibility', 'public'),
-                        'post_type': record.get('post_type', 'normal'),
-                        'view_count': record.get('view_count', 0),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(photopost_data))
-                    columns = ', '.join(f'`{k}`' for k in photopost_data.keys())
-                    sql = f"INSERT INTO photoposts ({columns}) VALUES ({placeholders})"
-                    cursor.execute(sql, list(photopost_data.values()))
-                    
-                    # Insert photo post images
-                    images = record.get('images', [])
-                    for idx, image_url in enumerate(images):
-                        cursor.execute(
-                            "INSERT INTO photopost_images (photopost_id, image_url, order_index) VALUES (%s, %s, %s)",
-                            (photopost_id, image_url, idx)
-                        )
-                    
-                    # Insert photo post likes (only if user exists)
-                    likes = record.get('likes', [])
-                    for like in likes:
-                        like_user_id = self.convert_mongo_id(like.get('user_id') if isinstance(like, dict) else like)
-                        if like_user_id and like_user_id in self.inserted_user_ids:
-                            like_created = self.convert_date(like.get('created_at')) if isinstance(like, dict) else None
-                            cursor.execute(
-                                "INSERT INTO photopost_likes (photopost_id, user_id, created_at) VALUES (%s, %s, %s)",
-                                (photopost_id, like_user_id, like_created)
-                            )
-                    
-                    # Insert photo post comments (only if user exists)
-                    comments = record.get('comments', [])
-                    for comment in comments:
-                        comment_user_id = self.convert_mongo_id(comment.get('user_id'))
-                        if comment_user_id and comment_user_id in self.inserted_user_ids:
-                            comment_id = self.convert_mongo_id(comment.get('_id'))
-                            cursor.execute(
-                                """INSERT INTO photopost_comments 
-                                (id, photopost_id, user_id, comment, created_at, updated_at) 
-                                VALUES (%s, %s, %s, %s, %s, %s)""",
-                                (
-                                    comment_id,
-                                    photopost_id,
-                                    comment_user_id,
-                                    comment.get('comment', ''),
-                                    self.convert_date(comment.get('created_at')),
-                                    self.convert_date(comment.get('updated_at'))
-                                )
-                            )
-                    
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert photopost: {e}")
+        def merge(futures):
+            nonlocal successful, failed, ok, documents_done, next_chunk
+            for future in futures:
+                index = in_flight.pop(future)
+                chunk_ok, chunk_successful, chunk_failed, new_ids, chunk_metrics, logged = future.result()
+                ok = ok and chunk_ok
+                if chunk_metrics is not None:
+                    self.metrics.collection(collection).merge(chunk_metrics)
+                if self.reject_log is not None:
+                    self.reject_log.add_counts(*logged)
+                successful += chunk_successful
+                failed += chunk_failed
+                if tracked_attr:
+                    getattr(self, tracked_attr).update(new_ids)
+                if chunk_ok:
+                    committed_chunks.add(index)
+            progress.update(metrics.documents, metrics.rows)
             
+            start = next_chunk
+            while next_chunk in committed_chunks:
+                committed_chunks.discard(next_chunk)
+                documents_done += chunk_sizes.pop(next_chunk)
+                next_chunk += 1
+            if next_chunk != start and not self.incremental:
+                self.journal.save(self.connection, collection, documents_done)
+                self.connection.commit()
+        
+        metrics = self.metrics.collection(collection)
+        progress = Progress(COLLECTION_LABELS.get(collection, collection), metrics)
+        print(f"Sharding {collection} across {shards} processes")
+        try:
+            with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_shard_worker,
+                                     initargs=(id_snapshot, self.load_mode, self.bulk_load, self.incremental,
+                                               self.reject_log is not None and self.rejects_file,
+                                               self.reject_log is not None and self.dead_letter_dir,
+                                               self.id_storage, self.partitions)) as pool:
+                in_flight = {}  # future -> chunk index
+                for index, chunk in enumerate(_chunked(data, SHARD_CHUNK_SIZE)):
+                    # Keep at most two chunks queued per worker so memory stays bounded
+                    if len(in_flight) >= shards * 2:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        merge(finished)
+                    chunk_sizes[index] = len(chunk)
+                    in_flight[pool.submit(_migrate_shard_chunk, collection, chunk)] = index
+                merge(list(in_flight))
+        finally:
+            for ids in id_snapshot.values():
+                ids.close()
+        
+        if ok and not self.incremental:
+            self.journal.save(self.connection, collection, documents_done, completed=True)
             self.connection.commit()
-            print(f"✓ Photo Posts: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Photo Posts migration failed: {e}")
-            self.connection.rollback()
-            return False
+        self.report_collection(collection, successful, failed)
+        return ok
     
-    def migrate_photocollabs(self, data: List[Dict]) -> bool:
-        """Migrate photo collabs collection"""
-        if not data:
-            return True
+    def migrate_pipelined(self, collection: str, filename: str, processes: int, documents_done: int = 0) -> bool:
+        """Migrate one collection through a read → decode/convert → insert pipeline
         
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+        This thread reads the dump as raw BSON chunks of PIPELINE_CHUNK_SIZE
+        documents, `processes` worker processes decode and convert them
+        (convert_raw_chunk) against a shared-memory snapshot of the foreign
+        key sets, and PIPELINE_WRITERS threads insert and commit the rows
+        chunk by chunk, each on its own connection. The chunks waiting for a
+        writer sit in a queue of 2 * `processes`, so reading blocks while
+        MySQL is the bottleneck and memory stays bounded.
         
-        try:
-            for record in data:
+        Like in migrate_sharded(), chunks commit out of order and the journal
+        position only advances over the leading run of committed chunks.
+        """
+        mapping = self.row_builders()[collection]
+        table, columns = mapping.table, mapping.columns
+        metrics = self.metrics.collection(collection)
+        progress = Progress(mapping.title, metrics)
+        filepath = os.path.join(DATA_DIR, filename)
+        since = self.high_water_marks.get(collection) if self.incremental else None
+        tracked_attr = TRACKED_IDS.get(collection)
+        decode = getattr(bson, 'decode', None) or self.decode_bson_document
+        id_snapshot = {attr: SharedIdIndex(getattr(self, attr))
+                       for attr in dict.fromkeys(TRACKED_IDS[reference] for reference in mapping.references)}
+        chunks = queue.Queue(maxsize=processes * 2)  # (index, documents, raw, future converting it)
+        lock = threading.Lock()
+        failure = threading.Event()
+        committed_chunks = {}  # index -> documents, committed past the journal position
+        next_chunk = 0
+        newest = self.high_water_marks.get(collection)
+        converted_failed = 0
+        
+        def describe(source):
+            return mapping.describe(decode(bytes(source)))
+        
+        def on_reject(row_id, label, error, source):
+            with lock:
+                self.reject(collection, row_id, label, error, None if source is None else decode(bytes(source)))
+        
+        def write(worker, writer, track):
+            nonlocal next_chunk, documents_done, newest, converted_failed
+            while True:
+                item = chunks.get()
+                if item is None:
+                    return
+                if failure.is_set():
+                    continue  # Drain the queue so the reader is not blocked
+                index, documents, raw, future = item
                 try:
-                    collab_id = self.convert_mongo_id(record.get('_id'))
-                    
-                    inviter = record.get('inviter', {})
-                    receiver = record.get('receiver', {})
-                    invitation = record.get('invitation', {})
-                    
-                    collab_data = {
-                        'id': collab_id,
-                        'title': record.get('title'),
-                        'desc': record.get('desc', ''),
-                        'frame_id': self.convert_mongo_id(record.get('frame_id')),
-                        'layout_type': record.get('layout_type'),
-                        'inviter_user_id': self.convert_mongo_id(inviter.get('user_id')),
-                        'inviter_photo_id': self.convert_mongo_id(inviter.get('photo_id')),
-                        'receiver_user_id': self.convert_mongo_id(receiver.get('user_id')),
-                        'receiver_photo_id': self.convert_mongo_id(receiver.get('photo_id')),
-                        'status': record.get('status', 'pending'),
-                        'invitation_message': invitation.get('message', ''),
-                        'invitation_sent_at': self.convert_date(invitation.get('sent_at')),
-                        'invitation_responded_at': self.convert_date(invitation.get('responded_at')),
-                        'expires_at': self.convert_date(record.get('expires_at')),
-                        'completed_at': self.convert_date(record.get('completed_at')),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(collab_data))
-                    columns = ', '.join(f'`{k}`' for k in collab_data.keys())
-                    sql = f"INSERT INTO photo_collabs ({columns}) VALUES ({placeholders})"
-                    cursor.execute(sql, list(collab_data.values()))
-                    
-                    # Insert merged images
-                    merged_images = record.get('merged_images', [])
-                    for idx, image_url in enumerate(merged_images):
-                        cursor.execute(
-                            "INSERT INTO photo_collab_images (photo_collab_id, image_url, order_index) VALUES (%s, %s, %s)",
-                            (collab_id, image_url, idx)
-                        )
-                    
-                    # Insert stickers
-                    stickers = record.get('stickers', [])
-                    for sticker in stickers:
-                        position = sticker.get('position', {})
-                        size = sticker.get('size', {})
-                        
-                        cursor.execute(
-                            """INSERT INTO photo_collab_stickers 
-                            (id, photo_collab_id, type, content, position_x, position_y, 
-                             size_width, size_height, rotation, added_by, created_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                            (
-                                sticker.get('id'),
-                                collab_id,
-                                sticker.get('type'),
-                                sticker.get('content'),
-                                position.get('x', 0),
-                                position.get('y', 0),
-                                size.get('width', 0),
-                                size.get('height', 0),
-                                sticker.get('rotation', 0),
-                                self.convert_mongo_id(sticker.get('added_by')),
-                                self.convert_date(sticker.get('created_at'))
-                            )
-                        )
-                    
-                    successful += 1
-                    
+                    rows, chunk_newest, chunk_metrics, logged = future.result()
+                    view = memoryview(raw)
+                    rows_before = writer.committed
+                    for values, children, start, end in rows:
+                        source = view[start:end]
+                        writer.add_row(table, columns, values, children, track=track,
+                                       label=functools.partial(describe, source), source=source)
+                    writer.flush()
+                    writer.commit()
                 except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert photo collab: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Photo Collabs: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Photo Collabs migration failed: {e}")
-            self.connection.rollback()
-            return False
-    
-    def migrate_aiphotobooth_usages(self, data: List[Dict]) -> bool:
-        """Migrate AI photobooth usages collection"""
-        if not data:
-            return True
+                    failure.set()
+                    print(f"✗ {mapping.title} migration failed: {e}")
+                    worker.rollback_collection(collection, writer)
+                    continue
+                
+                with lock:
+                    metrics.merge(chunk_metrics)
+                    converted_failed += chunk_metrics.failed
+                    metrics.rows += writer.committed - rows_before
+                    if self.reject_log is not None:
+                        self.reject_log.add_counts(*logged)
+                    if chunk_newest is not None and (newest is None or chunk_newest > newest):
+                        newest = chunk_newest
+                    committed_chunks[index] = documents
+                    start = next_chunk
+                    while next_chunk in committed_chunks:
+                        documents_done += committed_chunks.pop(next_chunk)
+                        next_chunk += 1
+                    if next_chunk != start and not self.incremental:
+                        self.journal.save(writer.connection, collection, documents_done)
+                        writer.connection.commit()
+                    progress.update(metrics.documents, metrics.rows)
+        
+        print(f"Pipelining {collection}: {processes} converter processes, {PIPELINE_WRITERS} writers")
+        metrics.bytes_total = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        writers = []  # (converter copy with its own connection, writer, its inserted ids)
+        threads = []
+        read = documents_done
+        try:
+            for _ in range(max(1, PIPELINE_WRITERS)):
+                worker = copy.copy(self)
+                worker.connection = self.pool.acquire()
+                writers.append((worker, worker.new_writer(CollectionMetrics(), on_reject),
+                                IdIndex() if tracked_attr else None))
+            threads = [threading.Thread(target=write, args=writer, name=f'{collection}-writer-{i}', daemon=True)
+                       for i, writer in enumerate(writers)]
+            for thread in threads:
+                thread.start()
+            with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_pipeline_worker,
+                                     initargs=(id_snapshot, self.reject_log is not None and self.rejects_file,
+                                               self.reject_log is not None and self.dead_letter_dir,
+                                               self.id_storage, self.partitions)) as pool:
+                if not os.path.exists(filepath):
+                    print(f"⚠ File not found: {filepath}")
+                else:
+                    try:
+                        raw_chunks = self.iter_raw_bson_chunks(filepath, PIPELINE_CHUNK_SIZE, metrics,
+                                                               skip=documents_done)
+                        for index, (documents, raw) in enumerate(raw_chunks):
+                            if failure.is_set():
+                                break
+                            read += documents
+                            chunks.put((index, documents, raw,
+                                        pool.submit(_convert_pipeline_chunk, collection, raw, since)))
+                        else:
+                            print(f"✓ Loaded {read} records from {filename}")
+                    except OSError as e:
+                        print(f"✗ Failed to load {filename} after {read} records: {e}")
+        except BaseException:
+            failure.set()
+            raise
+        finally:
+            for _ in threads:
+                chunks.put(None)
+            for thread in threads:
+                thread.join()
+            for ids in id_snapshot.values():
+                ids.close()
+            for worker, _, _ in writers:
+                self.pool.release(worker.connection)
         
-        cursor = self.connection.cursor()
+        ok = not failure.is_set()
         successful = 0
-        failed = 0
+        failed = converted_failed
+        for _, writer, track in writers:
+            successful += writer.successful
+            failed += writer.failed
+            metrics.merge(writer.metrics)
+            metrics.failed += writer.failed
+            if track is not None:
+                getattr(self, tracked_attr).update(track)
+        if newest is not None:
+            self.high_water_marks[collection] = newest
+        if since is not None:
+            print(f"  {metrics.documents} of {read} documents changed since {since}")
         
-        try:
-            for record in data:
-                try:
-                    user_id = self.convert_mongo_id(record.get('user_id'))
-                    
-                    # Validate foreign key
-                    if user_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped AI usage: user_id {user_id} not found")
-                        continue
-                    
-                    usage_data = {
-                        'id': self.convert_mongo_id(record.get('_id')),
-                        'user_id': user_id,
-                        'username': record.get('username'),
-                        'count': record.get('count', 0),
-                        'month': record.get('month'),
-                        'year': record.get('year'),
-                        'last_used_at': self.convert_date(record.get('last_used_at')),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(usage_data))
-                    columns = ', '.join(f'`{k}`' for k in usage_data.keys())
-                    sql = f"INSERT INTO aiphotobooth_usages ({columns}) VALUES ({placeholders})"
-                    
-                    cursor.execute(sql, list(usage_data.values()))
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert AI usage: {e}")
-            
+        if ok and not self.incremental:
+            self.journal.save(self.connection, collection, documents_done, completed=True)
             self.connection.commit()
-            print(f"✓ AI Photobooth Usages: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ AI Photobooth Usages migration failed: {e}")
-            self.connection.rollback()
-            return False
+        self.report_collection(collection, successful, failed)
+        return ok
     
-    def migrate_broadcasts(self, data: List[Dict]) -> bool:
-        """Migrate broadcasts collection"""
-        if not data:
-            return True
-        
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+    def _migrate_in_worker(self, collection: str) -> bool:
+        """Migrate a collection on its own connection (runs in a worker thread)
         
+        The worker is a shallow copy of this converter, so it shares the
+        inserted_*_ids sets used for foreign key validation.
+        """
+        worker = copy.copy(self)
+        worker.connection = self.pool.acquire()
         try:
-            for record in data:
-                try:
-                    broadcast_id = self.convert_mongo_id(record.get('_id'))
-                    settings = record.get('settings', {})
-                    metadata = record.get('metadata', {})
-                    maintenance_window = metadata.get('maintenance_window', {})
-                    delivery_stats = record.get('delivery_stats', {})
-                    
-                    broadcast_data = {
-                        'id': broadcast_id,
-                        'title': record.get('title'),
-                        'message': record.get('message'),
-                        'type': record.get('type', 'general'),
-                        'priority': record.get('priority', 'medium'),
-                        'target_audience': record.get('target_audience', 'all'),
-                        'status': record.get('status', 'draft'),
-                        'scheduled_at': self.convert_date(record.get('scheduled_at')),
-                        'sent_at': self.convert_date(record.get('sent_at')),
-                        'expires_at': self.convert_date(record.get('expires_at')),
-                        'created_by': self.convert_mongo_id(record.get('created_by')),
-                        'sent_by': self.convert_mongo_id(record.get('sent_by')),
-                        'total_recipients': record.get('total_recipients', 0),
-                        'notifications_created': record.get('notifications_created', 0),
-                        'delivery_online': delivery_stats.get('online_delivery', 0),
-                        'delivery_offline': delivery_stats.get('offline_delivery', 0),
-                        'delivery_failed': delivery_stats.get('failed_delivery', 0),
-                        'send_to_new_users': self.convert_boolean(settings.get('send_to_new_users', False)),
-                        'persistent': self.convert_boolean(settings.get('persistent', True)),
-                        'dismissible': self.convert_boolean(settings.get('dismissible', True)),
-                        'action_url': settings.get('action_url'),
-                        'icon': settings.get('icon'),
-                        'color': settings.get('color'),
-                        'metadata_version': metadata.get('version'),
-                        'metadata_feature': metadata.get('feature_announcement'),
-                        'metadata_maintenance_start': self.convert_date(maintenance_window.get('start')),
-                        'metadata_maintenance_end': self.convert_date(maintenance_window.get('end')),
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(broadcast_data))
-                    columns = ', '.join(f'`{k}`' for k in broadcast_data.keys())
-                    sql = f"INSERT INTO broadcasts ({columns}) VALUES ({placeholders})"
-                    cursor.execute(sql, list(broadcast_data.values()))
-                    
-                    # Insert target roles
-                    target_roles = record.get('target_roles', [])
-                    for role in target_roles:
-                        cursor.execute(
-                            "INSERT INTO broadcast_target_roles (broadcast_id, role) VALUES (%s, %s)",
-                            (broadcast_id, role)
-                        )
-                    
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert broadcast: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Broadcasts: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Broadcasts migration failed: {e}")
-            self.connection.rollback()
-            return False
+            return worker.migrate_collection(collection)
+        finally:
+            self.pool.release(worker.connection)
     
-    def migrate_notifications(self, data: List[Dict]) -> bool:
-        """Migrate notifications collection"""
-        if not data:
-            return True
+    @staticmethod
+    def dependency_graph() -> Dict[str, set]:
+        """Build the collection DAG from the foreign keys declared in mappings.py
         
-        cursor = self.connection.cursor()
-        successful = 0
-        failed = 0
+        Only collections listed in MIGRATION_ORDER take part; dependencies on
+        collections that are not migrated are ignored.
+        """
+        dependencies = collection_dependencies(MAPPINGS)
+        graph = {}
+        for collection in MIGRATION_ORDER:
+            parents = dependencies.get(collection, ())
+            graph[collection] = {p for p in parents if p in MIGRATION_ORDER and p != collection}
+        return graph
+    
+    def run_collections_parallel(self, workers: int) -> bool:
+        """Migrate collections on a pool of workers, following the FK dependency graph
         
-        try:
-            for record in data:
-                try:
-                    recipient_id = self.convert_mongo_id(record.get('recipient_id'))
-                    sender_id = self.convert_mongo_id(record.get('sender_id'))
-                    
-                    # Validate foreign keys
-                    if recipient_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped notification: recipient_id {recipient_id} not found")
-                        continue
-                    
-                    if sender_id not in self.inserted_user_ids:
-                        failed += 1
-                        if VERBOSE:
-                            print(f"  ✗ Skipped notification: sender_id {sender_id} not found")
-                        continue
-                    
-                    notification_data_obj = record.get('data', {})
-                    
-                    notification_data = {
-                        'id': self.convert_mongo_id(record.get('_id')),
-                        'recipient_id': recipient_id,
-                        'sender_id': sender_id,
-                        'type': record.get('type'),
-                        'title': record.get('title'),
-                        'message': record.get('message'),
-                        'is_read': self.convert_boolean(record.get('is_read', False)),
-                        'read_at': self.convert_date(record.get('read_at')),
-                        'is_dismissible': self.convert_boolean(record.get('is_dismissible', True)),
-                        'expires_at': self.convert_date(record.get('expires_at')),
-                        'data_frame_id': self.convert_mongo_id(notification_data_obj.get('frame_id')),
-                        'data_frame_title': notification_data_obj.get('frame_title'),
-                        'data_frame_thumbnail': notification_data_obj.get('frame_thumbnail'),
-                        'data_follower_id': self.convert_mongo_id(notification_data_obj.get('follower_id')),
-                        'data_follower_name': notification_data_obj.get('follower_name'),
-                        'data_follower_username': notification_data_obj.get('follower_username'),
-                        'data_follower_image': notification_data_obj.get('follower_image'),
-                        'data_owner_id': self.convert_mongo_id(notification_data_obj.get('owner_id')),
-                        'data_owner_name': notification_data_obj.get('owner_name'),
-                        'data_owner_username': notification_data_obj.get('owner_username'),
-                        'data_owner_image': notification_data_obj.get('owner_image'),
-                        'data_birthday_user_id': self.convert_mongo_id(notification_data_obj.get('birthday_user_id')),
-                        'data_birthday_user_name': notification_data_obj.get('birthday_user_name'),
-                        'data_birthday_user_username': notification_data_obj.get('birthday_user_username'),
-                        'data_birthday_user_age': notification_data_obj.get('birthday_user_age'),
-                        'data_broadcast_id': self.convert_mongo_id(notification_data_obj.get('broadcast_id')),
-                        'data_broadcast_type': notification_data_obj.get('broadcast_type'),
-                        'data_broadcast_priority': notification_data_obj.get('broadcast_priority'),
-                        'data_action_url': notification_data_obj.get('action_url'),
-                        'data_custom_icon': notification_data_obj.get('custom_icon'),
-                        'data_custom_color': notification_data_obj.get('custom_color'),
-                        'data_additional_info': json.dumps(notification_data_obj.get('additional_info')) if notification_data_obj.get('additional_info') else None,
-                        'created_at': self.convert_date(record.get('created_at')),
-                        'updated_at': self.convert_date(record.get('updated_at')),
-                    }
-                    
-                    placeholders = ', '.join(['%s'] * len(notification_data))
-                    columns = ', '.join(f'`{k}`' for k in notification_data.keys())
-                    sql = f"INSERT INTO notifications ({columns}) VALUES ({placeholders})"
-                    
-                    cursor.execute(sql, list(notification_data.values()))
-                    successful += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    if VERBOSE:
-                        print(f"  ✗ Failed to insert notification: {e}")
-            
-            self.connection.commit()
-            print(f"✓ Notifications: {successful} successful, {failed} failed")
-            return True
-            
-        except Exception as e:
-            print(f"✗ Notifications migration failed: {e}")
-            self.connection.rollback()
-            return False
+        A collection is started as soon as every collection it depends on has
+        committed, so independent collections (e.g. follows, frames, tickets)
+        load at the same time. Once a collection fails no further collections
+        are started (the running ones finish) and False is returned.
+        """
+        pending = self.dependency_graph()
+        done = set()
+        running = {}
+        failed = []
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while running or (pending and not failed):
+                ready = [c for c in MIGRATION_ORDER if c in pending and pending[c] <= done] if not failed else []
+                for collection in ready:
+                    del pending[collection]
+                    running[pool.submit(self._migrate_in_worker, collection)] = collection
+                
+                if not running:
+                    raise RuntimeError(f"Circular collection dependencies: {', '.join(sorted(pending))}")
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collection = running.pop(future)
+                    if future.result():
+                        done.add(collection)
+                    else:
+                        failed.append(collection)
+        
+        if failed:
+            skipped = [c for c in MIGRATION_ORDER if c in pending]
+            print(f"\n✗ {', '.join(failed)} failed; not started: {', '.join(skipped) or 'none'}")
+        return not failed
     
-    def run_migration(self):
-        """Run the complete migration process"""
+    def run_migration(self, workers: int = PARALLEL_WORKERS, resume: bool = False):
+        """Run the complete migration process
+        
+        With `resume` the schema is left in place: collections the journal
+        marks as completed are skipped, the one that was interrupted continues
+        after its last committed batch and the foreign key sets are rebuilt
+        from the target database.
+        
+        In incremental mode (after a full load) no tables are dropped: only
+        documents changed since each collection's high-water mark are
+        upserted and their child rows replaced.
+        """
         print("\n" + "="*60)
         print("MongoDB to MySQL Migration Tool")
         print("="*60 + "\n")
@@ -1116,43 +1262,63 @@ class MongoToMySQLConverter:
             return False
         
         try:
-            # Execute schema
-            print("\n[Step 1] Creating database schema...")
-            if not self.execute_schema():
-                return False
+            if self.incremental or resume:
+                self.match_id_storage()
+                self.match_partitions()
+            if self.incremental:
+                self.journal.create(self.connection)
+                self.high_water_marks = self.journal.load_high_water(self.connection)
+                if not self.high_water_marks:
+                    print("⚠ No high-water marks found, every document will be upserted")
+            elif resume:
+                self.resume_state = self.journal.load(self.connection)
+                self.high_water_marks = self.journal.load_high_water(self.connection) if self.resume_state else {}
+                if not self.resume_state:
+                    print("⚠ No checkpoint journal found, starting a fresh migration")
+            
+            if self.incremental:
+                print("\n[Step 1] Incremental pass: keeping existing tables...")
+                self.rebuild_inserted_ids()
+            elif self.resume_state:
+                print("\n[Step 1] Resuming from checkpoint journal...")
+                self.rebuild_inserted_ids()
+            else:
+                # Execute schema
+                print("\n[Step 1] Creating database schema...")
+                if not self.execute_schema():
+                    return False
+                self.journal.create(self.connection, reset=True)
+            
+            # Fresh runs start new rejects/dead-letter files, resumed/incremental runs add to them
+            self.open_reject_log(append=bool(self.incremental or self.resume_state))
             
             # Migrate each collection in order
             print("\n[Step 2] Migrating data...")
             
-            migration_methods = {
-                'users': self.migrate_users,
-                'maintenances': self.migrate_maintenances,
-                'follows': self.migrate_follows,
-                'frames': self.migrate_frames,
-                'tickets': self.migrate_tickets,
-                'reports': self.migrate_reports,
-                'photos': self.migrate_photos,
-                'photoposts': self.migrate_photoposts,
-                'photocollabs': self.migrate_photocollabs,
-                'aiphotobooth_usages': self.migrate_aiphotobooth_usages,
-                'broadcasts': self.migrate_broadcasts,
-                'notifications': self.migrate_notifications,
-            }
+            if workers > 1:
+                print(f"Running up to {workers} collections in parallel")
+                ok = self.run_collections_parallel(workers)
+            else:
+                ok = True
+                for collection in MIGRATION_ORDER:
+                    if not self.migrate_collection(collection):
+                        # Later collections may depend on it: stop here, the journal keeps it not completed
+                        skipped = MIGRATION_ORDER[MIGRATION_ORDER.index(collection) + 1:]
+                        print(f"\n✗ {collection} failed; not started: {', '.join(skipped) or 'none'}")
+                        ok = False
+                        break
             
-            for collection in MIGRATION_ORDER:
-                print(f"\n--- Migrating {collection} ---")
-                filename = DATA_FILES.get(collection)
-                
-                if not filename:
-                    print(f"⚠ No file mapping found for {collection}, skipping...")
-                    continue
-                
-                data = self.load_data_file(filename)
-                
-                if collection in migration_methods:
-                    migration_methods[collection](data)
-                else:
-                    print(f"⚠ No migration method for {collection}, skipping...")
+            if not ok:
+                rerun = 'python converter.py --incremental' if self.incremental else 'python converter.py --resume'
+                print("\n" + "="*60)
+                print(f"✗ Migration stopped. Committed batches are kept; fix the cause and continue with: {rerun}")
+                print("="*60)
+                return False
+            
+            if self.bulk_load and not self.incremental:
+                print("\n[Step 3] Building deferred indexes and foreign keys...")
+                if not self.finalize_bulk_load():
+                    return False
             
             print("\n" + "="*60)
             print("✓ Migration completed successfully!")
@@ -1164,13 +1330,272 @@ class MongoToMySQLConverter:
             print(f"\n✗ Migration failed: {e}")
             return False
         finally:
+            self.close_reject_log()
+            self.report_metrics()
+            self.close()
+
+    
+    def run_schema(self, drop: bool = False) -> bool:
+        """Only create the empty schema, or with `drop` only drop its tables (--schema-only / --drop-schema)"""
+        if not self.connect():
+            return False
+        try:
+            started = time.perf_counter()
+            if drop:
+                ok = self.drop_schema()
+            else:
+                ok = self.execute_schema()
+                if ok:
+                    self.journal.create(self.connection, reset=True)
+                    self.connection.commit()
+            print(f"  {'Teardown' if drop else 'Setup'} took {time.perf_counter() - started:.2f}s "
+                  f"(schema workers: {self.schema_workers})")
+            return ok
+        finally:
+            self.close()
+    
+    def claim_dead_letters(self, collection: str) -> Optional[str]:
+        """Move a collection's dead-letter file aside for replaying; returns its new path
+        
+        New rejects of the replay go to a fresh file. A file left over by an
+        interrupted replay is picked up again (with anything added since).
+        """
+        path = dead_letter_path(self.dead_letter_dir, collection)
+        claimed = path + '.replaying'
+        if os.path.exists(path):
+            if os.path.exists(claimed):
+                with open(claimed, 'ab') as target, open(path, 'rb') as source:
+                    shutil.copyfileobj(source, target)
+                os.remove(path)
+            else:
+                os.replace(path, claimed)
+        return claimed if os.path.exists(claimed) else None
+    
+    def run_replay(self) -> bool:
+        """Re-migrate the documents saved in the dead-letter files (converter.py --replay)
+        
+        Run it once the missing parents exist (e.g. after an incremental
+        pass). Collections are replayed in MIGRATION_ORDER against foreign key
+        sets rebuilt from the database, and documents are upserted with their
+        child rows replaced, so a document whose parent row made it but a
+        child row did not is written again as a whole. Documents that are
+        still rejected end up in new dead-letter files.
+        """
+        print("\n" + "="*60)
+        print("Replaying rejected documents")
+        print("="*60 + "\n")
+        
+        claimed = {}
+        for collection in MIGRATION_ORDER:
+            path = self.claim_dead_letters(collection) if os.path.isdir(self.dead_letter_dir) else None
+            if path:
+                claimed[collection] = path
+        if not claimed:
+            print(f"✓ No dead-letter files in {self.dead_letter_dir}, nothing to replay")
+            return True
+        
+        if not self.connect():
+            return False
+        
+        ok = True
+        try:
+            self.match_id_storage()
+            self.match_partitions()
+            self.journal.create(self.connection)
+            self.rebuild_inserted_ids()
+            self.open_reject_log(append=True)
+            migration_methods = self.migration_methods()
+            
+            for collection, path in claimed.items():
+                print(f"\n--- Replaying {collection} ---")
+                metrics = self.metrics.collection(collection)
+                metrics.bytes_total = os.path.getsize(path)
+                started = time.perf_counter()
+                documents = (envelope['document'] for envelope in self.iter_bson_file(path, metrics))
+                if migration_methods[collection](documents):
+                    os.remove(path)
+                else:
+                    ok = False
+                    print(f"  ⚠ Kept {path} for the next replay")
+                metrics.wall += time.perf_counter() - started
+            
+            print("\n" + "="*60)
+            print("✓ Replay completed!" if ok else "⚠ Replay finished with errors")
+            print("="*60)
+            return ok
+            
+        except Exception as e:
+            print(f"\n✗ Replay failed: {e}")
+            return False
+        finally:
+            self.close_reject_log()
+            self.report_metrics()
             self.close()
 
 
+def _chunked(data: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Group a document stream into lists of at most `size` documents"""
+    chunk = []
+    for doc in data:
+        chunk.append(doc)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Per-process converter used by migrate_sharded workers
+_shard_converter = None
+
+
+def _init_shard_worker(id_snapshot: Dict[str, SharedIdIndex], load_mode: str, bulk_load: bool, incremental: bool,
+                       rejects_file: Optional[str], dead_letter_dir: Optional[str], id_storage: str,
+                       partitions: Dict[str, PartitionLayout]):
+    """Open this worker process's connection and install the FK sets snapshot"""
+    global _shard_converter
+    _shard_converter = MongoToMySQLConverter(load_mode=load_mode, bulk_load=bulk_load, incremental=incremental,
+                                             rejects_file=rejects_file or None,
+                                             dead_letter_dir=dead_letter_dir or None, id_storage=id_storage,
+                                             partitions=partitions)
+    _shard_converter.quiet = True
+    # Appends to the parent's rejects and dead-letter files
+    _shard_converter.open_reject_log(append=True)
+    for attr, ids in id_snapshot.items():
+        setattr(_shard_converter, attr, ids.attach())
+    _shard_converter.connection = _shard_converter.pool.acquire()
+
+
+# Per-process converter used by migrate_pipelined workers (conversion only, no connection)
+_pipeline_converter = None
+
+
+def _init_pipeline_worker(id_snapshot: Dict[str, SharedIdIndex], rejects_file: Optional[str],
+                          dead_letter_dir: Optional[str], id_storage: str, partitions: Dict[str, PartitionLayout]):
+    """Attach this worker process to the shared FK sets snapshot"""
+    global _pipeline_converter
+    _pipeline_converter = MongoToMySQLConverter(rejects_file=rejects_file or None,
+                                                dead_letter_dir=dead_letter_dir or None, id_storage=id_storage,
+                                                partitions=partitions)
+    _pipeline_converter.quiet = True
+    # Appends to the parent's rejects and dead-letter files
+    _pipeline_converter.open_reject_log(append=True)
+    for attr, ids in id_snapshot.items():
+        setattr(_pipeline_converter, attr, ids.attach())
+
+
+def _convert_pipeline_chunk(collection: str, raw: bytes, since: Optional[datetime]):
+    """Decode and convert one raw chunk in a worker process (see convert_raw_chunk)"""
+    _pipeline_converter.metrics.collections.pop(collection, None)
+    return _pipeline_converter.convert_raw_chunk(collection, raw, since)
+
+
+def _migrate_shard_chunk(collection: str, documents: List[Dict]):
+    """Migrate one chunk in a worker process
+    
+    Returns (ok, successful, failed, new_ids, stage metrics, (rejects
+    written, dead letters written)).
+    """
+    converter = _shard_converter
+    tracked_attr = TRACKED_IDS.get(collection)
+    if tracked_attr:
+        # Collect only the IDs inserted by this chunk so they can be merged back
+        setattr(converter, tracked_attr, IdIndex())
+    
+    converter.connection = converter.pool.check(converter.connection)
+    converter.stats['by_collection'].pop(collection, None)
+    converter.metrics.collections.pop(collection, None)
+    log = converter.reject_log
+    logged = (log.written, log.dead_letters) if log is not None else (0, 0)
+    ok = converter.migration_methods()[collection](documents)
+    if log is not None:
+        log.flush()
+        logged = (log.written - logged[0], log.dead_letters - logged[1])
+    counts = converter.stats['by_collection'].get(collection, {'successful': 0, 'failed': 0})
+    new_ids = getattr(converter, tracked_attr) if tracked_attr else IdIndex()
+    return (ok, counts['successful'], counts['failed'], new_ids, converter.metrics.collections.get(collection),
+            logged)
+
+
 def main():
     """Main entry point"""
-    converter = MongoToMySQLConverter()
-    success = converter.run_migration()
+    parser = argparse.ArgumentParser(description='Migrate Snaplove MongoDB dumps to MySQL')
+    parser.add_argument('--workers', type=int, default=PARALLEL_WORKERS,
+                        help='collections migrated in parallel, each on its own connection '
+                             f'(default: {PARALLEL_WORKERS})')
+    parser.add_argument('--load-mode', choices=['insert', 'infile'], default=LOAD_MODE,
+                        help="'insert' = multi-row INSERT, 'infile' = LOAD DATA LOCAL INFILE via TSV staging files "
+                             f"(default: {LOAD_MODE})")
+    parser.add_argument('--bulk-load', action='store_true', default=BULK_LOAD,
+                        help='create tables with primary and unique keys only, load with foreign_key_checks off, '
+                             'then add secondary indexes and foreign keys')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted migration from the _migration_state journal '
+                             'instead of recreating the schema')
+    parser.add_argument('--incremental', action='store_true',
+                        help='after a full load: upsert only documents changed since the last run, '
+                             'without recreating the schema')
+    parser.add_argument('--rejects-file', default=REJECTS_FILE,
+                        help='file for the details of skipped/failed documents, one JSON line each '
+                             f'(default: {REJECTS_FILE})')
+    parser.add_argument('--dead-letter-dir', default=DEAD_LETTER_DIR,
+                        help='directory for the rejected documents, one <collection>.rejects.bson per collection '
+                             f'(default: {DEAD_LETTER_DIR})')
+    parser.add_argument('--replay', action='store_true',
+                        help='re-migrate the documents in --dead-letter-dir (after their parents have been loaded)')
+    parser.add_argument('--schema-workers', type=int, default=SCHEMA_WORKERS,
+                        help='connections running independent CREATE/DROP/ALTER TABLE statements at the same time '
+                             f'(default: {SCHEMA_WORKERS})')
+    parser.add_argument('--no-secondary-indexes', action='store_true',
+                        help='create the tables without their plain INDEXes (primary, unique and foreign keys stay)')
+    parser.add_argument('--id-storage', choices=list(ID_STORAGE_TYPES), default=ID_STORAGE,
+                        help="store ObjectId ids as 'hex' (VARCHAR(24)) or 'binary' (BINARY(12)); resumed and "
+                             f"incremental runs follow the existing tables (default: {ID_STORAGE})")
+    parser.add_argument('--partition', action='append', default=[], metavar='TABLE=UNIT',
+                        help=f"partition TABLE by RANGE of created_at, one partition per UNIT "
+                             f"({'/'.join(PARTITION_UNITS)}, or 'none' to turn off a table of PARTITIONED_TABLES); "
+                             "resumed and incremental runs follow the existing tables")
+    parser.add_argument('--schema-only', action='store_true',
+                        help='only create the empty schema, then exit')
+    parser.add_argument('--drop-schema', action='store_true',
+                        help='only drop the tables of the schema and the journal, then exit')
+    parser.add_argument('--metrics-file', default=METRICS_FILE,
+                        help='write the per-stage timings to this file: Prometheus textfile for *.prom, '
+                             'JSON otherwise')
+    args = parser.parse_args()
+    if args.incremental and args.resume:
+        parser.error('--incremental cannot be combined with --resume')
+    if args.replay and (args.incremental or args.resume):
+        parser.error('--replay cannot be combined with --incremental or --resume')
+    if args.replay and not args.dead_letter_dir:
+        parser.error('--replay needs --dead-letter-dir (or DEAD_LETTER_DIR in config.py)')
+    if sum((args.schema_only, args.drop_schema, args.replay, args.incremental, args.resume)) > 1:
+        parser.error('--schema-only and --drop-schema cannot be combined with each other or with other modes')
+    partitioned = dict(PARTITIONED_TABLES)
+    for option in args.partition:
+        table, _, unit = option.partition('=')
+        if unit == 'none':
+            partitioned.pop(table, None)
+        elif unit in PARTITION_UNITS:
+            partitioned[table] = unit
+        else:
+            parser.error(f"--partition {option}: expected TABLE={'|'.join(PARTITION_UNITS)}|none")
+    
+    # Replayed documents are upserted like in an incremental pass
+    incremental = args.incremental or args.replay
+    converter = MongoToMySQLConverter(load_mode=args.load_mode, bulk_load=args.bulk_load and not incremental,
+                                      incremental=incremental, metrics_file=args.metrics_file,
+                                      rejects_file=args.rejects_file, dead_letter_dir=args.dead_letter_dir,
+                                      schema_workers=args.schema_workers,
+                                      secondary_indexes=not args.no_secondary_indexes,
+                                      id_storage=args.id_storage,
+                                      partitions=partition_layouts(partitioned, PARTITION_YEARS))
+    if args.schema_only or args.drop_schema:
+        success = converter.run_schema(drop=args.drop_schema)
+    elif args.replay:
+        success = converter.run_replay()
+    else:
+        success = converter.run_migration(workers=args.workers, resume=args.resume)
     sys.exit(0 if success else 1)
 
 
@@ -0,0 +1,134 @@
+"""
+Date conversion for the migration
+MongoDB dates reach the converter as native datetimes (BSON), as
+{'$date': ...} wrappers or as ISO 8601 strings (JSON exports). Everything is
+converted to naive UTC datetimes, with fast paths for the common cases since
+this runs several times per document.
+"""
+
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+EPOCH = datetime(1970, 1, 1)
+# Shorter columns are converted one value at a time (numpy call overhead)
+NUMPY_MIN_BATCH = 32
+# Epoch millis that fit numpy's int64 (larger ones take the per-value path)
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+@lru_cache(maxsize=65536)
+def parse_iso_date(value: str) -> Optional[datetime]:
+    """'2024-05-01T12:00:00.123Z' -> datetime(2024, 5, 1, 12, 0, 0) in UTC, None if not ISO 8601
+
+    Cached: exports repeat the same timestamps a lot (defaults, bulk updates,
+    updated_at equal to created_at, copied into likes and notifications).
+    """
+    try:
+        if value[-1:] == 'Z' and len(value) in (20, 24):
+            # mongoexport layout: drop the milliseconds and the UTC marker
+            return datetime.fromisoformat(value[:19])
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    offset = dt.utcoffset()
+    if offset is not None:
+        dt = dt.replace(tzinfo=None) - offset
+    return dt.replace(microsecond=0) if dt.microsecond else dt
+
+
+def _number_long_date(value: dict) -> Optional[datetime]:
+    """{'$numberLong': '<epoch millis>'} (canonical extended JSON) -> datetime"""
+    try:
+        return EPOCH + timedelta(0, int(value['$numberLong']) // 1000)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return None
+
+
+def convert_mongo_date(date_value: Any) -> Any:
+    """Convert a MongoDB date to a MySQL DATETIME value
+
+    Native datetimes are passed through (tz-aware ones are shifted to naive
+    UTC); ISO strings and epoch milliseconds become naive UTC datetimes
+    truncated to whole seconds. Unparseable plain strings are returned
+    unchanged and unparseable {'$date': ...} values become None.
+    """
+    value_type = type(date_value)
+    if value_type is datetime:
+        if date_value.tzinfo is None:
+            return date_value
+        return date_value.astimezone(timezone.utc).replace(tzinfo=None)
+    if date_value is None:
+        return None
+
+    if value_type is str:
+        parsed = parse_iso_date(date_value)
+        return date_value if parsed is None else parsed
+
+    if value_type is dict and '$date' in date_value:
+        inner = date_value['$date']
+        inner_type = type(inner)
+        if inner_type is str:
+            return parse_iso_date(inner)
+        if inner_type is int or inner_type is float:
+            return EPOCH + timedelta(0, int(inner) // 1000)
+        if inner_type is dict:
+            return _number_long_date(inner)
+        if isinstance(inner, (int, float)) and inner_type is not bool:  # bson.Int64 (millis above 2^31)
+            return EPOCH + timedelta(0, int(inner) // 1000)
+        return None
+
+    if isinstance(date_value, datetime):  # datetime subclasses
+        if date_value.tzinfo is None:
+            return date_value
+        return date_value.astimezone(timezone.utc).replace(tzinfo=None)
+    return date_value
+
+
+def _epoch_millis(value: dict) -> Optional[int]:
+    """The epoch milliseconds of a {'$date': <int>} value (bson.Int64 included), else None"""
+    inner = value.get('$date')
+    if type(inner) is int:
+        return inner
+    if isinstance(inner, int) and type(inner) is not bool:
+        return int(inner)
+    if type(inner) is dict:
+        try:
+            return int(inner['$numberLong'])
+        except (KeyError, TypeError, ValueError):
+            return None
+    return None
+
+
+def convert_mongo_dates(values: List[Any]) -> List[Any]:
+    """convert_mongo_date for a whole column (e.g. the created_at of every like)
+
+    Epoch-millisecond values of longer columns are converted together with
+    numpy datetime64; everything else, including millis outside the datetime
+    range, goes through convert_mongo_date, so both paths agree.
+    """
+    if np is None or len(values) < NUMPY_MIN_BATCH:
+        return [convert_mongo_date(value) for value in values]
+
+    converted = []
+    positions = []
+    millis = []
+    for value in values:
+        ms = _epoch_millis(value) if type(value) is dict else None
+        if ms is None or not INT64_MIN <= ms <= INT64_MAX:
+            converted.append(convert_mongo_date(value))
+        else:
+            positions.append(len(converted))
+            millis.append(ms)
+            converted.append(None)
+    if millis:
+        seconds = np.array(millis, dtype='int64') // 1000
+        for i, dt in zip(positions, seconds.astype('datetime64[s]').tolist()):
+            # datetime64 values outside datetime's years 1..9999 come back as plain ints
+            converted[i] = dt if type(dt) is datetime else convert_mongo_date(values[i])
+    return converted
@@ -0,0 +1,229 @@
+"""
+Compact index of migrated ObjectIds used for foreign key validation
+Stores ids as 12-byte binary keys in a sorted numpy array instead of a
+Python set of 24-character hex strings (about 12 bytes per id instead of
+100+). numpy is optional; without it the index falls back to a set of
+12-byte keys, which still roughly halves the memory of hex strings.
+SharedIdIndex hands an index to worker processes through shared memory.
+"""
+
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+from typing import Any, Iterable, Iterator, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def object_id_key(value: Any) -> Optional[bytes]:
+    """12-byte key for an ObjectId, its hex string or its raw bytes; None for anything else"""
+    if isinstance(value, bytes):
+        return value if len(value) == 12 else None
+    if isinstance(value, str):
+        if len(value) != 24:
+            return None
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            return None
+    binary = getattr(value, 'binary', None)  # bson.ObjectId
+    return binary if isinstance(binary, bytes) and len(binary) == 12 else None
+
+
+def object_id_time(value: Any) -> Optional[datetime]:
+    """Creation time (naive UTC) encoded in an ObjectId, its hex string or its raw bytes; else None"""
+    key = object_id_key(value)
+    return None if key is None else _EPOCH + timedelta(seconds=int.from_bytes(key[:4], 'big'))
+
+
+def contains_many(index, values: Iterable) -> List[bool]:
+    """Membership of every value: index.contains_many() for an IdIndex, one `in` each for other containers"""
+    method = getattr(index, 'contains_many', None)
+    if method is not None:
+        return method(values)
+    return [value in index for value in values]
+
+
+class IdIndex:
+    """Set-like container of ObjectIds (add/update/in/discard/len)
+
+    New ids go into a pending set that is merged into the sorted array once
+    it reaches 1/16 of the array, so bulk loading costs a logarithmic
+    number of linear merges. Lookups are a binary search. Ids that are not
+    ObjectIds (e.g. string _ids) are kept as-is in a regular set.
+    """
+
+    MIN_PENDING = 65536
+
+    def __init__(self, ids: Iterable = ()):
+        self._sorted = np.empty(0, dtype='S12') if np is not None else None
+        self._pending = set()
+        self._other = set()
+        self.update(ids)
+
+    def __len__(self) -> int:
+        self._merge()
+        return len(self._pending) + len(self._other) + (len(self._sorted) if np is not None else 0)
+
+    def __contains__(self, value) -> bool:
+        key = object_id_key(value)
+        if key is None:
+            return value in self._other
+        if key in self._pending:
+            return True
+        if np is None or not len(self._sorted):
+            return False
+        position = self._sorted.searchsorted(key)
+        # numpy returns 'S' elements without their trailing NUL bytes
+        return position < len(self._sorted) and self._sorted[position] == key.rstrip(b'\0')
+
+    def __iter__(self) -> Iterator:
+        """Iterate ids as hex strings (plus any non-ObjectId ids)"""
+        self._merge()
+        keys = self._pending if np is None else (key.ljust(12, b'\0') for key in self._sorted.tolist())
+        for key in keys:
+            yield key.hex()
+        yield from self._other
+
+    def add(self, value):
+        key = object_id_key(value)
+        if key is None:
+            if value is not None:
+                self._other.add(value)
+            return
+        self._pending.add(key)
+        if len(self._pending) >= self._merge_limit():
+            self._merge()
+
+    def update(self, values: Iterable):
+        if isinstance(values, IdIndex):
+            values._merge()
+            self._other.update(values._other)
+            if np is not None:
+                self._merge(values._sorted)
+            else:
+                self._pending.update(values._pending)
+            return
+        limit = self._merge_limit()
+        for value in values:
+            key = object_id_key(value)
+            if key is not None:
+                self._pending.add(key)
+                if len(self._pending) >= limit:
+                    self._merge()
+                    limit = self._merge_limit()
+            elif value is not None:
+                self._other.add(value)
+
+    def discard(self, value):
+        self.difference_update((value,))
+
+    def difference_update(self, values: Iterable):
+        """Remove many ids at once (used when a transaction is rolled back)"""
+        keys = []
+        for value in values:
+            key = object_id_key(value)
+            if key is None:
+                self._other.discard(value)
+            elif key in self._pending:
+                self._pending.discard(key)
+            else:
+                keys.append(key)
+        if keys and np is not None and len(self._sorted):
+            keys = np.array(keys, dtype='S12')
+            positions = np.minimum(self._sorted.searchsorted(keys), len(self._sorted) - 1)
+            self._sorted = np.delete(self._sorted, positions[self._sorted[positions] == keys])
+
+    def contains_many(self, values: Iterable) -> List[bool]:
+        """Vectorized membership test for a batch of ids"""
+        values = list(values)
+        keys = [object_id_key(value) for value in values]
+        result = [key in self._pending if key is not None else value in self._other
+                  for key, value in zip(keys, values)]
+        if np is None or not len(self._sorted):
+            return result
+
+        lookup = [i for i, key in enumerate(keys) if key is not None and not result[i]]
+        if lookup:
+            probe = np.array([keys[i] for i in lookup], dtype='S12')
+            positions = np.minimum(self._sorted.searchsorted(probe), len(self._sorted) - 1)
+            found = self._sorted[positions] == probe
+            for i, hit in zip(lookup, found.tolist()):
+                result[i] = hit
+        return result
+
+    def _merge_limit(self) -> float:
+        if np is None:
+            return float('inf')
+        return max(self.MIN_PENDING, len(self._sorted) >> 4)
+
+    def _merge(self, other: Optional['np.ndarray'] = None):
+        """Fold the pending keys (and an already sorted array) into the sorted array"""
+        if np is None:
+            return
+        parts = [other] if other is not None and len(other) else []
+        if self._pending:
+            pending = np.array(list(self._pending), dtype='S12')
+            pending.sort()
+            parts.append(pending)
+            self._pending = set()
+        if not parts:
+            return
+
+        merged = np.concatenate([self._sorted] + parts)
+        merged.sort(kind='stable')  # timsort: linear for a handful of already sorted runs
+        keep = np.empty(len(merged), dtype=bool)
+        keep[:1] = True
+        np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+        self._sorted = merged[keep]
+
+
+class SharedIdIndex:
+    """Read-only snapshot of an IdIndex for worker processes
+
+    The sorted keys are copied once into a shared memory block and only the
+    block's name is pickled; attach() in a worker maps them without a copy,
+    so N workers do not hold N copies of the foreign key sets. The process
+    that created the snapshot calls close() once its workers are done.
+    Without numpy the keys are pickled as a set instead.
+    """
+
+    def __init__(self, index: IdIndex):
+        index._merge()
+        self.other = set(index._other)
+        self.pending = set(index._pending)  # Always empty with numpy after _merge()
+        self.size = len(index._sorted) if np is not None else 0
+        self.name = None
+        self._memory = None
+        if self.size:
+            self._memory = shared_memory.SharedMemory(create=True, size=self.size * 12)
+            np.ndarray(self.size, dtype='S12', buffer=self._memory.buf)[:] = index._sorted
+            self.name = self._memory.name
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_memory'] = None
+        return state
+
+    def attach(self) -> IdIndex:
+        """An IdIndex over the shared keys, for lookups only"""
+        index = IdIndex()
+        index._pending = set(self.pending)
+        index._other = set(self.other)
+        if self.name is not None:
+            memory = shared_memory.SharedMemory(name=self.name)
+            index._sorted = np.ndarray(self.size, dtype='S12', buffer=memory.buf)
+            index._sorted.flags.writeable = False
+            index._memory = memory  # Keeps the block mapped as long as the index lives
+        return index
+
+    def close(self):
+        """Free the shared memory block (in the creating process)"""
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
@@ -0,0 +1,691 @@
+"""
+Declarative mapping of MongoDB collections to MySQL tables
+Each collection is described once: where every column comes from in the
+document, how it is converted and declared in SQL, which foreign keys are
+validated, which indexes the table has and which arrays become child
+tables. compile_mappings() turns the descriptions into row-builder
+functions (generated Python source, compiled once per run) that return the
+INSERT value tuples in a fixed column order; schema_gen.py turns them into
+the CREATE TABLE statements.
+"""
+
+import json
+import string
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from bson_values import json_default
+from dates import NUMPY_MIN_BATCH
+from id_index import contains_many, object_id_time
+
+
+class Column(NamedTuple):
+    """One target column
+
+    `source` is a dotted path into the document ('inviter.user_id'). Inside
+    a Child, '$' is the array element itself and '#' its position.
+    `convert` is 'id', 'date', 'bool', 'json' or None (value as is);
+    `default` is used when the field is missing. `sql` is the column
+    definition without PRIMARY KEY; it may be left out for 'id' (nullable
+    VARCHAR(24)), 'date' (DATETIME), 'json' and 'bool' columns (BOOLEAN
+    DEFAULT `default`), see schema_gen.column_definition().
+    """
+    name: str
+    source: str
+    convert: Optional[str] = None
+    default: Any = None
+    sql: Optional[str] = None
+
+
+class Index(NamedTuple):
+    """INDEX (or UNIQUE KEY) of a table"""
+    name: str
+    columns: Tuple[str, ...]
+    unique: bool = False
+
+
+class ForeignKey(NamedTuple):
+    """Reference from a column to the ids migrated for another collection
+
+    on_missing:
+      'required' - skip the document when the value is NULL or unknown
+      'skip'     - skip the document when the value is set but unknown
+      'null'     - store NULL when the value is set but unknown
+      'drop'     - (Child only) leave out the child row when NULL or unknown
+    A 'skip' foreign key on a Child skips the whole parent document.
+    In SQL it becomes a FOREIGN KEY ... ON DELETE CASCADE, or ON DELETE SET
+    NULL when the column is nullable.
+    """
+    column: str
+    references: str
+    on_missing: str = 'required'
+    name: Optional[str] = None  # shown in skip messages, defaults to the column
+
+
+class Child(NamedTuple):
+    """Array field stored as rows of a child table
+
+    `parent_column` receives the parent's id (NOT NULL, with a foreign key
+    and an index). Without an 'id' column the table gets an AUTO_INCREMENT
+    id. `element_key` treats bare (non-dict) elements as
+    {element_key: element}.
+    """
+    table: str
+    source: str
+    parent_column: str
+    columns: Tuple[Column, ...]
+    foreign_keys: Tuple[ForeignKey, ...] = ()
+    element_key: Optional[str] = None
+    indexes: Tuple[Index, ...] = ()
+
+
+class Mapping(NamedTuple):
+    """A collection and the table it is migrated to (the first column is the primary key)"""
+    collection: str
+    table: str
+    title: str  # shown in the summary lines
+    columns: Tuple[Column, ...]
+    foreign_keys: Tuple[ForeignKey, ...] = ()
+    children: Tuple[Child, ...] = ()
+    label: str = 'record'  # one document in error messages; may use top-level fields, e.g. 'frame {title}'
+    indexes: Tuple[Index, ...] = ()
+
+
+class MissingReference(Exception):
+    """Raised by a row builder when a foreign key points at a document that was not migrated"""
+
+    def __init__(self, name: str, value: Any):
+        super().__init__(f"{name} {value.hex() if isinstance(value, bytes) else value} not found")
+        self.name = name
+        self.value = value
+
+
+# SQL definitions shared by several columns
+REQUIRED_ID = 'VARCHAR(24) NOT NULL'
+CREATED_AT = 'DATETIME DEFAULT CURRENT_TIMESTAMP'
+UPDATED_AT = 'DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'
+ROLES = "ENUM('basic', 'verified_basic', 'verified_premium', 'official', 'developer')"
+LAYOUTS = "ENUM('2x1', '3x1', '4x1')"
+PRIORITIES = "ENUM('low', 'medium', 'high', 'urgent')"
+
+
+def _timestamps(created: str = 'created_at', updated: str = 'updated_at') -> Tuple[Column, ...]:
+    return (Column('created_at', created, 'date', sql=CREATED_AT),
+            Column('updated_at', updated, 'date', sql=UPDATED_AT))
+
+
+def _ordered(table: str, parent_column: str, source: str, value_column: str) -> Child:
+    """Array of plain values kept in order (images, videos)"""
+    return Child(table, source, parent_column,
+                 (Column(value_column, '$', sql='TEXT NOT NULL'), Column('order_index', '#', sql='INT DEFAULT 0')))
+
+
+MAPPINGS: Dict[str, Mapping] = {m.collection: m for m in (
+    Mapping('users', 'users', 'Users', (
+        Column('id', '_id', 'id'),
+        Column('image_profile', 'image_profile', sql='TEXT'),
+        Column('custom_profile_image', 'custom_profile_image', sql='TEXT'),
+        Column('use_google_profile', 'use_google_profile', 'bool', True),
+        Column('name', 'name', sql='VARCHAR(100) NOT NULL'),
+        Column('username', 'username', sql='VARCHAR(100) NOT NULL UNIQUE'),
+        Column('email', 'email', sql='VARCHAR(255) NOT NULL UNIQUE'),
+        Column('password', 'password', sql='TEXT'),
+        Column('role', 'role', default='basic', sql=ROLES + " DEFAULT 'basic'"),
+        Column('bio', 'bio', default='', sql="VARCHAR(500) DEFAULT ''"),
+        Column('birthdate', 'birthdate', 'date', sql='DATE'),
+        Column('birthdate_changed', 'birthdate_changed', 'bool', False),
+        Column('birthdate_changed_at', 'birthdate_changed_at', 'date'),
+        Column('last_birthday_notification', 'last_birthday_notification', 'date'),
+        Column('ban_status', 'ban_status', 'bool', False),
+        Column('ban_release_datetime', 'ban_release_datetime', 'date'),
+        Column('google_id', 'google_id', sql='VARCHAR(255) UNIQUE'),
+        Column('email_verified', 'email_verified', 'bool', False),
+        Column('email_verification_token', 'email_verification_token', sql='TEXT'),
+        Column('email_verification_expires', 'email_verification_expires', 'date'),
+        Column('email_verified_at', 'email_verified_at', 'date'),
+    ) + _timestamps(),
+        label='user {username}',
+        indexes=(Index('idx_username', ('username',)), Index('idx_email', ('email',)),
+                 Index('idx_ban_status', ('ban_status',)), Index('idx_role', ('role',)),
+                 Index('idx_created_at', ('created_at',)))),
+
+    Mapping('maintenances', 'maintenances', 'Maintenances', (
+        Column('id', '_id', 'id'),
+        Column('is_active', 'isActive', 'bool', False, sql='BOOLEAN DEFAULT FALSE NOT NULL'),
+        Column('estimated_end_time', 'estimatedEndTime', 'date'),
+        Column('message', 'message', sql='TEXT'),
+        Column('updated_by', 'updatedBy', 'id'),
+    ) + _timestamps('createdAt', 'updatedAt'),
+        foreign_keys=(ForeignKey('updated_by', 'users', 'skip'),),
+        label='maintenance'),
+
+    Mapping('follows', 'follows', 'Follows', (
+        Column('id', '_id', 'id'),
+        Column('follower_id', 'follower_id', 'id', sql=REQUIRED_ID),
+        Column('following_id', 'following_id', 'id', sql=REQUIRED_ID),
+        Column('status', 'status', default='active', sql="ENUM('active', 'blocked') DEFAULT 'active'"),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('follower_id', 'users'), ForeignKey('following_id', 'users')),
+        label='follow',
+        indexes=(Index('unique_follow', ('follower_id', 'following_id'), unique=True),
+                 Index('idx_follower_status', ('follower_id', 'status')),
+                 Index('idx_following_status', ('following_id', 'status')),
+                 Index('idx_created_at', ('created_at',)))),
+
+    Mapping('frames', 'frames', 'Frames', (
+        Column('id', '_id', 'id'),
+        Column('title', 'title', sql='VARCHAR(100) NOT NULL'),
+        Column('desc', 'desc', default='', sql="VARCHAR(500) DEFAULT ''"),
+        Column('thumbnail', 'thumbnail', sql='TEXT'),
+        Column('layout_type', 'layout_type', sql=LAYOUTS + ' NOT NULL'),
+        Column('official_status', 'official_status', 'bool', False),
+        Column('visibility', 'visibility', default='private', sql="ENUM('private', 'public') DEFAULT 'private'"),
+        Column('approval_status', 'approval_status', default='pending',
+               sql="ENUM('pending', 'approved', 'rejected') DEFAULT 'pending'"),
+        Column('approved_by', 'approved_by', 'id'),
+        Column('approved_at', 'approved_at', 'date'),
+        Column('rejection_reason', 'rejection_reason', sql='VARCHAR(500)'),
+        Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('user_id', 'users'), ForeignKey('approved_by', 'users', 'null')),
+        children=(
+            _ordered('frame_images', 'frame_id', 'images', 'image_url'),
+            Child('frame_tags', 'tag_label', 'frame_id', (Column('tag', '$', sql='VARCHAR(50) NOT NULL'),),
+                  indexes=(Index('idx_tag', ('tag',)),)),
+            Child('frame_likes', 'like_count', 'frame_id',
+                  (Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+                   Column('created_at', 'created_at', 'date', sql=CREATED_AT)),
+                  (ForeignKey('user_id', 'users', 'drop'),),
+                  indexes=(Index('unique_like', ('frame_id', 'user_id'), unique=True),
+                           Index('idx_user_id', ('user_id',)))),
+            Child('frame_uses', 'use_count', 'frame_id',
+                  (Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+                   Column('created_at', 'created_at', 'date', sql=CREATED_AT)),
+                  (ForeignKey('user_id', 'users', 'drop'),), indexes=(Index('idx_user_id', ('user_id',)),)),
+        ),
+        label='frame {title}',
+        indexes=(Index('idx_visibility_approval', ('visibility', 'approval_status')),
+                 Index('idx_approval_status', ('approval_status', 'created_at')),
+                 Index('idx_user_created', ('user_id', 'created_at')))),
+
+    Mapping('tickets', 'tickets', 'Tickets', (
+        Column('id', '_id', 'id'),
+        Column('title', 'title', sql='VARCHAR(200) NOT NULL'),
+        Column('description', 'description', sql='VARCHAR(2000) NOT NULL'),
+        Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+        Column('type', 'type', sql="ENUM('suggestion', 'critics', 'other') NOT NULL"),
+        Column('status', 'status', default='pending',
+               sql="ENUM('pending', 'in_progress', 'resolved', 'closed') DEFAULT 'pending'"),
+        Column('admin_response', 'admin_response', sql='VARCHAR(2000)'),
+        Column('admin_id', 'admin_id', 'id'),
+        Column('priority', 'priority', default='medium', sql=PRIORITIES + " DEFAULT 'medium'"),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('user_id', 'users', 'skip'), ForeignKey('admin_id', 'users', 'null')),
+        children=(_ordered('ticket_images', 'ticket_id', 'images', 'image_url'),),
+        label='ticket',
+        indexes=(Index('idx_user_created', ('user_id', 'created_at')),
+                 Index('idx_status_priority', ('status', 'priority')),
+                 Index('idx_created_at', ('created_at',)))),
+
+    Mapping('reports', 'reports', 'Reports', (
+        Column('id', '_id', 'id'),
+        Column('title', 'title', sql='VARCHAR(200) NOT NULL'),
+        Column('description', 'description', sql='VARCHAR(1000) NOT NULL'),
+        Column('frame_id', 'frame_id', 'id', sql=REQUIRED_ID),
+        Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+        Column('report_status', 'report_status', default='pending',
+               sql="ENUM('pending', 'done', 'rejected') DEFAULT 'pending'"),
+        Column('admin_response', 'admin_response', sql='VARCHAR(1000)'),
+        Column('admin_id', 'admin_id', 'id'),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('frame_id', 'frames'), ForeignKey('user_id', 'users'),
+                      ForeignKey('admin_id', 'users', 'null')),
+        label='report',
+        indexes=(Index('idx_frame_id', ('frame_id',)), Index('idx_user_id', ('user_id',)),
+                 Index('idx_report_status', ('report_status',)), Index('idx_created_at', ('created_at',)))),
+
+    Mapping('photos', 'photos', 'Photos', (
+        Column('id', '_id', 'id'),
+        Column('title', 'title', sql='VARCHAR(100) NOT NULL'),
+        Column('desc', 'desc', default='', sql="VARCHAR(500) DEFAULT ''"),
+        Column('frame_id', 'frame_id', 'id', sql=REQUIRED_ID),
+        Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+        Column('expires_at', 'expires_at', 'date'),
+        Column('live_photo', 'livePhoto', 'bool', False),
+        Column('ai_photo', 'aiPhoto', 'bool', False),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('frame_id', 'frames'), ForeignKey('user_id', 'users')),
+        children=(
+            _ordered('photo_images', 'photo_id', 'images', 'image_url'),
+            _ordered('photo_videos', 'photo_id', 'video_files', 'video_url'),
+        ),
+        label='photo',
+        indexes=(Index('idx_expires_at', ('expires_at',)), Index('idx_user_created', ('user_id', 'created_at')))),
+
+    Mapping('photoposts', 'photoposts', 'Photo Posts', (
+        Column('id', '_id', 'id'),
+        Column('title', 'title', sql='VARCHAR(100)'),
+        Column('desc', 'desc', default='', sql="VARCHAR(500) DEFAULT ''"),
+        Column('photo_id', 'photo_id', 'id'),
+        Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+        Column('visibility', 'visibility', default='public',
+               sql="ENUM('public', 'followers', 'private') DEFAULT 'public'"),
+        Column('post_type', 'post_type', default='normal', sql="VARCHAR(50) DEFAULT 'normal'"),
+        Column('view_count', 'view_count', default=0, sql='INT DEFAULT 0'),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('user_id', 'users'), ForeignKey('photo_id', 'photos', 'null')),
+        children=(
+            _ordered('photopost_images', 'photopost_id', 'images', 'image_url'),
+            Child('photopost_likes', 'likes', 'photopost_id',
+                  (Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+                   Column('created_at', 'created_at', 'date', sql=CREATED_AT)),
+                  (ForeignKey('user_id', 'users', 'drop'),), element_key='user_id',
+                  indexes=(Index('unique_photopost_like', ('photopost_id', 'user_id'), unique=True),
+                           Index('idx_user_id', ('user_id',)))),
+            Child('photopost_comments', 'comments', 'photopost_id', (
+                Column('id', '_id', 'id'),
+                Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+                Column('comment', 'comment', default='', sql='TEXT NOT NULL'),
+            ) + _timestamps(), (ForeignKey('user_id', 'users', 'drop'),),
+                indexes=(Index('idx_user_id', ('user_id',)),)),
+        ),
+        label='photopost',
+        indexes=(Index('idx_user_created', ('user_id', 'created_at')), Index('idx_visibility', ('visibility',)))),
+
+    Mapping('photocollabs', 'photo_collabs', 'Photo Collabs', (
+        Column('id', '_id', 'id'),
+        Column('title', 'title', sql='VARCHAR(100) NOT NULL'),
+        Column('desc', 'desc', default='', sql="VARCHAR(500) DEFAULT ''"),
+        Column('frame_id', 'frame_id', 'id', sql=REQUIRED_ID),
+        Column('layout_type', 'layout_type', sql=LAYOUTS + ' NOT NULL'),
+        Column('inviter_user_id', 'inviter.user_id', 'id', sql=REQUIRED_ID),
+        Column('inviter_photo_id', 'inviter.photo_id', 'id', sql=REQUIRED_ID),
+        Column('receiver_user_id', 'receiver.user_id', 'id', sql=REQUIRED_ID),
+        Column('receiver_photo_id', 'receiver.photo_id', 'id', sql=REQUIRED_ID),
+        Column('status', 'status', default='pending',
+               sql="ENUM('pending', 'accepted', 'rejected', 'completed') DEFAULT 'pending'"),
+        Column('invitation_message', 'invitation.message', default='', sql="VARCHAR(200) DEFAULT ''"),
+        Column('invitation_sent_at', 'invitation.sent_at', 'date', sql=CREATED_AT),
+        Column('invitation_responded_at', 'invitation.responded_at', 'date'),
+        Column('expires_at', 'expires_at', 'date', sql='DATETIME NOT NULL'),
+        Column('completed_at', 'completed_at', 'date'),
+    ) + _timestamps(),
+        foreign_keys=(
+            ForeignKey('frame_id', 'frames', 'skip'),
+            ForeignKey('inviter_user_id', 'users', 'skip', 'inviter user_id'),
+            ForeignKey('inviter_photo_id', 'photos', 'skip', 'inviter photo_id'),
+            ForeignKey('receiver_user_id', 'users', 'skip', 'receiver user_id'),
+            ForeignKey('receiver_photo_id', 'photos', 'skip', 'receiver photo_id'),
+        ),
+        children=(
+            _ordered('photo_collab_images', 'photo_collab_id', 'merged_images', 'image_url'),
+            Child('photo_collab_stickers', 'stickers', 'photo_collab_id', (
+                Column('id', 'id', sql='VARCHAR(50)'),
+                Column('type', 'type', sql="ENUM('emoji', 'text', 'image') NOT NULL"),
+                Column('content', 'content', sql='TEXT NOT NULL'),
+                Column('position_x', 'position.x', default=0, sql='DECIMAL(10, 2) NOT NULL'),
+                Column('position_y', 'position.y', default=0, sql='DECIMAL(10, 2) NOT NULL'),
+                Column('size_width', 'size.width', default=0, sql='DECIMAL(10, 2) NOT NULL'),
+                Column('size_height', 'size.height', default=0, sql='DECIMAL(10, 2) NOT NULL'),
+                Column('rotation', 'rotation', default=0, sql='DECIMAL(10, 2) DEFAULT 0'),
+                Column('added_by', 'added_by', 'id', sql=REQUIRED_ID),
+                Column('created_at', 'created_at', 'date', sql=CREATED_AT),
+            ), (ForeignKey('added_by', 'users', 'skip', 'sticker added_by'),)),
+        ),
+        label='photo collab',
+        indexes=(Index('idx_expires_at', ('expires_at',)),
+                 Index('idx_inviter_created', ('inviter_user_id', 'created_at')),
+                 Index('idx_receiver_created', ('receiver_user_id', 'created_at')),
+                 Index('idx_status_created', ('status', 'created_at')))),
+
+    Mapping('aiphotobooth_usages', 'aiphotobooth_usages', 'AI Photobooth Usages', (
+        Column('id', '_id', 'id'),
+        Column('user_id', 'user_id', 'id', sql=REQUIRED_ID),
+        Column('username', 'username', sql='VARCHAR(100) NOT NULL'),
+        Column('count', 'count', default=0, sql='INT DEFAULT 0'),
+        Column('month', 'month', sql='INT NOT NULL'),
+        Column('year', 'year', sql='INT NOT NULL'),
+        Column('last_used_at', 'last_used_at', 'date', sql=CREATED_AT),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('user_id', 'users'),),
+        label='AI usage',
+        indexes=(Index('unique_user_month_year', ('user_id', 'month', 'year'), unique=True),
+                 Index('idx_user_id', ('user_id',)), Index('idx_username', ('username',)))),
+
+    Mapping('broadcasts', 'broadcasts', 'Broadcasts', (
+        Column('id', '_id', 'id'),
+        Column('title', 'title', sql='VARCHAR(100) NOT NULL'),
+        Column('message', 'message', sql='VARCHAR(500) NOT NULL'),
+        Column('type', 'type', default='general',
+               sql="ENUM('announcement', 'maintenance', 'update', 'alert', 'celebration', 'general') "
+                   "DEFAULT 'general'"),
+        Column('priority', 'priority', default='medium', sql=PRIORITIES + " DEFAULT 'medium'"),
+        Column('target_audience', 'target_audience', default='all',
+               sql="ENUM('all', 'verified', 'premium', 'basic', 'official', 'developer', 'online_users') "
+                   "DEFAULT 'all'"),
+        Column('status', 'status', default='draft',
+               sql="ENUM('draft', 'scheduled', 'sent', 'cancelled') DEFAULT 'draft'"),
+        Column('scheduled_at', 'scheduled_at', 'date'),
+        Column('sent_at', 'sent_at', 'date'),
+        Column('expires_at', 'expires_at', 'date'),
+        Column('created_by', 'created_by', 'id', sql=REQUIRED_ID),
+        Column('sent_by', 'sent_by', 'id'),
+        Column('total_recipients', 'total_recipients', default=0, sql='INT DEFAULT 0'),
+        Column('notifications_created', 'notifications_created', default=0, sql='INT DEFAULT 0'),
+        Column('delivery_online', 'delivery_stats.online_delivery', default=0, sql='INT DEFAULT 0'),
+        Column('delivery_offline', 'delivery_stats.offline_delivery', default=0, sql='INT DEFAULT 0'),
+        Column('delivery_failed', 'delivery_stats.failed_delivery', default=0, sql='INT DEFAULT 0'),
+        Column('send_to_new_users', 'settings.send_to_new_users', 'bool', False),
+        Column('persistent', 'settings.persistent', 'bool', True),
+        Column('dismissible', 'settings.dismissible', 'bool', True),
+        Column('action_url', 'settings.action_url', sql='TEXT'),
+        Column('icon', 'settings.icon', sql='VARCHAR(100)'),
+        Column('color', 'settings.color', sql='VARCHAR(50)'),
+        Column('metadata_version', 'metadata.version', sql='VARCHAR(50)'),
+        Column('metadata_feature', 'metadata.feature_announcement', sql='VARCHAR(200)'),
+        Column('metadata_maintenance_start', 'metadata.maintenance_window.start', 'date'),
+        Column('metadata_maintenance_end', 'metadata.maintenance_window.end', 'date'),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('created_by', 'users', 'skip'), ForeignKey('sent_by', 'users', 'skip')),
+        children=(Child('broadcast_target_roles', 'target_roles', 'broadcast_id',
+                        (Column('role', '$', sql=ROLES + ' NOT NULL'),)),),
+        label='broadcast',
+        indexes=(Index('idx_created_by_status', ('created_by', 'status')),
+                 Index('idx_status_scheduled', ('status', 'scheduled_at')),
+                 Index('idx_created_at', ('created_at',)),
+                 Index('idx_target_status', ('target_audience', 'status')))),
+
+    Mapping('notifications', 'notifications', 'Notifications', (
+        Column('id', '_id', 'id'),
+        Column('recipient_id', 'recipient_id', 'id', sql=REQUIRED_ID),
+        Column('sender_id', 'sender_id', 'id', sql=REQUIRED_ID),
+        Column('type', 'type', sql="ENUM('frame_like', 'frame_use', 'frame_approved', 'frame_rejected', 'user_follow', "
+                                   "'frame_upload', 'system', 'birthday', 'broadcast') NOT NULL"),
+        Column('title', 'title', sql='VARCHAR(100) NOT NULL'),
+        Column('message', 'message', sql='VARCHAR(500) NOT NULL'),
+        Column('is_read', 'is_read', 'bool', False),
+        Column('read_at', 'read_at', 'date'),
+        Column('is_dismissible', 'is_dismissible', 'bool', True),
+        Column('expires_at', 'expires_at', 'date'),
+        Column('data_frame_id', 'data.frame_id', 'id'),
+        Column('data_frame_title', 'data.frame_title', sql='VARCHAR(100)'),
+        Column('data_frame_thumbnail', 'data.frame_thumbnail', sql='TEXT'),
+        Column('data_follower_id', 'data.follower_id', 'id'),
+        Column('data_follower_name', 'data.follower_name', sql='VARCHAR(100)'),
+        Column('data_follower_username', 'data.follower_username', sql='VARCHAR(100)'),
+        Column('data_follower_image', 'data.follower_image', sql='TEXT'),
+        Column('data_owner_id', 'data.owner_id', 'id'),
+        Column('data_owner_name', 'data.owner_name', sql='VARCHAR(100)'),
+        Column('data_owner_username', 'data.owner_username', sql='VARCHAR(100)'),
+        Column('data_owner_image', 'data.owner_image', sql='TEXT'),
+        Column('data_birthday_user_id', 'data.birthday_user_id', 'id'),
+        Column('data_birthday_user_name', 'data.birthday_user_name', sql='VARCHAR(100)'),
+        Column('data_birthday_user_username', 'data.birthday_user_username', sql='VARCHAR(100)'),
+        Column('data_birthday_user_age', 'data.birthday_user_age', sql='INT'),
+        Column('data_broadcast_id', 'data.broadcast_id', 'id'),
+        Column('data_broadcast_type', 'data.broadcast_type', sql='VARCHAR(50)'),
+        Column('data_broadcast_priority', 'data.broadcast_priority', sql='VARCHAR(50)'),
+        Column('data_action_url', 'data.action_url', sql='TEXT'),
+        Column('data_custom_icon', 'data.custom_icon', sql='VARCHAR(100)'),
+        Column('data_custom_color', 'data.custom_color', sql='VARCHAR(50)'),
+        Column('data_additional_info', 'data.additional_info', 'json'),
+    ) + _timestamps(),
+        foreign_keys=(ForeignKey('recipient_id', 'users'), ForeignKey('sender_id', 'users')),
+        label='notification',
+        indexes=(Index('idx_recipient_created', ('recipient_id', 'created_at')),
+                 Index('idx_recipient_read', ('recipient_id', 'is_read')),
+                 Index('idx_recipient_type', ('recipient_id', 'type')),
+                 Index('idx_expires_at', ('expires_at',)))),
+)}
+
+
+def child_tables(mappings: Dict[str, Mapping] = MAPPINGS) -> Dict[str, Tuple[Tuple[str, str], ...]]:
+    """{parent table: ((child table, parent id column), ...)} for BatchWriter upserts"""
+    return {m.table: tuple((c.table, c.parent_column) for c in m.children)
+            for m in mappings.values() if m.children}
+
+
+def collection_dependencies(mappings: Dict[str, Mapping] = MAPPINGS) -> Dict[str, frozenset]:
+    """{collection: collections its foreign keys (child tables included) reference, itself excluded}"""
+    return {m.collection: frozenset(fk.references for fk in m.foreign_keys
+                                    + tuple(fk for c in m.children for fk in c.foreign_keys)) - {m.collection}
+            for m in mappings.values()}
+
+
+def id_columns(mappings: Dict[str, Mapping] = MAPPINGS) -> Dict[str, frozenset]:
+    """{table: names of the columns holding ObjectIds}, child tables included"""
+    tables = {}
+    for m in mappings.values():
+        tables[m.table] = frozenset(column.name for column in m.columns if column.convert == 'id')
+        for c in m.children:
+            tables[c.table] = frozenset((c.parent_column,) + tuple(column.name for column in c.columns
+                                                                    if column.convert == 'id'))
+    return tables
+
+
+def to_json(value: Any) -> Optional[str]:
+    """Nested document stored as a JSON column (empty values become NULL)"""
+    return json.dumps(value, default=json_default) if value else None
+
+
+class CompiledMapping:
+    """A Mapping compiled into `build(record, *indexes) -> (values, children)`
+
+    `indexes` are the id sets of the collections in `references`, in that
+    order. `values` follows `columns`; `children` is a list of
+    (table, columns, values) for BatchWriter.add_row(). The builder raises
+    MissingReference when the document has to be skipped.
+
+    `partition_columns` ({table: date column}) are the columns of
+    partitioned tables, which cannot be NULL: a missing date becomes the
+    creation time of the row's ObjectId (of the parent's id in child rows).
+    """
+
+    def __init__(self, mapping: Mapping, converters: Dict[str, Callable],
+                 partition_columns: Optional[Dict[str, str]] = None):
+        self.mapping = mapping
+        self.collection = mapping.collection
+        self.table = mapping.table
+        self.title = mapping.title
+        self.columns = tuple(column.name for column in mapping.columns)
+        references = [fk.references for fk in mapping.foreign_keys]
+        references += [fk.references for child in mapping.children for fk in child.foreign_keys]
+        self.references = tuple(dict.fromkeys(references))
+        self.source = _BuilderSource(mapping, self.references, partition_columns or {}).render()
+
+        namespace = {
+            'convert_id': converters['id'],
+            'convert_date': converters['date'],
+            'convert_dates': converters['dates'],
+            'convert_bool': converters['bool'],
+            'to_json': to_json,
+            'id_time': object_id_time,
+            'contains_many': contains_many,
+            'MissingReference': MissingReference,
+            'EMPTY': {},
+        }
+        for child in mapping.children:
+            namespace[_columns_constant(child)] = (child.parent_column,) + tuple(column.name for column in child.columns)
+        exec(compile(self.source, f'<mapping {mapping.collection}>', 'exec'), namespace)
+        self.build = namespace['build']
+        self._label_fields = _format_fields(mapping.label)
+
+    def describe(self, record: Dict) -> str:
+        """The document as named in error messages, e.g. 'frame Summer'"""
+        if not self._label_fields:
+            return self.mapping.label
+        return self.mapping.label.format(**{field: record.get(field) for field in self._label_fields})
+
+    def label(self, record: Dict):
+        """Label for BatchWriter.add_row(), formatted only if the row fails"""
+        if not self._label_fields:
+            return self.mapping.label
+        return lambda: self.describe(record)
+
+
+def compile_mappings(converters: Dict[str, Callable], mappings: Dict[str, Mapping] = MAPPINGS,
+                     partition_columns: Optional[Dict[str, str]] = None) -> Dict[str, CompiledMapping]:
+    """Compile every mapping; `converters` maps 'id'/'date'/'dates'/'bool' to functions"""
+    return {collection: CompiledMapping(mapping, converters, partition_columns)
+            for collection, mapping in mappings.items()}
+
+
+def _format_fields(label: str) -> Tuple[str, ...]:
+    return tuple(field for _, field, _, _ in string.Formatter().parse(label) if field)
+
+
+_CONVERTERS = {None: '{}', 'id': 'convert_id({})', 'date': 'convert_date({})',
+               'bool': 'convert_bool({})', 'json': 'to_json({})'}
+
+
+class _BuilderSource:
+    """Generates the source of a mapping's build() function"""
+
+    def __init__(self, mapping: Mapping, references: Tuple[str, ...], partition_columns: Dict[str, str]):
+        self.mapping = mapping
+        self.partition_columns = partition_columns
+        self.indexes = {collection: f'ids_{collection}' for collection in references}
+        self.lines = []
+        self.names = set()
+
+    def render(self) -> str:
+        mapping = self.mapping
+        self.lines = [f"def build(record, {', '.join(self.indexes.values())}):" if self.indexes
+                      else "def build(record):"]
+        emit = self.lines.append
+        emit("    get = record.get")
+
+        names = {}
+        for i, column in enumerate(mapping.columns):
+            names[column.name] = f'c{i}'
+            emit(f"    c{i} = {self._value(column, 'record', '    ')}")
+            if self.partition_columns.get(mapping.table) == column.name:
+                emit(f"    if c{i} is None: c{i} = id_time(c0)")
+        self._checks(mapping.foreign_keys, names, '    ', skip_child=None)
+
+        if mapping.children:
+            emit("    children = []")
+            for child in mapping.children:
+                self._child(child)
+            emit(f"    return ({''.join(name + ', ' for name in names.values())}), children")
+        else:
+            emit(f"    return ({''.join(name + ', ' for name in names.values())}), None")
+        return '\n'.join(self.lines) + '\n'
+
+    def _container(self, obj: str, path: Tuple[str, ...], indent: str) -> str:
+        """Variable holding the nested document at `path` (emitted once per path)"""
+        if not path:
+            return obj
+        name = f"{obj}_{'_'.join(path)}"
+        if name not in self.names:
+            parent = self._container(obj, path[:-1], indent)
+            getter = 'get' if parent == 'record' else f'{parent}.get'
+            self.lines.append(f"{indent}{name} = {getter}({path[-1]!r}) or EMPTY")
+            self.names.add(name)
+        return name
+
+    def _value(self, column: Column, obj: str, indent: str) -> str:
+        if column.source == '$':
+            expression = 'element'
+        elif column.source == '#':
+            expression = 'position'
+        else:
+            *path, key = column.source.split('.')
+            container = self._container(obj, tuple(path), indent)
+            if obj == 'record' and not path:
+                container = 'get'
+            else:
+                container += '.get'
+            default = '' if column.default is None else f', {column.default!r}'
+            expression = f"{container}({key!r}{default})"
+        return _CONVERTERS[column.convert].format(expression)
+
+    def _checks(self, foreign_keys, names: Dict[str, str], indent: str, skip_child: Optional[str]):
+        emit = self.lines.append
+        for fk in foreign_keys:
+            value = names[fk.column]
+            ids = self.indexes[fk.references]
+            label = repr(fk.name or fk.column)
+            if fk.on_missing == 'required':
+                emit(f"{indent}if {value} not in {ids}: raise MissingReference({label}, {value})")
+            elif fk.on_missing == 'skip':
+                emit(f"{indent}if {value} and {value} not in {ids}: raise MissingReference({label}, {value})")
+            elif fk.on_missing == 'null':
+                emit(f"{indent}if {value} and {value} not in {ids}: {value} = None")
+            elif fk.on_missing == 'drop' and skip_child:
+                emit(f"{indent}if not {value} or {value} not in {ids}: {skip_child}")
+            else:
+                raise ValueError(f"Invalid on_missing {fk.on_missing!r} for {self.mapping.collection}.{fk.column}")
+
+    def _child(self, child: Child):
+        emit = self.lines.append
+        positional = any(column.source == '#' for column in child.columns)
+        *path, key = child.source.split('.')
+        container = self._container('record', tuple(path), '    ')
+        emit(f"    elements = {'get' if container == 'record' else container + '.get'}({key!r}) or ()")
+        loop = "for position, element in enumerate(elements):" if positional else "for element in elements:"
+        row = f"children.append(({child.table!r}, {_columns_constant(child)}, (c0, {{}})))"
+
+        # Plain values (images, tags, roles): append the rows directly
+        partition_column = self.partition_columns.get(child.table)
+        if (all(column.source in ('$', '#') for column in child.columns) and not child.foreign_keys
+                and partition_column is None):
+            values = ', '.join(self._value(column, 'element', '') for column in child.columns)
+            emit(f"    {loop}")
+            emit(f"        {row.format(values)}")
+            return
+
+        # Dict elements: one row per element that passes the foreign key checks.
+        # Long arrays (e.g. likes of a popular frame) look up their dropped
+        # references with one contains_many() call per foreign key and get
+        # their date columns converted in one convert_dates() call after the loop.
+        dates = [i for i, column in enumerate(child.columns) if column.convert == 'date']
+        if dates:
+            emit(f"    if len(elements) < {NUMPY_MIN_BATCH}:")
+            self._child_loop(child, loop, '        ', lambda values: row.format(values), batched=False)
+            emit("    else:")
+            emit("        rows = []")
+            self._child_loop(child, loop, '        ', lambda values: f"rows.append([{values}])", batched=True)
+            positions = {column.name: i for i, column in enumerate(child.columns)}
+            for fk in child.foreign_keys:
+                if fk.on_missing == 'drop':
+                    i = positions[fk.column]
+                    emit(f"        found = contains_many({self.indexes[fk.references]}, [row[{i}] for row in rows])")
+                    emit(f"        rows = [row for row, ok in zip(rows, found) if ok and row[{i}]]")
+            for i in dates:
+                value = 'value'
+                if child.columns[i].name == partition_column:
+                    value = 'id_time(c0) if value is None else value'
+                emit(f"        for row, value in zip(rows, convert_dates([row[{i}] for row in rows])): "
+                     f"row[{i}] = {value}")
+            emit(f"        for row in rows: {row.format('*row')}")
+        else:
+            self._child_loop(child, loop, '    ', lambda values: row.format(values), batched=False)
+
+    def _child_loop(self, child: Child, loop: str, indent: str, append: Callable[[str], str], batched: bool):
+        emit = self.lines.append
+        body = indent + '    '
+        emit(f"{indent}{loop}")
+        if child.element_key:
+            emit(f"{body}if type(element) is not dict: element = {{{child.element_key!r}: element}}")
+        self.names = {name for name in self.names if not name.startswith('element')}
+        names = {column.name: f'v{i}' for i, column in enumerate(child.columns)}
+        # Foreign key columns first so dropped elements are not converted any further
+        checked = {fk.column for fk in child.foreign_keys}
+        for first in (True, False):
+            for i, column in enumerate(child.columns):
+                if (column.name in checked) != first:
+                    continue
+                if batched and column.convert == 'date':
+                    column = column._replace(convert=None)
+                emit(f"{body}v{i} = {self._value(column, 'element', body)}")
+                if column.name == self.partition_columns.get(child.table) and column.convert is not None:
+                    emit(f"{body}if v{i} is None: v{i} = id_time(c0)")
+            if first:
+                # Batched loops check the 'drop' references after the loop, see _child()
+                foreign_keys = [fk for fk in child.foreign_keys if not (batched and fk.on_missing == 'drop')]
+                self._checks(foreign_keys, names, body, skip_child='continue')
+        emit(f"{body}{append(', '.join(names.values()))}")
+
+
+def _columns_constant(child: Child) -> str:
+    return f"COLUMNS_{child.table}"
@@ -0,0 +1,189 @@
+"""
+Per-stage timing for the migration
+Each collection accumulates the seconds spent reading and decoding its dump,
+converting documents to rows, validating foreign keys, executing the INSERT /
+LOAD DATA statements and committing. The summary table at the end of a run
+shows which stage a slow collection is bound by; the same numbers can be
+written as JSON or as a Prometheus textfile.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from id_index import contains_many
+
+# In pipeline order
+STAGES = ('read', 'decode', 'convert', 'fk', 'execute', 'commit')
+
+# Foreign key lookups are timed on one document in this many
+FK_SAMPLE_EVERY = 64
+
+STAGE_HELP = {
+    'read': 'reading the dump file',
+    'decode': 'BSON/JSON decoding',
+    'convert': 'building rows from documents (without fk)',
+    'fk': 'foreign key lookups in the id indexes (sampled)',
+    'execute': 'INSERT / LOAD DATA statements',
+    'commit': 'COMMIT (with the checkpoint journal)',
+}
+
+
+class CollectionMetrics:
+    """Counters of one collection; stage seconds are added in place by the hot paths"""
+
+    __slots__ = ('seconds', 'documents', 'rows', 'failed', 'wall', 'bytes', 'bytes_total', 'rejects')
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.documents = 0
+        self.rows = 0
+        self.failed = 0
+        self.wall = 0.0
+        self.bytes = 0  # Dump bytes read so far (progress ETA)
+        self.bytes_total = 0
+        self.rejects: Dict[str, int] = {}  # Skipped/failed documents by reason, see progress.reject_reason
+
+    def merge(self, other: 'CollectionMetrics'):
+        """Add another part of the same collection (a shard worker's chunk); wall time is kept"""
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] += seconds
+        self.documents += other.documents
+        self.rows += other.rows
+        self.failed += other.failed
+        for reason, count in other.rejects.items():
+            self.rejects[reason] = self.rejects.get(reason, 0) + count
+
+    def bound_by(self) -> Optional[str]:
+        """The stage that took the most time"""
+        stage = max(STAGES, key=self.seconds.__getitem__)
+        return stage if self.seconds[stage] else None
+
+    def to_dict(self) -> Dict:
+        return {
+            'documents': self.documents,
+            'rows': self.rows,
+            'failed': self.failed,
+            'wall_seconds': round(self.wall, 4),
+            'seconds': {stage: round(seconds, 4) for stage, seconds in self.seconds.items()},
+            'rows_per_second': round(self.rows / self.wall) if self.wall else None,
+            'bound_by': self.bound_by(),
+            'bytes': self.bytes,
+            'rejects': dict(sorted(self.rejects.items(), key=lambda item: -item[1])),
+        }
+
+    # __slots__ classes need these to cross the shard worker process boundary
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class TimedIndex:
+    """Wraps an id index so the time of the row builders' `in`/contains_many() checks is added to seconds['fk']"""
+
+    __slots__ = ('index', 'seconds')
+
+    def __init__(self, index, seconds: Dict[str, float]):
+        self.index = index
+        self.seconds = seconds
+
+    def __contains__(self, value) -> bool:
+        start = time.perf_counter()
+        found = value in self.index
+        self.seconds['fk'] += time.perf_counter() - start
+        return found
+
+    def contains_many(self, values) -> List[bool]:
+        start = time.perf_counter()
+        found = contains_many(self.index, values)
+        self.seconds['fk'] += time.perf_counter() - start
+        return found
+
+
+class MigrationMetrics:
+    """Stage timings of every collection in a run (shared by the worker threads)"""
+
+    def __init__(self):
+        self.collections: Dict[str, CollectionMetrics] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> CollectionMetrics:
+        metrics = self.collections.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self.collections.setdefault(name, CollectionMetrics())
+        return metrics
+
+    def print_report(self):
+        """Per-collection timing and throughput table"""
+        if not self.collections:
+            return
+        header = (f"{'Collection':22s} {'Docs':>9s} {'Rows':>9s} {'Wall s':>8s} "
+                  + ' '.join(f'{stage:>8s}' for stage in STAGES) + f" {'Rows/s':>9s}  Bound by")
+        print("\nStage timings (seconds)")
+        print(header)
+        print('-' * len(header))
+        for name, metrics in self.collections.items():
+            rate = f'{metrics.rows / metrics.wall:9.0f}' if metrics.wall else f"{'-':>9s}"
+            print(f"{name:22s} {metrics.documents:9d} {metrics.rows:9d} {metrics.wall:8.2f} "
+                  + ' '.join(f'{metrics.seconds[stage]:8.2f}' for stage in STAGES)
+                  + f" {rate}  {metrics.bound_by() or '-'}")
+
+    def to_dict(self) -> Dict:
+        return {
+            'started_at': int(self.started),
+            'stages': STAGE_HELP,
+            'collections': {name: metrics.to_dict() for name, metrics in self.collections.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (for node_exporter's textfile collector)"""
+        lines = [
+            '# HELP snaplove_migration_stage_seconds Time spent per migration stage',
+            '# TYPE snaplove_migration_stage_seconds gauge',
+        ]
+        for name, metrics in self.collections.items():
+            for stage in STAGES:
+                lines.append(f'snaplove_migration_stage_seconds{{collection="{name}",stage="{stage}"}} '
+                             f'{metrics.seconds[stage]:.6f}')
+        for metric, help_text, attr in (
+                ('wall_seconds', 'Wall-clock time per collection', 'wall'),
+                ('documents', 'Documents processed per collection', 'documents'),
+                ('rows', 'Rows committed per collection (parents and children)', 'rows'),
+                ('failed', 'Documents skipped or rejected per collection', 'failed')):
+            lines.append(f'# HELP snaplove_migration_{metric} {help_text}')
+            lines.append(f'# TYPE snaplove_migration_{metric} gauge')
+            for name, metrics in self.collections.items():
+                lines.append(f'snaplove_migration_{metric}{{collection="{name}"}} {getattr(metrics, attr)}')
+        lines.append('# HELP snaplove_migration_rejects Skipped or failed documents per collection and reason')
+        lines.append('# TYPE snaplove_migration_rejects gauge')
+        for name, metrics in self.collections.items():
+            for reason, count in metrics.rejects.items():
+                lines.append(f'snaplove_migration_rejects{{collection="{name}",reason="{_label_value(reason)}"}} {count}')
+        lines.append('# HELP snaplove_migration_started_timestamp_seconds Start of the migration run')
+        lines.append('# TYPE snaplove_migration_started_timestamp_seconds gauge')
+        lines.append(f'snaplove_migration_started_timestamp_seconds {self.started:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Write the metrics to `path`: Prometheus textfile for *.prom, JSON otherwise"""
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=2) + '\n'
+        # Write then rename, so a textfile collector never reads half a file
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+def _label_value(value: str) -> str:
+    """Escape a Prometheus label value"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,98 @@
+"""
+RANGE partitioning of the time-series tables
+notifications, frame_uses, frame_likes and photopost_likes only grow and
+are read and expired by created_at. With PARTITIONED_TABLES they are created
+PARTITION BY RANGE COLUMNS(created_at), one partition per month or year, and
+the writers send every batch to a single partition (INSERT INTO t PARTITION
+(p) / LOAD DATA ... PARTITION (p)), so loads and later purges (ALTER TABLE
+... TRUNCATE/DROP PARTITION) work partition by partition.
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+PARTITION_UNITS = ('month', 'year')
+
+# Partitions for the rows before the first and from the end of the last partitioned year
+BEFORE = 'p_before'
+FUTURE = 'p_future'
+
+
+class PartitionLayout(NamedTuple):
+    """The partitions of a table: `names[i]` holds the rows below `bounds[i]`, the last one the rest"""
+    column: str
+    names: Tuple[str, ...]
+    bounds: Tuple[datetime, ...]
+
+    def partition_of(self, value: Any) -> Optional[str]:
+        """Partition of a row by its partition column value (None if it is not a datetime)"""
+        if type(value) is not datetime:
+            return None
+        if value.microsecond >= 500000:  # MySQL rounds DATETIME to whole seconds
+            value += timedelta(seconds=1)
+        return self.names[bisect_right(self.bounds, value.replace(microsecond=0))]
+
+    def clause(self) -> str:
+        """PARTITION BY clause for CREATE TABLE"""
+        partitions = [f"PARTITION `{name}` VALUES LESS THAN ('{bound:%Y-%m-%d %H:%M:%S}')"
+                      for name, bound in zip(self.names, self.bounds)]
+        partitions.append(f"PARTITION `{self.names[-1]}` VALUES LESS THAN (MAXVALUE)")
+        return f"PARTITION BY RANGE COLUMNS(`{self.column}`) (\n  " + ',\n  '.join(partitions) + "\n)"
+
+
+def partition_layout(unit: str, first_year: int, last_year: int, column: str = 'created_at') -> PartitionLayout:
+    """One partition per month or year from `first_year` through `last_year`
+
+    e.g. p_before, p2024_01, p2024_02, ..., p2026_12, p_future for 'month'.
+    """
+    if unit not in PARTITION_UNITS:
+        raise ValueError(f"Partition unit must be one of {', '.join(PARTITION_UNITS)}, not {unit!r}")
+    if first_year > last_year:
+        raise ValueError(f"PARTITION_YEARS {first_year}..{last_year} is empty")
+    names = [BEFORE]
+    bounds = [datetime(first_year, 1, 1)]
+    for year in range(first_year, last_year + 1):
+        if unit == 'year':
+            names.append(f'p{year}')
+            bounds.append(datetime(year + 1, 1, 1))
+        else:
+            for month in range(1, 13):
+                names.append(f'p{year}_{month:02d}')
+                bounds.append(datetime(year + (month == 12), month % 12 + 1, 1))
+    names.append(FUTURE)
+    return PartitionLayout(column, tuple(names), tuple(bounds))
+
+
+def partition_layouts(tables: Dict[str, str], years: Tuple[int, int]) -> Dict[str, PartitionLayout]:
+    """{table: layout} for PARTITIONED_TABLES ({table: 'month'/'year'}) over PARTITION_YEARS"""
+    return {table: partition_layout(unit, *years) for table, unit in tables.items()}
+
+
+def stored_partitions(connection) -> Dict[str, PartitionLayout]:
+    """The RANGE COLUMNS partitions of the existing tables, read from information_schema"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT TABLE_NAME, PARTITION_NAME, PARTITION_EXPRESSION, PARTITION_DESCRIPTION "
+            "FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND PARTITION_METHOD = 'RANGE COLUMNS' "
+            "ORDER BY TABLE_NAME, PARTITION_ORDINAL_POSITION")
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    partitions: Dict[str, list] = {}
+    for table, name, expression, description in rows:
+        partitions.setdefault(table, [expression.strip('`'), [], []])
+        partitions[table][1].append(name)
+        if description != 'MAXVALUE':
+            partitions[table][2].append(datetime.fromisoformat(description.strip("'")))
+    return {table: PartitionLayout(column, tuple(names), tuple(bounds))
+            for table, (column, names, bounds) in partitions.items()
+            if len(names) == len(bounds) + 1}
+
+
+def describe_partitions(layouts: Dict[str, PartitionLayout]) -> str:
+    """'notifications (38 partitions), frame_likes (5 partitions)' for log lines"""
+    return ', '.join(f"{table} ({len(layout.names)} partitions)" for table, layout in layouts.items()) or 'none'
@@ -0,0 +1,188 @@
+"""
+Progress and reject reporting for the migration
+Progress lines are throttled to one every PROGRESS_INTERVAL seconds per
+collection. Skipped/failed documents are only counted by reason on the hot
+path; their details and the documents themselves (dead-letter files) are
+written by a background thread, so a dump with millions of orphans does not
+turn into millions of prints.
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import bson
+from settings import PROGRESS_INTERVAL
+from mappings import MissingReference
+
+# Dead-letter file of a collection: <dead letter dir>/<collection>.rejects.bson
+DEAD_LETTER_SUFFIX = '.rejects.bson'
+
+# Quoted values in MySQL error messages ("Duplicate entry 'x' for key 'y'")
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"")
+
+
+def reject_reason(error: BaseException) -> str:
+    """Group key for a skipped/failed document: the missing FK column or the MySQL error without its values"""
+    if isinstance(error, MissingReference):
+        return f"{error.name} not found"
+    args = getattr(error, 'args', ())
+    if len(args) >= 2 and isinstance(args[0], int):
+        return f"MySQL {args[0]}: {_QUOTED.sub('?', str(args[1]))[:120]}"
+    return type(error).__name__
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Progress:
+    """Throttled progress line for one collection, fed from its migration loop"""
+
+    def __init__(self, title: str, metrics, interval: Optional[float] = PROGRESS_INTERVAL):
+        self.title = title
+        self.metrics = metrics  # metrics.CollectionMetrics: bytes read so far / file size for the ETA
+        self.interval = interval
+        self.started = time.monotonic()
+        self._next = self.started + (interval or 0)
+
+    def update(self, documents: int, rows: int):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            return
+        self._next = now + self.interval
+        elapsed = now - self.started
+        line = f"  … {self.title}: {documents:,} documents, {rows / elapsed:,.0f} rows/s"
+        metrics = self.metrics
+        if metrics.bytes_total and metrics.bytes:
+            fraction = min(1.0, metrics.bytes / metrics.bytes_total)
+            line += f", {fraction:.0%}, ETA {_duration(elapsed * (1 - fraction) / fraction)}"
+        print(line, flush=True)
+
+
+class RejectLog:
+    """Writes rejected documents from a background thread
+
+    Each reject becomes one JSON line in the rejects file (details for
+    people) and, with `dead_letter_dir`, one BSON envelope in
+    <dead_letter_dir>/<collection>.rejects.bson holding the original
+    document, the reason and the error (input for converter.py --replay).
+
+    write() only puts the entry on a queue; labels may be callables and are
+    resolved by the writer thread, which also encodes the BSON. Files are
+    append-only and several processes can append to the same files (shard
+    workers): every drained batch is written with a single call per file.
+    """
+
+    def __init__(self, path: Optional[str], dead_letter_dir: Optional[str] = None, append: bool = False):
+        self.path = path
+        self.dead_letter_dir = dead_letter_dir
+        self.written = 0
+        self.dead_letters = 0
+        self._counts_lock = threading.Lock()
+        self._queue = queue.Queue()
+        if dead_letter_dir:
+            os.makedirs(dead_letter_dir, exist_ok=True)
+        if not append:
+            if path:
+                open(path, 'w', encoding='utf-8').close()
+            if dead_letter_dir:
+                for name in os.listdir(dead_letter_dir):
+                    if DEAD_LETTER_SUFFIX in name:  # Also leftovers of an interrupted replay
+                        os.remove(os.path.join(dead_letter_dir, name))
+        self._thread = threading.Thread(target=self._run, name='reject-log', daemon=True)
+        self._thread.start()
+
+    def write(self, collection: str, record_id: Any, label: Any, reason: str, error: BaseException,
+              record: Optional[dict] = None):
+        self._queue.put((time.time(), collection, record_id, label, reason, error, record))
+
+    def add_counts(self, written: int, dead_letters: int):
+        """Count entries appended to the same files by another process (shard workers)"""
+        with self._counts_lock:
+            self.written += written
+            self.dead_letters += dead_letters
+
+    def flush(self):
+        """Wait until everything written so far is on disk"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        details = open(self.path, 'a', encoding='utf-8') if self.path else None
+        dead_letters = {}  # collection -> file
+        try:
+            while True:
+                entries = [self._queue.get()]
+                while True:
+                    try:
+                        entries.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = entries[-1] is None
+                entries = [entry for entry in entries if entry is not None]
+                if details is not None and entries:
+                    details.write(''.join(self._line(*entry[:6]) for entry in entries))
+                    details.flush()
+                    self.add_counts(len(entries), 0)
+                if self.dead_letter_dir:
+                    self._write_dead_letters(entries, dead_letters)
+                for _ in range(len(entries) + stop):
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            if details is not None:
+                details.close()
+            for f in dead_letters.values():
+                f.close()
+
+    def _write_dead_letters(self, entries, files):
+        batches = {}
+        for at, collection, _, _, reason, error, record in entries:
+            if record is None:
+                continue
+            try:
+                envelope = bson.encode({'collection': collection, 'reason': reason, 'error': str(error),
+                                        'at': datetime.fromtimestamp(at, timezone.utc), 'document': record})
+            except Exception:
+                continue  # Not representable as BSON; the JSON line still has the details
+            batches.setdefault(collection, []).append(envelope)
+        for collection, envelopes in batches.items():
+            f = files.get(collection)
+            if f is None:
+                # Unbuffered append: one write() per batch keeps concurrent writers from interleaving
+                f = files[collection] = open(dead_letter_path(self.dead_letter_dir, collection), 'ab', buffering=0)
+            f.write(b''.join(envelopes))
+            self.add_counts(0, len(envelopes))
+
+    @staticmethod
+    def _line(at: float, collection: str, record_id: Any, label: Any, reason: str, error: BaseException) -> str:
+        try:
+            label = label() if callable(label) else label
+        except Exception:
+            label = None
+        return json.dumps({
+            'at': datetime.fromtimestamp(at).isoformat(timespec='seconds'),
+            'collection': collection,
+            'id': None if record_id is None else str(record_id),
+            'label': label,
+            'reason': reason,
+            'error': str(error),
+        }, ensure_ascii=False) + '\n'
+
+
+def dead_letter_path(directory: str, collection: str) -> str:
+    return os.path.join(directory, collection + DEAD_LETTER_SUFFIX)
@@ -1,8 +1,8 @@
 -- MySQL Schema for Snaplove Database Migration
--- Generated from MongoDB Mongoose Models
--- Date: 2026-02-15
+-- Generated from mappings.py by schema_gen.py - do not edit by hand.
+-- Regenerate with: python schema_gen.py -o schema.sql
 
--- Drop tables if they exist (in correct order to handle foreign keys)
+-- Drop tables if they exist (children before the tables they reference)
 DROP TABLE IF EXISTS `notifications`;
 DROP TABLE IF EXISTS `broadcast_target_roles`;
 DROP TABLE IF EXISTS `broadcasts`;
@@ -20,8 +20,8 @@ DROP TABLE IF EXISTS `photos`;
 DROP TABLE IF EXISTS `reports`;
 DROP TABLE IF EXISTS `ticket_images`;
 DROP TABLE IF EXISTS `tickets`;
-DROP TABLE IF EXISTS `frame_likes`;
 DROP TABLE IF EXISTS `frame_uses`;
+DROP TABLE IF EXISTS `frame_likes`;
 DROP TABLE IF EXISTS `frame_tags`;
 DROP TABLE IF EXISTS `frame_images`;
 DROP TABLE IF EXISTS `frames`;
@@ -29,7 +29,7 @@ DROP TABLE IF EXISTS `follows`;
 DROP TABLE IF EXISTS `maintenances`;
 DROP TABLE IF EXISTS `users`;
 
--- Users Table
+-- Users
 CREATE TABLE `users` (
   `id` VARCHAR(24) PRIMARY KEY,
   `image_profile` TEXT,
@@ -61,7 +61,7 @@ CREATE TABLE `users` (
   INDEX idx_created_at (`created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Maintenances Table
+-- Maintenances
 CREATE TABLE `maintenances` (
   `id` VARCHAR(24) PRIMARY KEY,
   `is_active` BOOLEAN DEFAULT FALSE NOT NULL,
@@ -73,7 +73,7 @@ CREATE TABLE `maintenances` (
   FOREIGN KEY (`updated_by`) REFERENCES `users`(`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Follows Table
+-- Follows
 CREATE TABLE `follows` (
   `id` VARCHAR(24) PRIMARY KEY,
   `follower_id` VARCHAR(24) NOT NULL,
@@ -89,7 +89,7 @@ CREATE TABLE `follows` (
   INDEX idx_created_at (`created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Frames Table
+-- Frames
 CREATE TABLE `frames` (
   `id` VARCHAR(24) PRIMARY KEY,
   `title` VARCHAR(100) NOT NULL,
@@ -112,7 +112,7 @@ CREATE TABLE `frames` (
   INDEX idx_user_created (`user_id`, `created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Frame Images (for array of images)
+-- Frames: images
 CREATE TABLE `frame_images` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `frame_id` VARCHAR(24) NOT NULL,
@@ -122,7 +122,7 @@ CREATE TABLE `frame_images` (
   INDEX idx_frame_id (`frame_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Frame Tags
+-- Frames: tag_label
 CREATE TABLE `frame_tags` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `frame_id` VARCHAR(24) NOT NULL,
@@ -132,7 +132,7 @@ CREATE TABLE `frame_tags` (
   INDEX idx_tag (`tag`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Frame Likes
+-- Frames: like_count
 CREATE TABLE `frame_likes` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `frame_id` VARCHAR(24) NOT NULL,
@@ -145,7 +145,7 @@ CREATE TABLE `frame_likes` (
   INDEX idx_user_id (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Frame Uses
+-- Frames: use_count
 CREATE TABLE `frame_uses` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `frame_id` VARCHAR(24) NOT NULL,
@@ -157,7 +157,7 @@ CREATE TABLE `frame_uses` (
   INDEX idx_user_id (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Tickets Table
+-- Tickets
 CREATE TABLE `tickets` (
   `id` VARCHAR(24) PRIMARY KEY,
   `title` VARCHAR(200) NOT NULL,
@@ -177,7 +177,7 @@ CREATE TABLE `tickets` (
   INDEX idx_created_at (`created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Ticket Images
+-- Tickets: images
 CREATE TABLE `ticket_images` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `ticket_id` VARCHAR(24) NOT NULL,
@@ -187,7 +187,7 @@ CREATE TABLE `ticket_images` (
   INDEX idx_ticket_id (`ticket_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Reports Table
+-- Reports
 CREATE TABLE `reports` (
   `id` VARCHAR(24) PRIMARY KEY,
   `title` VARCHAR(200) NOT NULL,
@@ -208,7 +208,7 @@ CREATE TABLE `reports` (
   INDEX idx_created_at (`created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photos Table
+-- Photos
 CREATE TABLE `photos` (
   `id` VARCHAR(24) PRIMARY KEY,
   `title` VARCHAR(100) NOT NULL,
@@ -226,7 +226,7 @@ CREATE TABLE `photos` (
   INDEX idx_user_created (`user_id`, `created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Images
+-- Photos: images
 CREATE TABLE `photo_images` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `photo_id` VARCHAR(24) NOT NULL,
@@ -236,7 +236,7 @@ CREATE TABLE `photo_images` (
   INDEX idx_photo_id (`photo_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Videos
+-- Photos: video_files
 CREATE TABLE `photo_videos` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `photo_id` VARCHAR(24) NOT NULL,
@@ -246,7 +246,7 @@ CREATE TABLE `photo_videos` (
   INDEX idx_photo_id (`photo_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Posts Table (Social Media Posts)
+-- Photo Posts
 CREATE TABLE `photoposts` (
   `id` VARCHAR(24) PRIMARY KEY,
   `title` VARCHAR(100),
@@ -258,13 +258,13 @@ CREATE TABLE `photoposts` (
   `view_count` INT DEFAULT 0,
   `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
   `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  FOREIGN KEY (`photo_id`) REFERENCES `photos`(`id`) ON DELETE SET NULL,
   FOREIGN KEY (`user_id`) REFERENCES `users`(`id`) ON DELETE CASCADE,
+  FOREIGN KEY (`photo_id`) REFERENCES `photos`(`id`) ON DELETE SET NULL,
   INDEX idx_user_created (`user_id`, `created_at`),
   INDEX idx_visibility (`visibility`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Post Images
+-- Photo Posts: images
 CREATE TABLE `photopost_images` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `photopost_id` VARCHAR(24) NOT NULL,
@@ -274,7 +274,7 @@ CREATE TABLE `photopost_images` (
   INDEX idx_photopost_id (`photopost_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Post Likes
+-- Photo Posts: likes
 CREATE TABLE `photopost_likes` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `photopost_id` VARCHAR(24) NOT NULL,
@@ -287,7 +287,7 @@ CREATE TABLE `photopost_likes` (
   INDEX idx_user_id (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Post Comments
+-- Photo Posts: comments
 CREATE TABLE `photopost_comments` (
   `id` VARCHAR(24) PRIMARY KEY,
   `photopost_id` VARCHAR(24) NOT NULL,
@@ -301,7 +301,7 @@ CREATE TABLE `photopost_comments` (
   INDEX idx_user_id (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Collabs Table
+-- Photo Collabs
 CREATE TABLE `photo_collabs` (
   `id` VARCHAR(24) PRIMARY KEY,
   `title` VARCHAR(100) NOT NULL,
@@ -331,7 +331,7 @@ CREATE TABLE `photo_collabs` (
   INDEX idx_status_created (`status`, `created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Collab Merged Images
+-- Photo Collabs: merged_images
 CREATE TABLE `photo_collab_images` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `photo_collab_id` VARCHAR(24) NOT NULL,
@@ -341,7 +341,7 @@ CREATE TABLE `photo_collab_images` (
   INDEX idx_photo_collab_id (`photo_collab_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Photo Collab Stickers
+-- Photo Collabs: stickers
 CREATE TABLE `photo_collab_stickers` (
   `id` VARCHAR(50) PRIMARY KEY,
   `photo_collab_id` VARCHAR(24) NOT NULL,
@@ -359,7 +359,7 @@ CREATE TABLE `photo_collab_stickers` (
   INDEX idx_photo_collab_id (`photo_collab_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- AI Photobooth Usages Table
+-- AI Photobooth Usages
 CREATE TABLE `aiphotobooth_usages` (
   `id` VARCHAR(24) PRIMARY KEY,
   `user_id` VARCHAR(24) NOT NULL,
@@ -376,7 +376,7 @@ CREATE TABLE `aiphotobooth_usages` (
   INDEX idx_username (`username`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Broadcasts Table
+-- Broadcasts
 CREATE TABLE `broadcasts` (
   `id` VARCHAR(24) PRIMARY KEY,
   `title` VARCHAR(100) NOT NULL,
@@ -415,7 +415,7 @@ CREATE TABLE `broadcasts` (
   INDEX idx_target_status (`target_audience`, `status`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Broadcast Target Roles
+-- Broadcasts: target_roles
 CREATE TABLE `broadcast_target_roles` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `broadcast_id` VARCHAR(24) NOT NULL,
@@ -424,7 +424,7 @@ CREATE TABLE `broadcast_target_roles` (
   INDEX idx_broadcast_id (`broadcast_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Notifications Table
+-- Notifications
 CREATE TABLE `notifications` (
   `id` VARCHAR(24) PRIMARY KEY,
   `recipient_id` VARCHAR(24) NOT NULL,
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+DDL generated from the collection mappings
+mappings.py describes every table once: its columns with their SQL
+definitions, indexes and foreign keys, next to how the converter fills
+them. This module turns that description into the DROP/CREATE TABLE script
+the converter runs, so the schema and the row builders cannot drift apart.
+schema.sql is this script written out for reading and manual use:
+
+    python schema_gen.py -o schema.sql                  # Regenerate schema.sql
+    python schema_gen.py --check                        # Fail if schema.sql is out of date
+    python schema_gen.py --bulk-load -o create.sql --deferred-output indexes.sql
+    python schema_gen.py --id-storage binary            # BINARY(12) ids
+    python schema_gen.py --partition notifications=month --partition-years 2024 2026
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from mappings import MAPPINGS, Child, Column, Mapping, collection_dependencies
+from partitions import PARTITION_UNITS, PartitionLayout, partition_layouts
+from schema_tools import schema_variant, split_statements
+
+SCHEMA_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+TABLE_OPTIONS = 'ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci'
+ID_TYPE = 'VARCHAR(24)'  # ObjectId as hex (see schema_tools.binary_object_ids for BINARY(12))
+
+# Column definitions implied by the conversion when a Column has no `sql`
+_IMPLIED_TYPES = {'id': ID_TYPE, 'date': 'DATETIME', 'json': 'JSON'}
+
+HEADER = """-- MySQL Schema for Snaplove Database Migration
+-- Generated from mappings.py by schema_gen.py - do not edit by hand.
+-- Regenerate with: python schema_gen.py -o schema.sql
+"""
+
+
+def column_definition(column: Column) -> str:
+    """SQL definition of a mapped column (without PRIMARY KEY)"""
+    if column.sql:
+        return column.sql
+    if column.convert == 'bool':
+        return f"BOOLEAN DEFAULT {'TRUE' if column.default else 'FALSE'}"
+    if column.convert in _IMPLIED_TYPES:
+        return _IMPLIED_TYPES[column.convert]
+    raise ValueError(f"Column {column.name!r} needs an SQL definition (Column.sql)")
+
+
+def _key(columns: Tuple[str, ...]) -> str:
+    return ', '.join(f'`{column}`' for column in columns)
+
+
+def _foreign_key(column: str, definition: str, table: str) -> str:
+    on_delete = 'CASCADE' if 'NOT NULL' in definition.upper() else 'SET NULL'
+    return f"FOREIGN KEY (`{column}`) REFERENCES `{table}`(`id`) ON DELETE {on_delete}"
+
+
+def _not_null(definition: str) -> str:
+    if 'NOT NULL' in definition.upper():
+        return definition
+    kind, _, rest = definition.partition(' ')
+    return f"{kind} NOT NULL {rest}" if rest else f"{kind} NOT NULL"
+
+
+def table_definitions(mapping: Mapping, child: Optional[Child] = None, mappings: Dict[str, Mapping] = MAPPINGS,
+                      partition: Optional[PartitionLayout] = None) -> Tuple[str, List[str]]:
+    """(table, definitions inside CREATE TABLE) of a mapping's table or of one of its child tables
+
+    Columns come first, then foreign keys, UNIQUE keys and plain indexes.
+    For a table partitioned on `partition.column` MySQL needs that column
+    (NOT NULL) in the primary key and in every UNIQUE key, and allows no
+    foreign keys; the converter still validates the references itself.
+    """
+    spec = child or mapping
+    columns = [(column.name, column_definition(column)) for column in spec.columns]
+    if child is not None:
+        parent = (child.parent_column, f'{ID_TYPE} NOT NULL')
+        if columns and columns[0][0] == 'id':
+            columns.insert(1, parent)
+        else:
+            columns.insert(0, ('id', 'INT AUTO_INCREMENT'))
+            columns.insert(1, parent)
+    if partition is not None:
+        if not any(column.name == partition.column and column.convert == 'date' for column in spec.columns):
+            raise ValueError(f"{spec.table} cannot be partitioned: it has no date column {partition.column!r}")
+        columns = [(name, _not_null(definition) if name == partition.column else definition)
+                   for name, definition in columns]
+    types = dict(columns)
+
+    if partition is None:
+        definitions = [f"`{name}` {definition}{' PRIMARY KEY' if i == 0 else ''}"
+                       for i, (name, definition) in enumerate(columns)]
+    else:
+        definitions = [f"`{name}` {definition}" for name, definition in columns]
+        definitions.append(f"PRIMARY KEY ({_key((columns[0][0], partition.column))})")
+    if child is not None and partition is None:
+        definitions.append(_foreign_key(child.parent_column, types[child.parent_column], mapping.table))
+    for fk in spec.foreign_keys if partition is None else ():
+        definitions.append(_foreign_key(fk.column, types[fk.column], mappings[fk.references].table))
+
+    indexes = list(spec.indexes)
+    for index in indexes:
+        missing = [column for column in index.columns if column not in types]
+        if missing:
+            raise ValueError(f"Index {index.name} of {spec.table} uses unknown columns {missing}")
+    if partition is not None:
+        indexes = [index._replace(columns=index.columns + (partition.column,))
+                   if index.unique and partition.column not in index.columns else index for index in indexes]
+    definitions += [f"UNIQUE KEY {index.name} ({_key(index.columns)})" for index in indexes if index.unique]
+    if child is not None:
+        definitions.append(f"INDEX idx_{child.parent_column} (`{child.parent_column}`)")
+    definitions += [f"INDEX {index.name} ({_key(index.columns)})" for index in indexes if not index.unique]
+    return spec.table, definitions
+
+
+def create_table(table: str, definitions: List[str], partition: Optional[str] = None) -> str:
+    """CREATE TABLE statement (with an optional PARTITION BY clause after the table options)"""
+    statement = f"CREATE TABLE `{table}` (\n  " + ',\n  '.join(definitions) + f"\n) {TABLE_OPTIONS}"
+    return statement + f"\n{partition}" if partition else statement
+
+
+def table_order(mappings: Dict[str, Mapping] = MAPPINGS) -> List[Mapping]:
+    """Mappings with every referenced collection before the ones referencing it (else in dict order)"""
+    dependencies = collection_dependencies(mappings)
+    ordered = []
+    done = set()
+    pending = list(mappings.values())
+    while pending:
+        mapping = next((m for m in pending if dependencies[m.collection] <= done), None)
+        if mapping is None:
+            raise ValueError(f"Circular foreign keys between {', '.join(m.collection for m in pending)}")
+        ordered.append(mapping)
+        done.add(mapping.collection)
+        pending.remove(mapping)
+    return ordered
+
+
+def schema_tables(mappings: Dict[str, Mapping] = MAPPINGS, partitions: Optional[Dict[str, PartitionLayout]] = None
+                  ) -> List[Tuple[str, str, List[str]]]:
+    """(comment, table, definitions) of every table, parents before the tables referencing them"""
+    partitions = partitions or {}
+    tables = {m.table for m in mappings.values()} | {c.table for m in mappings.values() for c in m.children}
+    referenced = {mappings[fk.references].table for m in mappings.values()
+                  for fk in m.foreign_keys + tuple(fk for c in m.children for fk in c.foreign_keys)}
+    for table in partitions:
+        if table not in tables:
+            raise ValueError(f"Unknown partitioned table {table!r}")
+        if table in referenced:
+            raise ValueError(f"{table} cannot be partitioned: other tables have foreign keys to it")
+
+    result = []
+    for mapping in table_order(mappings):
+        result.append((mapping.title,
+                       *table_definitions(mapping, mappings=mappings, partition=partitions.get(mapping.table))))
+        for child in mapping.children:
+            result.append((f'{mapping.title}: {child.source}',
+                           *table_definitions(mapping, child, mappings, partitions.get(child.table))))
+    return result
+
+
+def generate_script(mappings: Dict[str, Mapping] = MAPPINGS,
+                    partitions: Optional[Dict[str, PartitionLayout]] = None) -> str:
+    """The full DROP/CREATE TABLE script (the contents of schema.sql, which has no `partitions`)"""
+    partitions = partitions or {}
+    tables = schema_tables(mappings, partitions)
+    lines = [HEADER, '-- Drop tables if they exist (children before the tables they reference)']
+    lines += [f"DROP TABLE IF EXISTS `{table}`;" for _, table, _ in reversed(tables)]
+    for comment, table, definitions in tables:
+        partition = partitions.get(table)
+        lines += ['', f'-- {comment}', create_table(table, definitions, partition and partition.clause()) + ';']
+    return '\n'.join(lines) + '\n'
+
+
+def generate_statements(mappings: Dict[str, Mapping] = MAPPINGS,
+                        partitions: Optional[Dict[str, PartitionLayout]] = None) -> List[str]:
+    """The statements of generate_script(), ready to execute"""
+    return split_statements(generate_script(mappings, partitions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the MySQL schema from mappings.py')
+    parser.add_argument('-o', '--output', help='write the script to this file (default: stdout)')
+    parser.add_argument('--check', action='store_true',
+                        help='only compare schema.sql with the generated script; exit 1 if it is out of date')
+    parser.add_argument('--id-storage', choices=['hex', 'binary'], default='hex',
+                        help="ObjectId columns as 'hex' VARCHAR(24) or 'binary' BINARY(12) (default: hex)")
+    parser.add_argument('--bulk-load', action='store_true',
+                        help='tables with primary and unique keys only; the INDEXes and FOREIGN KEYs go to '
+                             '--deferred-output (or to the end of the script) as one ALTER TABLE per table')
+    parser.add_argument('--deferred-output', help='with --bulk-load: file for the ALTER TABLE statements')
+    parser.add_argument('--no-secondary-indexes', action='store_true',
+                        help='leave out the plain INDEXes (primary, unique and foreign keys stay)')
+    parser.add_argument('--partition', action='append', default=[], metavar='TABLE=UNIT',
+                        help=f"partition TABLE by RANGE of created_at, one partition per UNIT "
+                             f"({'/'.join(PARTITION_UNITS)}); repeat for more tables")
+    parser.add_argument('--partition-years', nargs=2, type=int, metavar=('FIRST', 'LAST'),
+                        help='years with their own partitions (required with --partition)')
+    args = parser.parse_args()
+
+    partitions = {}
+    if args.partition:
+        if not args.partition_years:
+            parser.error('--partition needs --partition-years FIRST LAST')
+        try:
+            partitions = partition_layouts(dict(option.split('=', 1) for option in args.partition),
+                                           tuple(args.partition_years))
+            schema_tables(partitions=partitions)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.check:
+        with open(SCHEMA_SQL, 'r', encoding='utf-8') as f:
+            current = f.read()
+        if current != generate_script():
+            print(f"✗ {SCHEMA_SQL} is out of date, run: python schema_gen.py -o schema.sql")
+            sys.exit(1)
+        print(f"✓ {SCHEMA_SQL} matches mappings.py")
+        return
+
+    if args.id_storage == 'hex' and not args.bulk_load and not args.no_secondary_indexes:
+        script, deferred_script = generate_script(partitions=partitions), ''
+    else:
+        statements, deferred = schema_variant(generate_statements(partitions=partitions),
+                                              binary_ids=args.id_storage == 'binary',
+                                              bulk_load=args.bulk_load,
+                                              secondary_indexes=not args.no_secondary_indexes)
+        script = HEADER + '\n' + ''.join(f'{statement};\n\n' for statement in statements)
+        deferred_script = ''.join(f'{statement};\n\n' for statement in deferred)
+        if deferred_script and not args.deferred_output:
+            script += '-- Run after the data is loaded\n' + deferred_script
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(script)
+        print(f"✓ Schema written to {args.output}")
+    else:
+        sys.stdout.write(script)
+    if args.deferred_output:
+        with open(args.deferred_output, 'w', encoding='utf-8') as f:
+            f.write(deferred_script)
+        print(f"✓ Deferred indexes and foreign keys written to {args.deferred_output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Helpers for reading and rewriting schema scripts (schema.sql or the one schema_gen.py generates)
+Used to split the script into statements, to work out which DDL statements
+can run at the same time (parallel schema setup), and by the bulk-load mode
+to create tables with only their primary keys and add secondary indexes and
+foreign keys after the data is loaded. binary_object_ids() gives the
+BINARY(12) id variant of a table (ID_STORAGE = 'binary').
+"""
+
+import re
+from typing import List, Optional, Set, Tuple
+
+_CREATE_TABLE_RE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\(', re.IGNORECASE)
+_DROP_TABLE_RE = re.compile(r'DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?`?(\w+)`?\s*$', re.IGNORECASE)
+_ALTER_TABLE_RE = re.compile(r'ALTER\s+TABLE\s+`?(\w+)`?\s', re.IGNORECASE)
+_REFERENCES_RE = re.compile(r'\bREFERENCES\s+`?(\w+)`?', re.IGNORECASE)
+_COLUMN_RE = re.compile(r'`(\w+)`\s+(\w+)\s*(?:\(([^)]*)\))?')
+
+# Table definitions that can be added later with ALTER TABLE ... ADD
+_DEFERRABLE_RE = re.compile(r'^(INDEX|KEY|FULLTEXT|FOREIGN\s+KEY|CONSTRAINT\s+`?\w+`?\s+FOREIGN\s+KEY)\b', re.IGNORECASE)
+
+# Plain secondary indexes (foreign keys and UNIQUE keys are not included)
+_SECONDARY_INDEX_RE = re.compile(r'^(INDEX|KEY|FULLTEXT|SPATIAL)\b', re.IGNORECASE)
+
+# ObjectId columns: every VARCHAR(24) in the schema holds an id or a reference to one
+_OBJECT_ID_COLUMN_RE = re.compile(r'(`\w+`\s+)VARCHAR\s*\(\s*24\s*\)', re.IGNORECASE)
+
+# Helpers for reading BINARY(12) ids, e.g.
+#   SELECT oid_hex(id), name FROM users WHERE id = oid_from_hex('65f1c0a2e4b0a1b2c3d4e5f6')
+OBJECT_ID_FUNCTIONS = [
+    "DROP FUNCTION IF EXISTS `oid_hex`",
+    "CREATE FUNCTION `oid_hex`(id BINARY(12)) RETURNS CHAR(24) CHARSET ascii DETERMINISTIC NO SQL "
+    "RETURN LOWER(HEX(id))",
+    "DROP FUNCTION IF EXISTS `oid_from_hex`",
+    "CREATE FUNCTION `oid_from_hex`(hex_id CHAR(24) CHARSET ascii) RETURNS BINARY(12) DETERMINISTIC NO SQL "
+    "RETURN UNHEX(hex_id)",
+]
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a SQL script into statements
+    
+    Semicolons inside quoted strings, `identifiers` and comments do not end
+    a statement. Comments (--, # and /* */) are dropped, except MySQL
+    /*! ... */ version comments, which are executable. DELIMITER is not
+    supported.
+    """
+    statements = []
+    current = []
+    i = 0
+    start = 0  # Start of the text not yet copied into `current`
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char in ("'", '"', '`'):
+            i += 1
+            while i < length:
+                if sql[i] == '\\' and char != '`':
+                    i += 2
+                    continue
+                if sql[i] == char:
+                    if i + 1 < length and sql[i + 1] == char:  # Doubled quote
+                        i += 2
+                        continue
+                    break
+                i += 1
+            i += 1
+        elif char == '#' or (char == '-' and sql.startswith('--', i)
+                             and (i + 2 >= length or sql[i + 2] in ' \t\r\n')):
+            current.append(sql[start:i])
+            end = sql.find('\n', i)
+            i = start = length if end == -1 else end
+        elif char == '/' and sql.startswith('/*', i) and not sql.startswith('/*!', i):
+            current.append(sql[start:i] + ' ')
+            end = sql.find('*/', i + 2)
+            i = start = length if end == -1 else end + 2
+        elif char == ';':
+            current.append(sql[start:i])
+            statements.append(''.join(current))
+            current = []
+            i = start = i + 1
+        else:
+            i += 1
+    current.append(sql[start:])
+    statements.append(''.join(current))
+    return [s.strip() for s in statements if s.strip()]
+
+
+def statement_tables(statement: str, parents: Optional[dict] = None) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Tables a DDL statement changes and tables it needs, for ordering parallel DDL
+    
+    Returns (written, read), or None for statements other than single-table
+    CREATE/DROP/ALTER TABLE. CREATE and ALTER read the tables their foreign
+    keys reference. A DROP reads the parents of the dropped table (from
+    `parents`, table -> referenced tables), so that a parent is only dropped
+    after the tables pointing at it.
+    """
+    match = _CREATE_TABLE_RE.match(statement) or _ALTER_TABLE_RE.match(statement)
+    if match:
+        table = match.group(1)
+        return {table}, set(_REFERENCES_RE.findall(statement)) - {table}
+    match = _DROP_TABLE_RE.match(statement)
+    if match:
+        table = match.group(1)
+        return {table}, set((parents or {}).get(table, ())) - {table}
+    return None
+
+
+def statement_dependencies(statements: List[str]) -> Optional[List[Set[int]]]:
+    """For every statement, the earlier statements it has to wait for
+    
+    Two statements are ordered as in the script when one changes a table the
+    other changes or needs; everything else may run concurrently (e.g. the
+    CREATE TABLEs of sibling tables that reference the same parent). Returns
+    None if the script has statements that cannot be ordered this way (SET,
+    INSERT, views, multi-table DROP, ...), which then run serially.
+    """
+    parents = {}
+    for statement in statements:
+        match = _CREATE_TABLE_RE.match(statement)
+        if match:
+            parents.setdefault(match.group(1), set()).update(_REFERENCES_RE.findall(statement))
+    
+    tables = []
+    for statement in statements:
+        touched = statement_tables(statement, parents)
+        if touched is None:
+            return None
+        tables.append(touched)
+    
+    dependencies = []
+    for j, (written, read) in enumerate(tables):
+        dependencies.append({i for i in range(j)
+                             if tables[i][0] & (written | read) or tables[i][1] & written})
+    return dependencies
+
+
+def split_definitions(body: str) -> List[str]:
+    """Split the inside of CREATE TABLE (...) on top-level commas"""
+    definitions = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, char in enumerate(body):
+        if quote:
+            if char == quote and body[i - 1] != '\\':
+                quote = None
+        elif char in ("'", '"', '`'):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            definitions.append(body[start:i].strip())
+            start = i + 1
+    definitions.append(body[start:].strip())
+    return [d for d in definitions if d]
+
+
+def parse_create_table(statement: str) -> Optional[Tuple[str, str, List[str], str]]:
+    """Return (table, prefix, definitions, suffix) for a CREATE TABLE statement, else None"""
+    match = _CREATE_TABLE_RE.search(statement)
+    if not match:
+        return None
+
+    open_paren = match.end() - 1
+    depth = 0
+    quote = None
+    for i in range(open_paren, len(statement)):
+        char = statement[i]
+        if quote:
+            if char == quote and statement[i - 1] != '\\':
+                quote = None
+        elif char in ("'", '"', '`'):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                body = statement[open_paren + 1:i]
+                return match.group(1), statement[:open_paren + 1], split_definitions(body), statement[i:]
+    return None
+
+
+def defer_secondary_keys(statement: str) -> Tuple[str, Optional[str]]:
+    """Strip secondary INDEXes and FOREIGN KEYs from a CREATE TABLE statement
+
+    Returns the primary-key-only CREATE TABLE statement and a single
+    ALTER TABLE statement that adds everything back (None if nothing was
+    deferred). UNIQUE keys stay in the CREATE TABLE so duplicate rows are
+    still rejected while loading. Non CREATE TABLE statements are returned
+    unchanged.
+    """
+    parsed = parse_create_table(statement)
+    if not parsed:
+        return statement, None
+
+    table, prefix, definitions, suffix = parsed
+    kept = [d for d in definitions if not _DEFERRABLE_RE.match(d)]
+    deferred = [d for d in definitions if _DEFERRABLE_RE.match(d)]
+    if not deferred:
+        return statement, None
+
+    create = prefix + '\n  ' + ',\n  '.join(kept) + '\n' + suffix
+    alter = f"ALTER TABLE `{table}`\n  " + ',\n  '.join(f'ADD {d}' for d in deferred)
+    return create, alter
+
+
+def strip_secondary_indexes(statement: str) -> str:
+    """Remove the plain INDEX/KEY definitions from a CREATE TABLE statement
+
+    Primary, UNIQUE and FOREIGN keys are kept (MySQL adds the index a
+    foreign key needs by itself). For throwaway schemas, e.g. test
+    databases, where index maintenance is not worth it.
+    """
+    parsed = parse_create_table(statement)
+    if not parsed:
+        return statement
+
+    _, prefix, definitions, suffix = parsed
+    kept = [d for d in definitions if not _SECONDARY_INDEX_RE.match(d)]
+    if len(kept) == len(definitions):
+        return statement
+    return prefix + '\n  ' + ',\n  '.join(kept) + '\n' + suffix
+
+
+def binary_object_ids(statement: str) -> str:
+    """A CREATE TABLE statement with its ObjectId columns (VARCHAR(24)) stored as BINARY(12)
+
+    Half the bytes per key in every primary key, foreign key and index, and
+    byte comparisons instead of collation-aware string comparisons.
+    """
+    if not _CREATE_TABLE_RE.match(statement):
+        return statement
+    return _OBJECT_ID_COLUMN_RE.sub(r'\1BINARY(12)', statement)
+
+
+def schema_variant(statements: List[str], binary_ids: bool = False, bulk_load: bool = False,
+                   secondary_indexes: bool = True) -> Tuple[List[str], List[str]]:
+    """(statements to run now, deferred ALTER TABLE statements) of a schema script
+
+    `binary_ids` stores the ObjectId columns as BINARY(12). With
+    `bulk_load` tables are created with only their primary and unique keys
+    and their secondary INDEXes and FOREIGN KEYs are returned as one ALTER
+    TABLE per table, to run after the data is loaded. Without
+    `secondary_indexes` the plain INDEXes are left out altogether.
+    """
+    if binary_ids:
+        statements = [binary_object_ids(statement) for statement in statements]
+    if not secondary_indexes:
+        statements = [strip_secondary_indexes(statement) for statement in statements]
+    if not bulk_load:
+        return statements, []
+
+    immediate = []
+    deferred = []
+    for statement in statements:
+        create, alter = defer_secondary_keys(statement)
+        immediate.append(create)
+        if alter:
+            deferred.append(alter)
+    return immediate, deferred
+
+
+def column_types(statements: List[str]) -> dict:
+    """{table: {column: type}} from the CREATE TABLE statements, types upper-cased without their size
+
+    e.g. {'users': {'id': 'VARCHAR', 'birthdate': 'DATE', ...}}. DECIMAL keeps
+    its scale as 'DECIMAL(2)'.
+    """
+    tables = {}
+    for statement in statements:
+        parsed = parse_create_table(statement)
+        if not parsed:
+            continue
+        table, _, definitions, _ = parsed
+        columns = tables.setdefault(table, {})
+        for definition in definitions:
+            match = _COLUMN_RE.match(definition)
+            if not match:
+                continue
+            name, kind, size = match.groups()
+            kind = kind.upper()
+            if kind in ('DECIMAL', 'NUMERIC'):
+                scale = size.split(',')[1].strip() if size and ',' in size else '0'
+                kind = f'DECIMAL({scale})'
+            columns[name] = kind
+    return tables
+
@@ -0,0 +1,34 @@
+"""
+Settings of the migration tools
+config.py (a copy of config.example.py) is imported from here. Settings it
+does not have, e.g. ones added to the template after the copy was made,
+fall back to their value in config.example.py, with a warning listing them,
+so an existing config.py keeps working after an upgrade.
+"""
+
+import importlib.util
+import multiprocessing
+import os
+
+import config
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.example.py')
+
+
+def _load_example():
+    """config.example.py as a module (None if it is missing)"""
+    if not os.path.exists(EXAMPLE_FILE):
+        return None
+    spec = importlib.util.spec_from_file_location('config_example', EXAMPLE_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_example = _load_example()
+MISSING = [name for name in dir(_example) if name.isupper() and not hasattr(config, name)] if _example else []
+globals().update({name: getattr(_example, name) for name in MISSING})
+globals().update({name: getattr(config, name) for name in dir(config) if name.isupper()})
+
+if MISSING and multiprocessing.parent_process() is None:  # Once, not in every worker process
+    print(f"⚠ config.py has no {', '.join(MISSING)}; using the defaults from config.example.py")
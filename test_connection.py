@@ -24,7 +24,7 @@ if not os.path.exists('config.py'):
     print()
     sys.exit(1)
 
-from config import MYSQL_CONFIG, DATA_DIR, DATA_FILES
+from settings import MYSQL_CONFIG, DATA_DIR, DATA_FILES
 
 def test_mysql_connection():
     """Test MySQL connection"""
@@ -1,58 +1,638 @@
 #!/usr/bin/env python3
 """
 Verify migration results
+Compares the dump with the target database for every collection and every
+child table:
+
+    documents   documents in the dump, and how many the foreign key checks skip
+    rows        rows expected from the documents (parents and array children)
+                vs rows in the table
+    checksum    order-independent checksum of all rows on both sides
+
+The dump side runs every collection through the same compiled mappings as the
+migration, in worker processes, against the foreign key sets read back from
+the database, so documents and child rows the migration skipped are not
+expected. The database side runs one aggregate query per table on its own
+connection at the same time. Checksums are kept per bucket of rows (CRC32 of
+the parent id), so a difference is narrowed down to a few buckets.
+
+With --sample N, N documents per collection are reservoir-sampled from the
+dump instead and compared field by field (parent rows and child rows) with
+the rows fetched by id, to check the conversions themselves.
 """
 
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import bson
 import pymysql
-from config import MYSQL_CONFIG
+from settings import (MYSQL_CONFIG, DATA_DIR, DATA_FILES, MIGRATION_ORDER, VERIFY_WORKERS, VERIFY_BUCKETS, ID_STORAGE)
+from connection_pool import ConnectionPool
+from converter import MongoToMySQLConverter, TRACKED_IDS
+from mappings import MAPPINGS, MissingReference
+from partitions import PartitionLayout, stored_partitions
+from progress import reject_reason
+from schema_tools import column_types
+
+# NULL and the column separator in the checksummed row text (CHAR(0)/CHAR(31) in SQL)
+NULL = '\x00'
+SEPARATOR = '\x1f'
+
+# MySQL column types compared as their text / as integers
+TEXT_TYPES = {'CHAR', 'VARCHAR', 'TINYTEXT', 'TEXT', 'MEDIUMTEXT', 'LONGTEXT', 'ENUM', 'SET'}
+INTEGER_TYPES = {'TINYINT', 'SMALLINT', 'MEDIUMINT', 'INT', 'INTEGER', 'BIGINT', 'BOOL', 'BOOLEAN'}
+
+
+class TableSpec:
+    """The columns of one table written by the migration, and the column rows are bucketed by"""
+
+    def __init__(self, collection: str, table: str, columns: Tuple[str, ...], key: str, child: bool):
+        self.collection = collection
+        self.table = table
+        self.columns = columns
+        self.key = key  # The parent's id: rows of one document land in the same bucket in every table
+        self.child = child
+
+
+def table_specs(collections: List[str]) -> List[TableSpec]:
+    """Parent and child tables of the given collections, in migration order"""
+    specs = []
+    for collection in collections:
+        mapping = MAPPINGS[collection]
+        columns = tuple(column.name for column in mapping.columns)
+        specs.append(TableSpec(collection, mapping.table, columns, columns[0], child=False))
+        for child in mapping.children:
+            child_columns = (child.parent_column,) + tuple(column.name for column in child.columns)
+            specs.append(TableSpec(collection, child.table, child_columns, child.parent_column, child=True))
+    return specs
+
 
-def verify_migration():
-    """Check row counts in all tables"""
+def schema_kinds(id_storage: str) -> Dict[str, Dict[str, str]]:
+    """Column types of the tables as the migration creates them for `id_storage` ('hex' or 'binary')"""
+    statements, _ = MongoToMySQLConverter(id_storage=id_storage).schema_statements()
+    return column_types(statements)
+
+
+def _decimal(value: Any, scale: int) -> Optional[Decimal]:
     try:
-        conn = pymysql.connect(**MYSQL_CONFIG)
-        cursor = conn.cursor()
-        
-        print("\n" + "="*60)
-        print("MIGRATION VERIFICATION")
-        print("="*60 + "\n")
-        
-        tables = [
-            'users', 'maintenances', 'follows', 'frames', 'frame_images',
-            'frame_tags', 'frame_likes', 'frame_uses', 'tickets', 'ticket_images',
-            'reports', 'photos', 'photo_images', 'photo_videos', 'photoposts',
-            'photopost_images', 'photopost_likes', 'photopost_comments',
-            'photocollabs', 'photo_collab_images', 'photo_collab_stickers',
-            'aiphotobooth_usages', 'broadcasts', 'broadcast_target_roles',
-            'notifications'
-        ]
-        
-        for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
-            count = cursor.fetchone()[0]
-            icon = "✓" if count > 0 else "○"
-            print(f"{icon} {table:30s}: {count:6d} rows")
-        
-        print("\n" + "="*60)
-        
-        # Show some sample data
-        print("\nSample Users:")
-        cursor.execute("SELECT username, email, role FROM users LIMIT 5")
-        for row in cursor.fetchall():
-            print(f"  - {row[0]:20s} ({row[1]:30s}) [{row[2]}]")
-        
-        print("\nSample Frames:")
-        cursor.execute("SELECT title, visibility, official_status FROM frames LIMIT 5")
-        for row in cursor.fetchall():
-            print(f"  - {row[0]:40s} [{row[1]}] Official: {row[2]}")
-        
-        print("\n" + "="*60)
-        print("✓ Verification completed!")
-        print("="*60 + "\n")
-        
-        conn.close()
-        
+        return Decimal(str(int(value) if isinstance(value, bool) else value)).quantize(
+            Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def value_formatter(kind: Optional[str]) -> Callable[[Any], str]:
+    """Python value -> the text MySQL returns for it after the INSERT (see sql_value)"""
+    kind = kind or 'TEXT'
+    if kind in TEXT_TYPES:
+        def text(value):
+            if value is None:
+                return NULL
+            if isinstance(value, bool):
+                return '1' if value else '0'
+            return value if isinstance(value, str) else str(value)
+        return text
+    if kind == 'BINARY':  # BINARY(12) ObjectIds, compared as hex
+        def hex_text(value):
+            if value is None:
+                return NULL
+            return value.hex() if isinstance(value, bytes) else str(value)
+        return hex_text
+    if kind in INTEGER_TYPES or kind.startswith('DECIMAL('):
+        scale = int(kind[8:-1]) if kind.startswith('DECIMAL(') else 0
+
+        def number(value):
+            if value is None:
+                return NULL
+            rounded = _decimal(value, scale)
+            return str(value) if rounded is None else f'{rounded:f}'
+        return number
+    if kind == 'DATE':
+        def date_text(value):
+            if value is None:
+                return NULL
+            if isinstance(value, (datetime, date)):
+                return value.strftime('%Y-%m-%d')
+            return str(value)[:10]
+        return date_text
+    if kind in ('DATETIME', 'TIMESTAMP'):
+        def datetime_text(value):
+            if value is None:
+                return NULL
+            if isinstance(value, datetime):
+                if value.microsecond >= 500000:  # DATETIME rounds fractional seconds
+                    value += timedelta(seconds=1)
+                return value.strftime('%Y-%m-%d %H:%M:%S')
+            return str(value)
+        return datetime_text
+    # JSON (normalized by MySQL), FLOAT/DOUBLE, ...: only NULL or not is compared
+    return lambda value: NULL if value is None else 'set'
+
+
+def sql_value(column: str, kind: Optional[str]) -> str:
+    """SQL expression giving the same text as value_formatter(kind) for a stored value"""
+    kind = kind or 'TEXT'
+    if kind in TEXT_TYPES:
+        expression = f'`{column}`'
+    elif kind == 'BINARY':
+        expression = f'LOWER(HEX(`{column}`))'
+    elif kind in INTEGER_TYPES or kind.startswith('DECIMAL(') or kind in ('DATE', 'DATETIME', 'TIMESTAMP'):
+        expression = f'CAST(`{column}` AS CHAR)'
+    else:
+        expression = f"IF(`{column}` IS NULL, NULL, 'set')"
+    return f'COALESCE({expression}, CHAR(0 USING utf8mb4))'
+
+
+def placeholders(kind: Optional[str], count: int) -> str:
+    """IN (...) placeholders for `count` values as value_formatter(kind) formats them"""
+    return ', '.join(['UNHEX(%s)' if kind == 'BINARY' else '%s'] * count)
+
+
+class TableChecksum:
+    """Per-bucket [rows, BIT_XOR of row CRC32s, SUM of row CRC32s] of one side of a table"""
+
+    def __init__(self, spec: TableSpec, kinds: Dict[str, str], buckets: int, checksums: bool):
+        self.formatters = [value_formatter(kinds.get(column)) for column in spec.columns]
+        self.key_index = spec.columns.index(spec.key)
+        self.buckets_count = buckets if checksums else 1
+        self.checksums = checksums
+        self.buckets: Dict[int, List[int]] = {}
+
+    def add(self, values):
+        if not self.checksums:
+            bucket = self.buckets.get(0)
+            if bucket is None:
+                bucket = self.buckets[0] = [0, 0, 0]
+            bucket[0] += 1
+            return
+        text = [formatter(value) for formatter, value in zip(self.formatters, values)]
+        crc = zlib.crc32(SEPARATOR.join(text).encode('utf-8'))
+        number = zlib.crc32(text[self.key_index].encode('utf-8')) % self.buckets_count
+        bucket = self.buckets.get(number)
+        if bucket is None:
+            bucket = self.buckets[number] = [0, 0, 0]
+        bucket[0] += 1
+        bucket[1] ^= crc
+        bucket[2] += crc
+
+
+# Per-process converter with the foreign key sets, used by scan_collection
+_source_converter = None
+
+
+def _init_source_worker(id_snapshot: Dict[str, Any], partitions: Dict[str, PartitionLayout]):
+    global _source_converter
+    # Row values as text (see value_formatter), partition columns filled in like the migration did
+    _source_converter = MongoToMySQLConverter(id_storage='hex', partitions=partitions)
+    for attr, ids in id_snapshot.items():
+        setattr(_source_converter, attr, ids)
+
+
+def scan_collection(collection: str, kinds: Dict[str, Dict[str, str]], buckets: int, checksums: bool) -> Dict:
+    """Stream one collection's dump through its mapping (runs in a worker process)"""
+    converter = _source_converter
+    mapping = converter.row_builders()[collection]
+    build = mapping.build
+    indexes = [getattr(converter, TRACKED_IDS[reference]) for reference in mapping.references]
+    sums = {spec.table: TableChecksum(spec, kinds.get(spec.table, {}), buckets, checksums)
+            for spec in table_specs([collection])}
+    parent = sums[mapping.table]
+    documents = 0
+    skipped = 0
+    # load_data_file reports to stdout; keep its messages for the parent instead of interleaving them
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for record in converter.load_data_file(DATA_FILES[collection]):
+            documents += 1
+            try:
+                values, children = build(record, *indexes)
+            except MissingReference:
+                skipped += 1
+                continue
+            parent.add(values)
+            for table, _, row in children or ():
+                sums[table].add(row)
+    return {'documents': documents, 'skipped': skipped, 'messages': output.getvalue().splitlines(),
+            'tables': {table: checksum.buckets for table, checksum in sums.items()}}
+
+
+def table_query(spec: TableSpec, kinds: Dict[str, str], buckets: int, checksums: bool) -> str:
+    """Aggregate query giving the same buckets as TableChecksum for the rows in the database"""
+    if not checksums:
+        return f"SELECT 0, COUNT(*), 0, 0 FROM `{spec.table}`"
+    values = ', '.join(sql_value(column, kinds.get(column)) for column in spec.columns)
+    return (f"SELECT bucket, COUNT(*), BIT_XOR(crc), SUM(crc) FROM ("
+            f"SELECT CRC32({sql_value(spec.key, kinds.get(spec.key))}) % {buckets} AS bucket, "
+            f"CRC32(CONCAT_WS(CHAR(31 USING utf8mb4), {values})) AS crc "
+            f"FROM `{spec.table}`) AS row_crcs GROUP BY bucket")
+
+
+def compare(expected: Dict[int, List[int]], actual: Dict[int, List[int]]) -> Tuple[int, int, int]:
+    """(expected rows, actual rows, buckets that differ)"""
+    differing = sum(1 for bucket in expected.keys() | actual.keys()
+                    if expected.get(bucket) != actual.get(bucket))
+    return (sum(bucket[0] for bucket in expected.values()),
+            sum(bucket[0] for bucket in actual.values()), differing)
+
+
+def verify_migration(workers: int = VERIFY_WORKERS, buckets: int = VERIFY_BUCKETS, checksums: bool = True,
+                     collections: Optional[List[str]] = None) -> bool:
+    """Compare the dump with the target database; True when every table matches"""
+    print("\n" + "="*60)
+    print("MIGRATION VERIFICATION")
+    print("="*60 + "\n")
+    started = time.perf_counter()
+    collections = [c for c in MIGRATION_ORDER if c in MAPPINGS and (not collections or c in collections)]
+
+    pool = ConnectionPool(lambda: pymysql.connect(**MYSQL_CONFIG), max_idle=workers)
+    converter = MongoToMySQLConverter(id_storage='hex')
+    try:
+        converter.connection = pool.acquire()
+        converter.rebuild_inserted_ids()
+        kinds = schema_kinds(converter.stored_id_storage(converter.connection) or ID_STORAGE)
+        partitions = stored_partitions(converter.connection)
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"✗ Could not read the foreign key sets from MySQL: {e}")
+        pool.release(converter.connection, discard=True)
+        return False
+    pool.release(converter.connection)
+    id_snapshot = {attr: getattr(converter, attr) for attr in TRACKED_IDS.values()}
+    specs = table_specs(collections)
+
+    def query_table(spec: TableSpec) -> Dict[int, List[int]]:
+        def query(connection):
+            cursor = connection.cursor()
+            cursor.execute(table_query(spec, kinds.get(spec.table, {}), buckets, checksums))
+            return {int(bucket): [int(rows), int(xor or 0), int(total or 0)]
+                    for bucket, rows, xor, total in cursor.fetchall()}
+        return pool.run(query)
+
+    ok = True
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as threads, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=_init_source_worker, initargs=(id_snapshot, partitions)) as processes:
+            # Both sides run at the same time: dump scans in processes, table queries in threads
+            target = {spec.table: threads.submit(query_table, spec) for spec in specs}
+            source = {collection: processes.submit(scan_collection, collection, kinds, buckets, checksums)
+                      for collection in collections}
+
+            print(f"{'Table':28s} {'Documents':>10s} {'Skipped':>9s} {'Expected':>10s} {'Actual':>10s}  Checksum")
+            print('-' * 84)
+            for spec in specs:
+                scanned = source[spec.collection].result()
+                if not spec.child:
+                    for message in scanned['messages']:
+                        if not message.startswith('✓'):
+                            print(f"  {message}")
+                try:
+                    actual = target[spec.table].result()
+                except Exception as e:
+                    ok = False
+                    print(f"✗ {spec.table}: {e}")
+                    continue
+                expected_rows, actual_rows, differing = compare(scanned['tables'][spec.table], actual)
+                matches = expected_rows == actual_rows and not differing
+                ok = ok and matches
+                if spec.child:
+                    name, documents, skipped = f"  {spec.table}", '', ''
+                else:
+                    name, documents, skipped = spec.table, scanned['documents'], scanned['skipped']
+                if not checksums:
+                    result = '-'
+                elif differing:
+                    result = f"✗ {differing}/{buckets} buckets differ"
+                else:
+                    result = '✓'
+                icon = '✓' if matches else '✗'
+                print(f"{icon} {name:26s} {documents:>10} {skipped:>9} {expected_rows:>10} {actual_rows:>10}  {result}")
+    finally:
+        pool.close()
+
+    print("\n" + "="*60)
+    elapsed = time.perf_counter() - started
+    if ok:
+        print(f"✓ Verification passed: {len(specs)} tables match ({elapsed:.1f}s)")
+    else:
+        print(f"✗ Verification found differences ({elapsed:.1f}s)")
+        print("  Skipped documents are expected to be missing; other differences are usually rows")
+        print("  MySQL rejected (see migration_rejects.jsonl) or changes made after the dump.")
+    print("="*60 + "\n")
+    return ok
+
+
+# ============================================================
+# Sampled deep diff (--sample)
+# ============================================================
+
+SAMPLE_BATCH = 1000  # Ids per WHERE ... IN (...) query
+EXAMPLES_SHOWN = 3  # Example mismatches printed per table column
+
+
+def _uniform(rng: random.Random) -> float:
+    return rng.random() or 5e-324  # (0, 1): log() must not see 0
+
+
+def sample_documents(path: str, size: int, rng: random.Random) -> Tuple[List[Dict], int]:
+    """Reservoir sample of `size` documents from a dump file, and the number of documents in it
+
+    .bson files use Algorithm L: the documents between two picks are skipped
+    by their length prefix without being read or decoded, so the cost grows
+    with the sample size rather than with the collection. JSON dumps have to
+    be loaded as a whole.
+    """
+    if not path.endswith('.bson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+        return (rng.sample(documents, size) if len(documents) > size else documents), len(documents)
+
+    reservoir = []
+    count = 0
+    with open(path, 'rb') as f:
+        def read() -> Optional[bytes]:
+            header = f.read(4)
+            if len(header) < 4:
+                return None
+            body = f.read(int.from_bytes(header, 'little') - 4)
+            return header + body if len(body) == int.from_bytes(header, 'little') - 4 else None
+
+        def skip(documents: int) -> int:
+            for skipped in range(documents):
+                header = f.read(4)
+                if len(header) < 4:
+                    return skipped
+                f.seek(int.from_bytes(header, 'little') - 4, os.SEEK_CUR)
+            return documents
+
+        while len(reservoir) < size:
+            raw = read()
+            if raw is None:
+                break
+            reservoir.append(raw)
+            count += 1
+        if len(reservoir) == size:
+            weight = math.exp(math.log(_uniform(rng)) / size)
+            while True:
+                gap = math.floor(math.log(_uniform(rng)) / math.log1p(-weight))
+                skipped = skip(gap)
+                count += skipped
+                if skipped < gap:
+                    break
+                raw = read()
+                if raw is None:
+                    break
+                count += 1
+                reservoir[rng.randrange(size)] = raw
+                weight *= math.exp(math.log(_uniform(rng)) / size)
+
+    decode = getattr(bson, 'decode', None) or MongoToMySQLConverter.decode_bson_document
+    documents = []
+    for raw in reservoir:
+        try:
+            documents.append(decode(raw))
+        except Exception:
+            pass  # Reported by the migration as 'BSON decode error'
+    return documents, count
+
+
+class _Probe:
+    """Stand-in id index that records the ids a row builder looks up"""
+
+    def __init__(self):
+        self.values = set()
+
+    def __contains__(self, value) -> bool:
+        self.values.add(value)
+        return True
+
+
+def _batches(values: List[Any]):
+    for start in range(0, len(values), SAMPLE_BATCH):
+        yield values[start:start + SAMPLE_BATCH]
+
+
+def _canonical_json(value: Any) -> str:
+    if value is None:
+        return NULL
+    return json.dumps(json.loads(value) if isinstance(value, str) else value, sort_keys=True)
+
+
+def _display(text: str) -> str:
+    if text == NULL:
+        return 'NULL'
+    return repr(text if len(text) <= 60 else text[:57] + '...')
+
+
+class SampledDiff:
+    """Field-level comparison of sampled documents with their rows in MySQL"""
+
+    def __init__(self, pool: ConnectionPool, converter: MongoToMySQLConverter, kinds: Dict[str, Dict[str, str]]):
+        self.pool = pool
+        self.converter = converter
+        self.kinds = kinds
+        self.mismatches: Dict[Tuple[str, str], List[Tuple[Any, str, str]]] = {}
+
+    def mismatch(self, table: str, column: str, record_id: Any, expected: str, actual: str):
+        self.mismatches.setdefault((table, column), []).append((record_id, expected, actual))
+
+    def existing_ids(self, collection: str, values: set) -> set:
+        """The ids among `values` that have a row in the collection's table"""
+        table = MAPPINGS[collection].table
+        kind = self.kinds.get(table, {}).get('id')
+        found = set()
+        for batch in _batches([value for value in values if value is not None]):
+            found.update(row[0] for row in self.query(
+                f"SELECT {sql_value('id', kind)} FROM `{table}` WHERE `id` IN ({placeholders(kind, len(batch))})",
+                batch))
+        return found
+
+    def query(self, sql: str, args: List[Any]) -> List[Tuple]:
+        def run(connection):
+            cursor = connection.cursor()
+            cursor.execute(sql, args)
+            return cursor.fetchall()
+        return self.pool.run(run)
+
+    def fetch(self, spec: TableSpec, keys: List[Any]) -> Dict[Any, List[Tuple[str, ...]]]:
+        """{key: [row texts]} of the rows whose spec.key is in `keys`"""
+        kinds = self.kinds.get(spec.table, {})
+        select = ', '.join(f'`{column}`' if kinds.get(column) == 'JSON' else sql_value(column, kinds.get(column))
+                           for column in spec.columns)
+        json_columns = [i for i, column in enumerate(spec.columns) if kinds.get(column) == 'JSON']
+        key_index = spec.columns.index(spec.key)
+        rows = {}
+        for batch in _batches(keys):
+            for row in self.query(f"SELECT {select} FROM `{spec.table}` WHERE `{spec.key}` IN "
+                                  f"({placeholders(kinds.get(spec.key), len(batch))})", batch):
+                row = list(row)
+                for i in json_columns:
+                    row[i] = _canonical_json(row[i])
+                rows.setdefault(row[key_index], []).append(tuple(row))
+        return rows
+
+    def formatters(self, spec: TableSpec) -> List[Callable[[Any], str]]:
+        kinds = self.kinds.get(spec.table, {})
+        return [_canonical_json if kinds.get(column) == 'JSON' else value_formatter(kinds.get(column))
+                for column in spec.columns]
+
+    def diff_collection(self, collection: str, documents: List[Dict]) -> Tuple[int, int]:
+        """Compare the sampled documents of one collection; returns (rows, child rows) compared"""
+        mapping = self.converter.row_builders()[collection]
+        specs = {spec.table: spec for spec in table_specs([collection])}
+
+        # Resolve the foreign keys the sample needs, instead of loading every id
+        probes = [_Probe() for _ in mapping.references]
+        for record in documents:
+            try:
+                mapping.build(record, *probes)
+            except Exception:
+                pass
+        indexes = [self.existing_ids(reference, probe.values)
+                   for reference, probe in zip(mapping.references, probes)]
+
+        expected = {}  # id -> parent values
+        expected_children = {table: {} for table in specs if table != mapping.table}
+        skipped = {}  # id -> reason
+        for record in documents:
+            record_id = self.converter.convert_mongo_id(record.get('_id'))
+            try:
+                values, children = mapping.build(record, *indexes)
+            except Exception as e:
+                skipped[record_id] = reject_reason(e)
+                continue
+            expected[values[0]] = values
+            rows = {table: [] for table in expected_children}
+            for table, _, row in children or ():
+                rows[table].append(row)
+            for table, table_rows in rows.items():
+                expected_children[table][values[0]] = table_rows
+
+        parent_spec = specs[mapping.table]
+        actual = self.fetch(parent_spec, list(expected) + list(skipped))
+        formatters = self.formatters(parent_spec)
+        for record_id, values in expected.items():
+            rows = actual.get(record_id)
+            if not rows:
+                self.mismatch(mapping.table, '(row)', record_id, 'present', 'missing')
+                continue
+            for column, formatter, value, stored in zip(parent_spec.columns, formatters, values, rows[0]):
+                text = formatter(value)
+                if text != stored:
+                    self.mismatch(mapping.table, column, record_id, text, stored)
+        for record_id, reason in skipped.items():
+            if record_id in actual and record_id not in expected:
+                self.mismatch(mapping.table, '(row)', record_id, f'skipped ({reason})', 'present')
+
+        child_rows = 0
+        for table, by_parent in expected_children.items():
+            spec = specs[table]
+            formatters = self.formatters(spec)
+            actual = self.fetch(spec, list(by_parent))
+            for parent_id, rows in by_parent.items():
+                wanted = Counter(tuple(f(v) for f, v in zip(formatters, row)) for row in rows)
+                stored = Counter(actual.get(parent_id, ()))
+                child_rows += len(rows)
+                for row in (wanted - stored).elements():
+                    self.mismatch(table, '(rows)', parent_id, self.row_text(spec, row), 'missing')
+                for row in (stored - wanted).elements():
+                    self.mismatch(table, '(rows)', parent_id, 'absent', self.row_text(spec, row))
+        return len(expected), child_rows
+
+    @staticmethod
+    def row_text(spec: TableSpec, row: Tuple[str, ...]) -> str:
+        return ', '.join(f'{column}={_display(value)}' for column, value in zip(spec.columns, row)
+                         if column != spec.key)
+
+    def report(self, tables: List[str]):
+        """Print the mismatches of the given tables, a few examples per column"""
+        for (table, column), mismatches in self.mismatches.items():
+            if table not in tables:
+                continue
+            print(f"    ✗ {table}.{column}: {len(mismatches)} mismatches")
+            for record_id, expected, actual in mismatches[:EXAMPLES_SHOWN]:
+                if column.startswith('('):
+                    print(f"        {record_id}: expected {expected}, got {actual}")
+                else:
+                    print(f"        {record_id}: expected {_display(expected)}, got {_display(actual)}")
+
+
+def deep_diff(sample_size: int, seed: int = 42, collections: Optional[List[str]] = None) -> bool:
+    """Compare a reservoir sample of every collection with MySQL, field by field"""
+    print("\n" + "="*60)
+    print(f"SAMPLED DEEP DIFF ({sample_size} documents per collection, seed {seed})")
+    print("="*60 + "\n")
+    started = time.perf_counter()
+    collections = [c for c in MIGRATION_ORDER if c in MAPPINGS and (not collections or c in collections)]
+
+    rng = random.Random(seed)
+    pool = ConnectionPool(lambda: pymysql.connect(**MYSQL_CONFIG), max_idle=1)
+    ok = True
+    try:
+        converter = MongoToMySQLConverter(id_storage='hex', partitions=pool.run(stored_partitions))
+        kinds = schema_kinds(pool.run(converter.stored_id_storage) or ID_STORAGE)
+        diff = SampledDiff(pool, converter, kinds)
+        for collection in collections:
+            path = os.path.join(DATA_DIR, DATA_FILES[collection])
+            if not os.path.exists(path):
+                print(f"⚠ {collection}: file not found: {path}")
+                continue
+            documents, total = sample_documents(path, sample_size, rng)
+            before = sum(len(m) for m in diff.mismatches.values())
+            rows, child_rows = diff.diff_collection(collection, documents)
+            found = sum(len(m) for m in diff.mismatches.values()) - before
+            ok = ok and not found
+            print(f"{'✗' if found else '✓'} {collection}: {len(documents)} of {total} documents sampled, "
+                  f"{rows} rows and {child_rows} child rows compared"
+                  + (f", {found} mismatches" if found else ''))
+            diff.report([spec.table for spec in table_specs([collection])])
+    finally:
+        pool.close()
+
+    print("\n" + "="*60)
+    elapsed = time.perf_counter() - started
+    print(f"{'✓ No mismatches' if ok else '✗ Mismatches found'} in the sampled rows ({elapsed:.1f}s)")
+    print("="*60 + "\n")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the MongoDB dump with the migrated MySQL tables')
+    parser.add_argument('--workers', type=int, default=VERIFY_WORKERS,
+                        help=f'dump-scanning processes and MySQL connections (default: {VERIFY_WORKERS})')
+    parser.add_argument('--buckets', type=int, default=VERIFY_BUCKETS,
+                        help=f'checksum buckets per table (default: {VERIFY_BUCKETS})')
+    parser.add_argument('--counts-only', action='store_true', help='only compare row counts, no checksums')
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help='instead: compare N randomly sampled documents per collection field by field')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for --sample (default: 42)')
+    parser.add_argument('collections', nargs='*', help='collections to verify (default: all)')
+    args = parser.parse_args()
+    unknown = [c for c in args.collections if c not in MAPPINGS]
+    if unknown:
+        parser.error(f"unknown collections: {', '.join(unknown)}")
+    if args.sample is not None:
+        if args.sample < 1:
+            parser.error('--sample must be at least 1')
+        ok = deep_diff(args.sample, seed=args.seed, collections=args.collections)
+    else:
+        ok = verify_migration(workers=args.workers, buckets=args.buckets, checksums=not args.counts_only,
+                              collections=args.collections)
+    sys.exit(0 if ok else 1)
+
 
 if __name__ == '__main__':
-    verify_migration()
+    main()